@@ -0,0 +1,213 @@
+"""
+Versioned response cache for anonymous GET requests.
+
+Every cacheable resource (trips, images, likes, followers, profiles) has a
+version counter in the cache, bumped on every write, and again when it
+commits, through `invalidate()`. A cached response stores the versions of
+the resources its view reads, and is only served while they are all
+unchanged, so a write invalidates every dependent response in O(1)
+without scanning keys. Versions start from the current time in
+nanoseconds, so a counter evicted from the cache never comes back with an
+old value.
+
+While one request rebuilds a response, concurrent requests for the same
+key are served the previous (stale) copy, or wait for the rebuild when
+there is none, instead of all running the same queries.
+"""
+import hashlib
+import time
+from urllib.parse import parse_qsl, urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from rest_framework.response import Response
+
+KEY_PREFIX = 'response-cache'
+METRICS = ('hit', 'miss', 'stale', 'wait', 'bypass')
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def version_key(resource):
+    return f'{KEY_PREFIX}:version:{resource}'
+
+
+def bump_version(resource):
+    """
+    Increment the version of a resource, invalidating the cached
+    responses depending on it.
+    """
+    cache = get_cache()
+    try:
+        cache.incr(version_key(resource))
+    except ValueError:
+        cache.add(version_key(resource), time.time_ns(), timeout=None)
+
+
+def invalidate(*resources):
+    """
+    Bump the versions of the resources now, so later reads in the same
+    transaction miss the cache, and again once the transaction commits,
+    so responses cached from concurrent reads of the data before the
+    commit are not served under the new versions.
+    """
+    for resource in resources:
+        bump_version(resource)
+        transaction.on_commit(
+            lambda resource=resource: bump_version(resource)
+        )
+
+
+def get_versions(resources):
+    cache = get_cache()
+    keys = [version_key(resource) for resource in resources]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def record(metric):
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:metrics:{metric}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_metrics():
+    """
+    Return the hit, miss, stale, wait and bypass counts of the cache.
+    """
+    cache = get_cache()
+    counts = cache.get_many(
+        [f'{KEY_PREFIX}:metrics:{metric}' for metric in METRICS]
+    )
+    return {
+        metric: counts.get(f'{KEY_PREFIX}:metrics:{metric}', 0)
+        for metric in METRICS
+    }
+
+
+def reset_metrics():
+    get_cache().delete_many(
+        [f'{KEY_PREFIX}:metrics:{metric}' for metric in METRICS]
+    )
+
+
+class AnonymousResponseCacheMixin:
+    """
+    View mixin caching the GET responses served to anonymous users.
+    Responses are keyed on the host, path and normalized query string,
+    and tagged with the versions of `cache_resources`. Authenticated
+    requests, whose payloads depend on the user, bypass the cache. The
+    ETag and Last-Modified headers are cached with the data, so cached
+    responses also answer conditional requests with 304. Every response
+    carries an `X-Cache` header with the outcome.
+    Attributes:
+        cache_resources (tuple): Resources the view reads, e.g.
+                                 ('trips', 'images').
+    Settings:
+        RESPONSE_CACHE_ALIAS: The cache used (default 'default').
+        RESPONSE_CACHE_TTL: Lifetime of a cached response in seconds.
+        RESPONSE_CACHE_LOCK_TIMEOUT: Maximum time in seconds a rebuild
+                                     holds off concurrent requests.
+    """
+
+    cache_resources = ()
+    cached_headers = ('ETag', 'Last-Modified')
+
+    def get_response_cache_key(self, request):
+        query = urlencode(sorted(parse_qsl(
+            request.META.get('QUERY_STRING', ''), keep_blank_values=True
+        )))
+        digest = hashlib.sha1(
+            f'{request.get_host()}{request.path}?{query}'.encode()
+        ).hexdigest()
+        return f'{KEY_PREFIX}:response:{digest}'
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            record('bypass')
+            return self.mark(super().get(request, *args, **kwargs), 'BYPASS')
+
+        cache = get_cache()
+        key = self.get_response_cache_key(request)
+        versions = get_versions(self.cache_resources)
+        entry = cache.get(key)
+        if entry is not None and entry['versions'] == versions:
+            record('hit')
+            return self.mark(self.cached_response(request, entry), 'HIT')
+
+        lock_timeout = getattr(settings, 'RESPONSE_CACHE_LOCK_TIMEOUT', 10)
+        lock_key = f'{key}:lock'
+        if not cache.add(lock_key, 1, timeout=lock_timeout):
+            if entry is not None:
+                record('stale')
+                return self.mark(
+                    self.cached_response(request, entry), 'STALE'
+                )
+            entry = self.wait_for(key, versions, lock_key, lock_timeout)
+            if entry is not None:
+                record('wait')
+                return self.mark(self.cached_response(request, entry), 'HIT')
+
+        record('miss')
+        try:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                headers = {
+                    name: response[name]
+                    for name in self.cached_headers if name in response
+                }
+                cache.set(
+                    key,
+                    {
+                        'versions': versions,
+                        'data': response.data,
+                        'headers': headers,
+                    },
+                    timeout=getattr(settings, 'RESPONSE_CACHE_TTL', 60)
+                )
+        finally:
+            cache.delete(lock_key)
+        return self.mark(response, 'MISS')
+
+    def cached_response(self, request, entry):
+        headers = entry['headers']
+        not_modified = get_conditional_response(
+            request, etag=headers.get('ETag')
+        )
+        if not_modified is not None:
+            for name, value in headers.items():
+                not_modified[name] = value
+            return not_modified
+        return Response(entry['data'], headers=headers)
+
+    def wait_for(self, key, versions, lock_key, lock_timeout):
+        """
+        Wait until the request holding the lock stores the response, the
+        lock is released or the lock timeout is reached.
+        """
+        cache = get_cache()
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None and entry['versions'] == versions:
+                return entry
+            if cache.get(lock_key) is None:
+                return None
+        return None
+
+    def mark(self, response, outcome):
+        response['X-Cache'] = outcome
+        return response
@@ -0,0 +1,208 @@
+import hashlib
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import permissions, status
+from rest_framework.exceptions import ValidationError
+from .utils import count_of
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Serializer mixin restricting the output to a subset of fields.
+    Serializers take two optional keyword arguments:
+        fields (iterable): Names of the fields to include.
+        expand (iterable): Names of expandable fields to include.
+    Fields listed in `expandable_fields` (nested relations) are only
+    included when named in `expand`. Without both arguments the full
+    representation is returned. Removed fields are not computed.
+    Attributes:
+        expandable_fields (tuple): Nested fields included on request only.
+    Properties:
+        is_sparse (bool): Whether a subset of the fields was requested.
+    """
+
+    expandable_fields = ()
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expand = set(expand or ())
+        self.is_sparse = fields is not None or expand is not None
+        if not self.is_sparse:
+            return
+
+        if fields is not None:
+            unknown = ', '.join(sorted(set(fields) - set(self.fields)))
+            if unknown:
+                raise ValidationError(
+                    {'fields': [f'Unknown fields: {unknown}.']}
+                )
+        for name in list(self.fields):
+            if name in self.expandable_fields:
+                keep = name in self.expand
+            else:
+                keep = fields is None or name in fields
+            if not keep:
+                self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """
+    View mixin reading the `?fields=` and `?expand=` query parameters of
+    read requests and passing them to a serializer using
+    SparseFieldsetSerializerMixin.
+    Methods:
+        get_sparse_fieldset(): The requested (fields, expand) names, each
+                               None when the parameter is absent.
+        is_field_requested(name, expandable=False): Whether a field will
+                               be serialized, so querysets can skip the
+                               annotations and prefetches of other fields.
+    """
+
+    def get_sparse_fieldset(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None, None
+        params = self.request.query_params
+        return tuple(
+            [name for name in params[param].split(',') if name]
+            if param in params else None
+            for param in ('fields', 'expand')
+        )
+
+    def is_field_requested(self, name, expandable=False):
+        fields, expand = self.get_sparse_fieldset()
+        if fields is None and expand is None:
+            return True
+        if expandable:
+            return name in (expand or ())
+        return fields is None or name in fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_sparse_fieldset()
+        if fields is not None or expand is not None:
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """
+    View mixin answering conditional GET requests (If-None-Match) with
+    304 Not Modified before the objects are loaded and serialized.
+    The validators come from one aggregate query over the rows of the
+    response, the looked up object on detail views and the primary keys
+    of the requested page on list views: the latest of the
+    `validator_timestamps`, the number of rows and the sums of the
+    `validator_counters`, which change without touching the timestamps.
+    The ETag also covers the query string, the user, the pagination links
+    and count, and a version of the user's rows in `viewer_relations`
+    (e.g. their follows and likes), which the payloads reflect. Last-Modified
+    is sent too, but If-Modified-Since is not honoured: the timestamps
+    alone miss counter changes and deletions.
+    Attributes:
+        validator_timestamps (tuple): Timestamp fields, e.g. 'updated_at'
+                                      or 'images__updated_at'.
+        validator_counters (tuple): Counter fields.
+        viewer_relations (tuple): (model, user field) pairs of the rows of
+                                  the request user shown in the payloads.
+    Methods:
+        get_page_keys(queryset): The primary keys of the requested page,
+            and the pagination data of the response.
+        get_viewer_version(): The row count and highest primary key of
+            each of the user's viewer relations.
+    """
+
+    validator_timestamps = ('updated_at',)
+    validator_counters = ()
+    viewer_relations = ()
+
+    def get_page_keys(self, queryset):
+        page = self.paginate_queryset(queryset.prefetch_related(None))
+        if page is None:
+            return list(queryset.values_list('pk', flat=True)), None
+        pagination = self.get_paginated_response([]).data
+        pagination.pop('results', None)
+        return [obj.pk for obj in page], sorted(pagination.items())
+
+    def get_viewer_version(self):
+        """
+        Return a version of the rows of the request user in the viewer
+        relations, read in one query. Primary keys are never reused, so
+        the row counts and the highest keys change with every insert and
+        delete.
+        """
+        user = self.request.user
+        if not user.is_authenticated or not self.viewer_relations:
+            return None
+        annotations = {}
+        for index, (model, field) in enumerate(self.viewer_relations):
+            rows = model.objects.filter(**{field: OuterRef('pk')})
+            annotations[f'count_{index}'] = count_of(
+                model.objects.all(), field
+            )
+            annotations[f'last_{index}'] = Subquery(
+                rows.order_by('-pk').values('pk')[:1]
+            )
+        return get_user_model().objects.filter(pk=user.pk).annotate(
+            **annotations
+        ).values_list(*annotations).get()
+
+    def get_validators(self):
+        """
+        Return the (ETag, Last-Modified timestamp) of the response, or
+        (None, None) when the looked up object does not exist.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        is_detail = lookup_url_kwarg in self.kwargs
+        pagination = None
+        if is_detail:
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        else:
+            keys, pagination = self.get_page_keys(queryset)
+            queryset = queryset.model._default_manager.filter(pk__in=keys)
+        aggregates = {
+            f'timestamp_{index}': Max(field)
+            for index, field in enumerate(self.validator_timestamps)
+        }
+        aggregates.update({
+            f'counter_{index}': Sum(field)
+            for index, field in enumerate(self.validator_counters)
+        })
+        values = queryset.order_by().aggregate(
+            count=Count('pk', distinct=True), **aggregates
+        )
+        if is_detail and not values['count']:
+            return None, None
+
+        timestamps = [
+            value for name, value in values.items()
+            if name.startswith('timestamp_') and value is not None
+        ]
+        last_modified = max(timestamps).timestamp() if timestamps else None
+        user = self.request.user
+        digest = hashlib.sha1(repr((
+            self.request.get_full_path(),
+            user.pk if user.is_authenticated else None,
+            sorted(values.items()),
+            pagination,
+            self.get_viewer_version(),
+        )).encode()).hexdigest()
+        return f'W/"{digest}"', last_modified
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        if etag is None:
+            return super().get(request, *args, **kwargs)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -0,0 +1,173 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on a unique, indexed column tuple, by default
+    (created_at, id) in descending order.
+    Pages are selected with a WHERE clause on the key of the last (or
+    first) row of the previous page instead of an OFFSET, and no COUNT is
+    run, so every page costs the same however deep the client scrolls.
+    Views can set `cursor_ordering`, e.g. ('-uploaded_at', '-id'); all
+    its fields must sort in the same direction and the last one must be
+    unique. The ordering replaces any `?ordering=` of the request.
+    Attributes:
+        page_size (int): Number of results per page (PAGE_SIZE setting).
+        cursor_query_param (str): Query parameter holding the cursor.
+        ordering (tuple): Default key columns.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'cursor_ordering', self.ordering)
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+        descending = self.ordering[0].startswith('-')
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['reverse']
+        if reverse:
+            ordering = [
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in self.ordering
+            ]
+        else:
+            ordering = self.ordering
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(
+                self.after(cursor['key'], descending != reverse)
+            )
+
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = page
+        return page
+
+    def after(self, key, descending):
+        """
+        Build the filter selecting the rows after a key in the scan
+        direction, e.g. (created_at < x) OR (created_at = x AND id < y).
+        """
+        lookup = 'lt' if descending else 'gt'
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            equal = {
+                previous.attname: key[position]
+                for position, previous in enumerate(self.fields[:index])
+            }
+            condition |= Q(
+                **equal, **{f'{field.attname}__{lookup}': key[index]}
+            )
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            key = [
+                field.to_python(value)
+                for field, value in zip(self.fields, cursor['k'], strict=True)
+            ]
+            return {'key': key, 'reverse': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError, ValidationError) as e:
+            raise NotFound(self.invalid_cursor_message) from e
+
+    def encode_cursor(self, instance, reverse):
+        cursor = {
+            'k': [field.value_to_string(instance) for field in self.fields]
+        }
+        if reverse:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(cursor).encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encoded
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class SelectablePagination(PageNumberPagination):
+    """
+    Page number pagination, or keyset pagination when the request asks
+    for it with `?pagination=cursor` or carries a `cursor` parameter.
+    Cursor pages have `next` and `previous` links but no `count`.
+    Keyset pages always follow the key columns, so querysets ordered by
+    an annotation, e.g. the `distance` of the `near` filter or the
+    `search_rank` of `q`, are paginated with page numbers instead.
+    Methods:
+        uses_cursor(queryset, request): Whether a request gets keyset
+            pagination.
+    """
+
+    cursor_pagination_class = KeysetPagination
+    cursor_paginator = None
+
+    def uses_cursor(self, queryset, request):
+        params = request.query_params
+        if params.get('pagination') != 'cursor' and 'cursor' not in params:
+            return False
+        annotations = queryset.query.annotations
+        return not any(
+            isinstance(name, str) and name.lstrip('-') in annotations
+            for name in queryset.query.order_by
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.uses_cursor(queryset, request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -120,6 +120,7 @@ INSTALLED_APPS = [
     'trips',
     'likes',
     'followers',
+    'feed',
 
     'drf_spectacular',
     'django_extensions',
@@ -245,3 +246,34 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760
 MAX_UPLOAD_SIZE = 10485760
+LIKES_PREVIEW_SIZE = 3
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TTL = 60
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+
+PLACE_INDEX_TTL = 300
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_SIZE = 50
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_MAX_AGE_DAYS = 14
+TRENDING_MIN_SCORE = 0.01
+TRENDING_REFRESH_LAG_SECONDS = 60
+
+GEOCODE_CACHE_SIZE = 1024
+GEOCODE_CACHE_TTL = 60 * 60 * 24 * 30
+GEOCODE_CACHE_NEGATIVE_TTL = 60 * 60 * 24
+GEOCODE_DEFERRED = os.environ.get('GEOCODE_DEFERRED') == 'True'
+GEOCODER_BACKENDS = os.environ.get(
+    'GEOCODER_BACKENDS',
+    'trips.geocoding.GazetteerGeocoder,trips.geocoding.NominatimGeocoder'
+).split(',')
+GEOCODER_GAZETTEER_PATH = os.environ.get('GEOCODER_GAZETTEER_PATH')
+GEOCODER_GAZETTEER_ALTERNATE_NAMES = False
+GEOCODER_USER_AGENT = 'trip'
+GEOCODER_TIMEOUT = 5
+GEOCODER_MAX_ATTEMPTS = 3
+GEOCODER_BACKOFF = 0.5
+GEOCODER_MAX_BACKOFF = 8.0
+GEOCODER_MIN_INTERVAL = 1.0
+GEOCODER_BREAKER_THRESHOLD = 5
+GEOCODER_BREAKER_RESET = 60.0
@@ -35,6 +35,7 @@ urlpatterns = [
     path('', include('trips.urls')),
     path('', include('likes.urls')),
     path('', include('followers.urls')),
+    path('', include('feed.urls')),
 
     path(
         'schema/',
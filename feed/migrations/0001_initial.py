@@ -0,0 +1,67 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_feeds(apps, schema_editor):
+    FeedItem = apps.get_model('feed', 'FeedItem')
+    Follower = apps.get_model('followers', 'Follower')
+    Trip = apps.get_model('trips', 'Trip')
+    Image = apps.get_model('trips', 'Image')
+    size = settings.FEED_BACKFILL_SIZE
+    for follow in Follower.objects.order_by().iterator():
+        trips = Trip.objects.filter(
+            owner_id=follow.followed_id, shared=True
+        ).order_by('-created_at')[:size]
+        images = Image.objects.filter(
+            owner_id=follow.followed_id, shared=True
+        ).order_by('-uploaded_at')[:size]
+        FeedItem.objects.bulk_create(
+            [
+                FeedItem(
+                    owner_id=follow.owner_id, actor_id=trip.owner_id,
+                    trip=trip, created_at=trip.created_at
+                )
+                for trip in trips
+            ] + [
+                FeedItem(
+                    owner_id=follow.owner_id, actor_id=image.owner_id,
+                    image=image, created_at=image.uploaded_at
+                )
+                for image in images
+            ],
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('trips', '0010_trip_country_code'),
+        ('followers', '0002_follower_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('image', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='trips.image')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL)),
+                ('trip', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='trips.trip')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['owner', 'created_at', 'id'], name='feed_feedit_owner_i_ffe0ef_idx'), models.Index(fields=['owner', 'actor'], name='feed_feedit_owner_i_1d8539_idx')],
+                'unique_together': {('owner', 'image'), ('owner', 'trip')},
+            },
+        ),
+        migrations.RunPython(backfill_feeds, migrations.RunPython.noop),
+    ]
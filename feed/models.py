@@ -0,0 +1,217 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import F, Max, Q, Window
+from django.db.models.functions import RowNumber
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from followers.models import Follower
+from profiles.models import ProfileStats
+from trips.models import Image, Trip
+from trips.signals import trips_bulk_created
+
+
+class FeedItem(models.Model):
+    """
+    An entry of a user's home feed: a shared trip or image of a user they
+    follow. Entries are written when the content is created (fan-out on
+    write), so reading a feed page is an index range scan on (owner,
+    created_at, id) whatever the size of the trip and image tables.
+    Content of users with more than FEED_FANOUT_LIMIT followers is not
+    fanned out; their followers pull it into their own feed when they
+    open its first page instead, bounding the cost of a single write.
+    Deleting the content deletes its entries.
+    Attributes:
+        owner (ForeignKey): The user reading the feed.
+        actor (ForeignKey): The followed user who shared the content.
+        trip (ForeignKey): The trip, for trip entries.
+        image (ForeignKey): The image, for image entries.
+        created_at (DateTimeField): When the content was created.
+    Methods:
+        fan_out(actor_id, trips, images): Add content to the feeds of the
+            followers of its author, unless the author is pulled.
+        backfill(owner_id, actor_id): Add the latest content of a newly
+            followed user to a feed.
+        pull(owner): Add the new content of the pulled users the owner
+            follows to their feed.
+    """
+
+    owner = models.ForeignKey(
+        User,
+        related_name='feed_items',
+        on_delete=models.CASCADE
+    )
+    actor = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    trip = models.ForeignKey(
+        Trip,
+        blank=True,
+        null=True,
+        related_name='feed_items',
+        on_delete=models.CASCADE
+    )
+    image = models.ForeignKey(
+        Image,
+        blank=True,
+        null=True,
+        related_name='feed_items',
+        on_delete=models.CASCADE
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        unique_together = [('owner', 'trip'), ('owner', 'image')]
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'id']),
+            models.Index(fields=['owner', 'actor']),
+        ]
+
+    def __str__(self):
+        content = f'trip {self.trip_id}' if self.trip_id \
+            else f'image {self.image_id}'
+        return f"{content} by {self.actor} in {self.owner}'s feed"
+
+    @classmethod
+    def entries(cls, owner_id, trips=(), images=()):
+        for trip in trips:
+            yield cls(
+                owner_id=owner_id, actor_id=trip.owner_id, trip=trip,
+                created_at=trip.created_at
+            )
+        for image in images:
+            yield cls(
+                owner_id=owner_id, actor_id=image.owner_id, image=image,
+                created_at=image.uploaded_at
+            )
+
+    @classmethod
+    def insert(cls, items):
+        cls.objects.bulk_create(items, batch_size=500, ignore_conflicts=True)
+
+    @staticmethod
+    def is_pulled(actor_id):
+        return ProfileStats.objects.filter(
+            owner_id=actor_id,
+            followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).exists()
+
+    @staticmethod
+    def latest_content(actor_ids, since=None):
+        """
+        Return the FEED_BACKFILL_SIZE newest shared trips and images of
+        each of the given users, newer than the `since` map of user ids to
+        timestamps when given. Each user's content is ranked separately
+        with a window function, so a prolific user cannot crowd out the
+        others.
+        """
+        size = settings.FEED_BACKFILL_SIZE
+        since = since or {}
+        content = []
+        for model, timestamp in ((Trip, 'created_at'), (Image, 'uploaded_at')):
+            q = Q()
+            for actor_id in actor_ids:
+                q |= Q(owner_id=actor_id, **(
+                    {f'{timestamp}__gt': since[actor_id]}
+                    if actor_id in since else {}
+                ))
+            content.append(model.objects.filter(q, shared=True).annotate(
+                actor_rank=Window(
+                    RowNumber(),
+                    partition_by=F('owner_id'),
+                    order_by=F(timestamp).desc()
+                )
+            ).filter(actor_rank__lte=size))
+        return content
+
+    @classmethod
+    def fan_out(cls, actor_id, trips=(), images=()):
+        if cls.is_pulled(actor_id):
+            return
+        follower_ids = Follower.objects.filter(
+            followed_id=actor_id
+        ).values_list('owner_id', flat=True)
+        cls.insert(
+            item for owner_id in follower_ids.iterator()
+            for item in cls.entries(owner_id, trips, images)
+        )
+
+    @classmethod
+    def backfill(cls, owner_id, actor_id):
+        trips, images = cls.latest_content([actor_id])
+        cls.insert(cls.entries(owner_id, trips, images))
+
+    @classmethod
+    def pull(cls, owner):
+        """
+        Add the content created by pulled users since the last entry of
+        each of them in the owner's feed, up to FEED_BACKFILL_SIZE trips
+        and images per user.
+        """
+        actor_ids = list(Follower.objects.filter(
+            owner=owner,
+            followed__stats__followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('followed_id', flat=True))
+        if not actor_ids:
+            return
+        since = dict(
+            cls.objects.filter(owner=owner, actor_id__in=actor_ids)
+            .values('actor_id').annotate(latest=Max('created_at'))
+            .order_by().values_list('actor_id', 'latest')
+        )
+        trips, images = cls.latest_content(actor_ids, since)
+        cls.insert(cls.entries(owner.pk, trips, images))
+
+
+@receiver(post_save, sender=Trip)
+def fan_out_trip(sender, instance, created, raw=False, **kwargs):
+    """
+    Add newly shared trips to the feeds of the owner's followers, and
+    remove trips that are no longer shared.
+    """
+    if raw or not (created or instance.has_changed('shared')):
+        return
+    if instance.shared:
+        FeedItem.fan_out(instance.owner_id, trips=[instance])
+    elif not created:
+        FeedItem.objects.filter(trip=instance).delete()
+
+
+@receiver(trips_bulk_created, sender=Trip)
+def fan_out_trips(sender, trips, **kwargs):
+    by_owner = {}
+    for trip in trips:
+        if trip.shared:
+            by_owner.setdefault(trip.owner_id, []).append(trip)
+    for owner_id, owner_trips in by_owner.items():
+        FeedItem.fan_out(owner_id, trips=owner_trips)
+
+
+@receiver(post_save, sender=Image)
+def fan_out_image(sender, instance, created, raw=False, **kwargs):
+    """
+    Add newly shared images to the feeds of the owner's followers, and
+    remove images that are no longer shared.
+    """
+    if raw or not (created or instance.has_changed('shared')):
+        return
+    if instance.shared:
+        FeedItem.fan_out(instance.owner_id, images=[instance])
+    elif not created:
+        FeedItem.objects.filter(image=instance).delete()
+
+
+@receiver(post_save, sender=Follower)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        FeedItem.backfill(instance.owner_id, instance.followed_id)
+
+
+@receiver(post_delete, sender=Follower)
+def prune_feed(sender, instance, **kwargs):
+    FeedItem.objects.filter(
+        owner_id=instance.owner_id, actor_id=instance.followed_id
+    ).delete()
@@ -0,0 +1,42 @@
+from rest_framework import serializers
+from trips.serializers import ImageSerializer, TripSerializer
+from .models import FeedItem
+
+
+class FeedItemSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the FeedItem model.
+    Attributes:
+        actor (ReadOnlyField): The username of the followed user.
+        kind (SerializerMethodField): 'trip' or 'image'.
+        trip (SerializerMethodField): The trip, without its images, or None.
+        image (SerializerMethodField): The image, without its likes preview,
+                                       or None.
+    Meta:
+        model (FeedItem): The model that is being serialized.
+        fields (list): The list of fields to include in the serialized output.
+    """
+
+    actor = serializers.ReadOnlyField(source='actor.username')
+    kind = serializers.SerializerMethodField()
+    trip = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+
+    def get_kind(self, obj):
+        return 'trip' if obj.trip_id else 'image'
+
+    def get_trip(self, obj):
+        if obj.trip is None:
+            return None
+        return TripSerializer(obj.trip, context=self.context, expand=()).data
+
+    def get_image(self, obj):
+        if obj.image is None:
+            return None
+        return ImageSerializer(
+            obj.image, context=self.context, expand=()
+        ).data
+
+    class Meta:
+        model = FeedItem
+        fields = ['id', 'kind', 'actor', 'created_at', 'trip', 'image']
@@ -0,0 +1,175 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from followers.models import Follower
+from trips.models import Image, Trip
+from .models import FeedItem
+
+
+@mock.patch('trips.models.get_coordinates', return_value=(59.91, 10.75))
+class FeedTests(APITestCase):
+    '''
+    Test the fan-out of shared content to the feeds of followers, the
+    pull mode of users with many followers, and the feed endpoint.
+    '''
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='p')
+        self.reader = User.objects.create_user(username='reader', password='p')
+        self.other = User.objects.create_user(username='other', password='p')
+
+    def create_trip(self, owner=None, shared=True, title='Trip'):
+        return Trip.objects.create(
+            owner=owner or self.author,
+            title=title,
+            place='Oslo',
+            country='Norway',
+            trip_category='Adventure',
+            trip_status='Planned',
+            shared=shared,
+            start_date='2025-03-01',
+            end_date='2025-03-10'
+        )
+
+    def create_image(self, trip, shared=True):
+        return Image.objects.create(
+            owner=trip.owner,
+            trip=trip,
+            image_title='Image',
+            image=(
+                'https://res.cloudinary.com/dchoskzxj/image/upload/'
+                'v1721990160/yg9qwd4v15r23bxwv5u4.jpg'
+            ),
+            description='An image.',
+            shared=shared
+        )
+
+    def feed(self, user=None):
+        return list(
+            FeedItem.objects.filter(owner=user or self.reader)
+            .values_list('trip__title', 'image__image_title')
+        )
+
+    def test_fan_out_on_write(self, get_coordinates):
+        Follower.objects.create(owner=self.reader, followed=self.author)
+        trip = self.create_trip(title='Shared')
+        self.create_trip(title='Private', shared=False)
+        self.create_image(trip)
+        self.create_image(trip, shared=False)
+        self.assertEqual(self.feed(), [(None, 'Image'), ('Shared', None)])
+        self.assertEqual(self.feed(self.other), [])
+
+        trip.shared = False
+        trip.save()
+        self.assertEqual(self.feed(), [(None, 'Image')])
+        trip.shared = True
+        trip.save()
+        self.assertEqual(len(self.feed()), 2)
+        trip.delete()
+        self.assertEqual(self.feed(), [])
+
+    def test_follow_and_unfollow(self, get_coordinates):
+        trip = self.create_trip()
+        self.create_image(trip)
+        self.create_trip(shared=False)
+        follow = Follower.objects.create(
+            owner=self.reader, followed=self.author
+        )
+        self.assertEqual(len(self.feed()), 2)
+        follow.delete()
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_pull_mode(self, get_coordinates):
+        Follower.objects.create(owner=self.reader, followed=self.author)
+        Follower.objects.create(owner=self.other, followed=self.author)
+        self.create_trip(title='Pulled')
+        self.assertEqual(self.feed(), [])
+
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get('/feed/')
+        self.assertEqual(
+            [row['trip']['title'] for row in response.data['results']],
+            ['Pulled']
+        )
+        self.create_trip(title='Newer')
+        response = self.client.get('/feed/')
+        self.assertEqual(
+            [row['trip']['title'] for row in response.data['results']],
+            ['Newer', 'Pulled']
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=0, FEED_BACKFILL_SIZE=2)
+    def test_pull_is_bounded_per_user(self, get_coordinates):
+        Follower.objects.create(owner=self.reader, followed=self.author)
+        Follower.objects.create(owner=self.reader, followed=self.other)
+        self.create_trip(owner=self.other, title='Other')
+        for index in range(3):
+            self.create_trip(title=f'Trip {index}')
+        FeedItem.pull(self.reader)
+        self.assertCountEqual(
+            self.feed(),
+            [('Trip 2', None), ('Trip 1', None), ('Other', None)]
+        )
+
+    def test_image_sharing_changes(self, get_coordinates):
+        Follower.objects.create(owner=self.reader, followed=self.author)
+        image = self.create_image(self.create_trip(), shared=False)
+        self.assertEqual(len(self.feed()), 1)
+        image = Image.objects.get(pk=image.pk)
+        image.shared = True
+        image.save()
+        self.assertEqual(len(self.feed()), 2)
+
+        FeedItem.objects.filter(image=image).delete()
+        image.description = 'Edited.'
+        with CaptureQueriesContext(connection) as queries:
+            image.save()
+        self.assertNotIn(
+            'feed_feeditem', ' '.join(query['sql'] for query in queries)
+        )
+        image.shared = False
+        image.save()
+        self.assertEqual(len(self.feed()), 1)
+
+    def test_feed_pages(self, get_coordinates):
+        Follower.objects.create(owner=self.reader, followed=self.author)
+        Follower.objects.create(owner=self.reader, followed=self.other)
+        for index in range(3):
+            trip = self.create_trip(title=f'Trip {index}')
+            self.create_image(trip)
+        self.create_trip(owner=self.other, title='Other')
+        self.client.force_authenticate(user=self.reader)
+
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get('/feed/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        page = response.data['results']
+        self.assertEqual(len(page), 7)
+        self.assertEqual(page[0]['kind'], 'trip')
+        self.assertEqual(page[0]['actor'], 'other')
+        self.assertTrue(page[0]['trip']['is_following_owner'])
+        self.assertNotIn('images', page[0]['trip'])
+        self.assertEqual(page[1]['kind'], 'image')
+        self.assertNotIn('likes', page[1]['image'])
+
+        for index in range(5):
+            trip = self.create_trip(title=f'More {index}')
+            self.create_image(trip)
+        with CaptureQueriesContext(connection) as larger:
+            response = self.client.get('/feed/')
+        self.assertEqual(len(larger), len(first))
+        self.assertIsNone(response.data['previous'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 7)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get('/feed/')
+        self.assertIn(
+            response.status_code,
+            (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+        )
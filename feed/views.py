@@ -0,0 +1,57 @@
+from django.db.models import Prefetch
+from rest_framework import generics, permissions
+from api.pagination import KeysetPagination
+from followers.mixins import FollowingMapMixin
+from trips.models import Image, Trip
+from trips.utils import annotate_like_id
+from .models import FeedItem
+from .serializers import FeedItemSerializer
+
+
+class FeedList(FollowingMapMixin, generics.ListAPIView):
+    """
+    API view listing the home feed of the current user: the shared trips
+    and images of the users they follow, newest first.
+    Pages are read from the user's FeedItem rows with keyset pagination,
+    so every page costs the same number of queries and index range scans
+    whatever the size of the trip and image tables. The first page also
+    pulls the new content of followed users with too many followers for
+    fan-out on write.
+    Attributes:
+        serializer_class (FeedItemSerializer): Serializer class used for
+                                               the view.
+        permission_classes (list): Only authenticated users have a feed.
+        pagination_class (KeysetPagination): Cursor pagination on
+                                             (created_at, id).
+        cursor_ordering (tuple): The keyset ordering.
+    """
+
+    serializer_class = FeedItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        user = self.request.user
+        return FeedItem.objects.filter(owner=user).select_related(
+            'actor'
+        ).prefetch_related(
+            Prefetch(
+                'trip',
+                queryset=Trip.objects.select_related('owner__profile')
+            ),
+            Prefetch(
+                'image',
+                queryset=annotate_like_id(
+                    Image.objects.select_related('owner'), user
+                )
+            ),
+        )
+
+    def get_following_owner_ids(self, objects):
+        return {item.actor_id for item in objects}
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator.cursor_query_param not in request.query_params:
+            FeedItem.pull(request.user)
+        return super().list(request, *args, **kwargs)
@@ -0,0 +1,64 @@
+from .models import Follower
+
+
+class FollowingMapMixin:
+    """
+    View mixin resolving which owners of the serialized objects the
+    current user follows in a single query, instead of one query per
+    object. The map of followed user id to Follower id is passed to the
+    serializer as the `following` context entry.
+    Methods:
+        get_following_owner_ids(objects): The ids of the owners whose follow
+                                          status is needed; override to add
+                                          the owners of nested objects.
+        get_following_map(objects): Map the followed owner ids to the ids
+                                    of the current user's Follower rows.
+    """
+
+    def get_following_owner_ids(self, objects):
+        return {obj.owner_id for obj in objects}
+
+    def get_following_map(self, objects):
+        user = self.request.user
+        if not user.is_authenticated:
+            return {}
+        owner_ids = self.get_following_owner_ids(objects)
+        if not owner_ids:
+            return {}
+        return dict(
+            Follower.objects.filter(owner=user, followed__in=owner_ids)
+            .values_list('followed_id', 'id')
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        if args and args[0] is not None:
+            instance = args[0]
+            objects = instance if hasattr(instance, '__iter__') \
+                else [instance]
+            context = kwargs.setdefault(
+                'context', self.get_serializer_context()
+            )
+            context['following'] = self.get_following_map(objects)
+        return super().get_serializer(*args, **kwargs)
+
+
+class FollowingSerializerMixin:
+    """
+    Serializer mixin reading the follow status of the current user from
+    the `following` map of FollowingMapMixin, falling back to a query
+    when the serializer is used outside of such a view.
+    Methods:
+        get_following(owner_id): The id of the current user's Follower row
+                                 for the owner, or None.
+    """
+
+    def get_following(self, owner_id):
+        following = self.context.get('following')
+        if following is not None:
+            return following.get(owner_id)
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return None
+        return Follower.objects.filter(
+            owner=request.user, followed_id=owner_id
+        ).values_list('id', flat=True).first()
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
+from django.dispatch import receiver
+from api.cache import invalidate
 
 
 class Follower(models.Model):
@@ -38,6 +41,14 @@ class Follower(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ('owner', 'followed')
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.owner} follows {self.followed}"
+
+
+@receiver([post_save, post_delete], sender=Follower)
+def invalidate_followers(sender, **kwargs):
+    invalidate('followers')
@@ -1,4 +1,5 @@
 from rest_framework import generics, permissions
+from api.pagination import SelectablePagination
 from api.permissions import IsOwnerOrReadOnly
 from .models import Follower
 from .serializers import FollowerSerializer
@@ -21,8 +22,9 @@ class FollowerList(generics.ListCreateAPIView):
     """
 
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    queryset = Follower.objects.all()
+    queryset = Follower.objects.select_related('owner', 'followed')
     serializer_class = FollowerSerializer
+    pagination_class = SelectablePagination
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -1,6 +1,11 @@
-from django.db import models
+from django.db import connections, models, router
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
-from trips.models import Image
+from django.dispatch import receiver
+from django.utils import timezone
+from api.cache import invalidate
+from trips.models import Image, Trip
 
 
 class Like(models.Model):
@@ -15,10 +20,14 @@ class Like(models.Model):
         unique_together (list): Ensures that a user can only like a specific
                                     image once.
     Methods:
+        add(owner, image_ids): Like images, skipping those already liked.
+        remove(owner, image_ids): Remove the likes of images.
         __str__(): Returns a string representation of the like, showing the
                     owner and the image title.
     """
 
+    UPSERT_VENDORS = ('postgresql', 'sqlite')
+
     owner = models.ForeignKey(
         User,
         on_delete=models.CASCADE
@@ -35,6 +44,109 @@ class Like(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['owner',  'image']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+    @classmethod
+    def add(cls, owner, image_ids):
+        """
+        Like the given images in a single INSERT ... ON CONFLICT DO NOTHING,
+        so existing likes neither raise IntegrityError nor abort the
+        transaction. post_save is sent for the inserted likes only, which
+        keeps the counters exact under concurrent requests.
+        Returns:
+            list: The created likes.
+        """
+        image_ids = list(dict.fromkeys(image_ids))
+        if not image_ids:
+            return []
+        using = router.db_for_write(cls)
+        connection = connections[using]
+        if connection.vendor not in cls.UPSERT_VENDORS:
+            return cls._add_one_by_one(owner, image_ids, using)
+
+        now = timezone.now()
+        quote = connection.ops.quote_name
+        rows = ', '.join(['(%s, %s, %s)'] * len(image_ids))
+        params = []
+        for image_id in image_ids:
+            params += [
+                owner.pk, image_id,
+                connection.ops.adapt_datetimefield_value(now)
+            ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(cls._meta.db_table)} '
+                f'(owner_id, image_id, created_at) VALUES {rows} '
+                f'ON CONFLICT (owner_id, image_id) DO NOTHING '
+                f'RETURNING id, image_id',
+                params
+            )
+            inserted = cursor.fetchall()
+
+        likes = []
+        for like_id, image_id in inserted:
+            like = cls(id=like_id, owner=owner, image_id=image_id,
+                       created_at=now)
+            like._state.adding = False
+            like._state.db = using
+            post_save.send(
+                sender=cls, instance=like, created=True, update_fields=None,
+                raw=False, using=using
+            )
+            likes.append(like)
+        return likes
+
+    @classmethod
+    def _add_one_by_one(cls, owner, image_ids, using):
+        likes = []
+        for image_id in image_ids:
+            like, created = cls.objects.using(using).get_or_create(
+                owner=owner, image_id=image_id
+            )
+            if created:
+                likes.append(like)
+        return likes
+
+    @classmethod
+    def remove(cls, owner, image_ids):
+        """
+        Remove the likes of the given images with a single DELETE ...
+        RETURNING, sending post_delete for the rows actually deleted.
+        Returns:
+            list: The image ids whose like was removed.
+        """
+        image_ids = list(dict.fromkeys(image_ids))
+        if not image_ids:
+            return []
+        using = router.db_for_write(cls)
+        connection = connections[using]
+        if connection.vendor not in cls.UPSERT_VENDORS:
+            likes = list(cls.objects.using(using).filter(
+                owner=owner, image_id__in=image_ids
+            ))
+            for like in likes:
+                like.delete()
+            return [like.image_id for like in likes]
+
+        quote = connection.ops.quote_name
+        placeholders = ', '.join(['%s'] * len(image_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote(cls._meta.db_table)} '
+                f'WHERE owner_id = %s AND image_id IN ({placeholders}) '
+                f'RETURNING id, image_id',
+                [owner.pk, *image_ids]
+            )
+            deleted = cursor.fetchall()
+
+        for like_id, image_id in deleted:
+            like = cls(id=like_id, owner=owner, image_id=image_id)
+            post_delete.send(
+                sender=cls, instance=like, origin=like, using=using
+            )
+        return [image_id for _, image_id in deleted]
 
     def __str__(self):
         """
@@ -50,3 +162,31 @@ class Like(models.Model):
             if self.image.image_title else "Untitled Image"
         )
         return f'{self.owner} liked {image_title}'
+
+
+def update_like_counters(image_id, delta):
+    """
+    Add `delta` to the like counters of an image and of its trip.
+    """
+    Image.objects.filter(pk=image_id).update(
+        likes_count=F('likes_count') + delta
+    )
+    Trip.objects.filter(images=image_id).update(
+        total_likes_count=F('total_likes_count') + delta
+    )
+
+
+@receiver(post_save, sender=Like)
+def count_created_like(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_like_counters(instance.image_id, 1)
+
+
+@receiver(post_delete, sender=Like)
+def count_deleted_like(sender, instance, **kwargs):
+    update_like_counters(instance.image_id, -1)
+
+
+@receiver([post_save, post_delete], sender=Like)
+def invalidate_likes(sender, **kwargs):
+    invalidate('likes')
@@ -1,4 +1,3 @@
-from django.db import IntegrityError
 from rest_framework import serializers
 from .models import Like
 
@@ -21,7 +20,9 @@ class LikeSerializer(serializers.ModelSerializer):
     Methods:
         create(validated_data):
             Creates a new Like instance, raising a validation error if
-                a duplicate like is detected.
+                a duplicate like is detected. Duplicates are skipped by
+                the insert instead of failing it, so the transaction is
+                not aborted.
     """
 
     owner = serializers.ReadOnlyField(source="owner.username")
@@ -39,9 +40,46 @@ class LikeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'image': 'This field is required.'}
             )
-        try:
-            return super().create(validated_data)
-        except IntegrityError as err:
+        likes = Like.add(validated_data['owner'], [image.pk])
+        if not likes:
             raise serializers.ValidationError(
                 {'detail': 'You have already liked this image.'}
-            ) from err
+            )
+        return likes[0]
+
+
+class LikeBulkSerializer(serializers.Serializer):
+    """
+    Serializer validating a batch of likes and unlikes synced at once.
+    Attributes:
+        like (ListField): Ids of the images to like.
+        unlike (ListField): Ids of the images to unlike.
+    Methods:
+        validate(data): Rejects empty batches and images listed twice.
+    """
+
+    MAX_IMAGES = 100
+
+    like = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=MAX_IMAGES,
+        required=False,
+        default=list
+    )
+    unlike = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=MAX_IMAGES,
+        required=False,
+        default=list
+    )
+
+    def validate(self, data):
+        if not data['like'] and not data['unlike']:
+            raise serializers.ValidationError(
+                'Expected images to like or unlike.'
+            )
+        if set(data['like']) & set(data['unlike']):
+            raise serializers.ValidationError(
+                'An image cannot be liked and unliked at once.'
+            )
+        return data
@@ -1,3 +1,4 @@
+from unittest import mock
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -99,3 +100,159 @@ class LikeViewTests(TestCase):
             response.status_code,
             status.HTTP_201_CREATED
         )
+
+
+@mock.patch('trips.models.get_coordinates', return_value=(40.7, -74.0))
+class LikeCursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='admin',
+            password='pass'
+        )
+
+    def test_walk_likes_with_cursor(self, get_coordinates):
+        trip = Trip.objects.create(
+            title='Test Trip',
+            owner=self.user,
+            place='New York',
+            country='USA',
+            trip_category='Adventure',
+            start_date='2025-03-01',
+            end_date='2025-03-10',
+            trip_status='Planned'
+        )
+        for number in range(15):
+            image = Image.objects.create(
+                owner=self.user,
+                trip=trip,
+                image=(
+                    'https://res.cloudinary.com/dchoskzxj/image/upload/'
+                    'v1721990160/yg9qwd4v15r23bxwv5u4.jpg'
+                ),
+                image_title=f'image {number}'
+            )
+            Like.objects.create(owner=self.user, image=image)
+
+        response = self.client.get('/likes/?pagination=cursor')
+        self.assertNotIn('count', response.data)
+        likes = [like['id'] for like in response.data['results']]
+        response = self.client.get(response.data['next'])
+        likes += [like['id'] for like in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            likes,
+            list(Like.objects.order_by('-created_at', '-id')
+                 .values_list('id', flat=True))
+        )
+
+
+@mock.patch('trips.models.get_coordinates', return_value=(40.7, -74.0))
+class LikeToggleTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(
+            username='owner',
+            password='pass'
+        )
+        self.user = User.objects.create_user(
+            username='admin',
+            password='pass'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_images(self, *shared):
+        trip = Trip.objects.create(
+            title='Test Trip',
+            owner=self.owner,
+            place='New York',
+            country='USA',
+            trip_category='Adventure',
+            start_date='2025-03-01',
+            end_date='2025-03-10',
+            trip_status='Planned'
+        )
+        return [
+            Image.objects.create(
+                owner=self.owner,
+                trip=trip,
+                image=(
+                    'https://res.cloudinary.com/dchoskzxj/image/upload/'
+                    'v1721990160/yg9qwd4v15r23bxwv5u4.jpg'
+                ),
+                image_title='image title',
+                shared=is_shared
+            )
+            for is_shared in shared
+        ]
+
+    def test_toggle_is_idempotent(self, get_coordinates):
+        image, private = self.create_images(True, False)
+        url = f'/gallery/{image.pk}/like/'
+        for _ in range(2):
+            response = self.client.put(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.data['liked'])
+            self.assertEqual(response.data['likes_count'], 1)
+        like = Like.objects.get()
+        self.assertEqual(response.data['like_id'], like.pk)
+        image.trip.refresh_from_db()
+        self.assertEqual(image.trip.total_likes_count, 1)
+        self.owner.stats.refresh_from_db()
+        self.assertEqual(self.owner.stats.likes_count, 1)
+
+        for _ in range(2):
+            response = self.client.delete(url)
+            self.assertFalse(response.data['liked'])
+            self.assertIsNone(response.data['like_id'])
+            self.assertEqual(response.data['likes_count'], 0)
+        self.assertFalse(Like.objects.exists())
+        self.owner.stats.refresh_from_db()
+        self.assertEqual(self.owner.stats.likes_count, 0)
+
+        response = self.client.put(f'/gallery/{private.pk}/like/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=None)
+        response = self.client.put(url)
+        self.assertIn(
+            response.status_code,
+            (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+        )
+
+    def test_duplicate_post_is_rejected(self, get_coordinates):
+        image, = self.create_images(True)
+        for expected in (status.HTTP_201_CREATED, status.HTTP_400_BAD_REQUEST):
+            response = self.client.post('/likes/', {'image': image.pk})
+            self.assertEqual(response.status_code, expected)
+        image.refresh_from_db()
+        self.assertEqual(image.likes_count, 1)
+
+    def test_bulk_sync(self, get_coordinates):
+        first, second, private = self.create_images(True, True, False)
+        Like.objects.create(owner=self.user, image=second)
+        response = self.client.post(
+            '/likes/bulk/',
+            {'like': [first.pk, first.pk, private.pk, 999999],
+             'unlike': [second.pk]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['image'], row['liked'], row['likes_count'])
+             for row in response.data['results']],
+            [(first.pk, True, 1), (second.pk, False, 0)]
+        )
+        self.assertEqual(response.data['skipped'], [private.pk, 999999])
+        self.assertEqual(
+            list(Like.objects.values_list('image_id', flat=True)),
+            [first.pk]
+        )
+
+        response = self.client.post(
+            '/likes/bulk/',
+            {'like': [first.pk], 'unlike': [first.pk]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/likes/bulk/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -12,4 +12,14 @@ urlpatterns = [
         views.LikeDetail.as_view(),
         name='likes-detail'
     ),
+    path(
+        'likes/bulk/',
+        views.LikeBulk.as_view(),
+        name='likes-bulk'
+    ),
+    path(
+        'gallery/<int:pk>/like/',
+        views.ImageLikeToggle.as_view(),
+        name='image-like'
+    ),
 ]
@@ -1,8 +1,47 @@
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404
 from rest_framework import generics
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import (
+    IsAuthenticated, IsAuthenticatedOrReadOnly
+)
+from rest_framework.response import Response
+from api.pagination import SelectablePagination
 from api.permissions import IsOwnerOrReadOnly
 from likes.models import Like
-from likes.serializers import LikeSerializer
+from likes.serializers import LikeBulkSerializer, LikeSerializer
+from trips.models import Image
+from trips.utils import annotate_like_id
+
+
+def visible_image_ids(user, image_ids):
+    """
+    Return the ids among `image_ids` of the images the user can see and
+    like: shared images and their own.
+    """
+    return set(
+        Image.objects.filter(Q(shared=True) | Q(owner=user))
+        .filter(pk__in=image_ids).values_list('pk', flat=True)
+    )
+
+
+def like_states(user, image_ids):
+    """
+    Return the like state of images for the user, with their counters,
+    read in one query.
+    """
+    images = annotate_like_id(
+        Image.objects.filter(pk__in=image_ids), user
+    ).order_by('pk').values('pk', 'like_id', 'likes_count')
+    return [
+        {
+            'image': image['pk'],
+            'liked': image['like_id'] is not None,
+            'like_id': image['like_id'],
+            'likes_count': image['likes_count'],
+        }
+        for image in images
+    ]
 
 
 # Create your views here.
@@ -23,7 +62,8 @@ class LikeList(generics.ListCreateAPIView):
 
     permission_classes = [IsAuthenticatedOrReadOnly]
     serializer_class = LikeSerializer
-    queryset = Like.objects.all()
+    pagination_class = SelectablePagination
+    queryset = Like.objects.select_related('owner')
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -43,3 +83,69 @@ class LikeDetail(generics.RetrieveDestroyAPIView):
     permission_classes = [IsOwnerOrReadOnly]
     serializer_class = LikeSerializer
     queryset = Like.objects.all()
+
+
+class ImageLikeToggle(generics.GenericAPIView):
+    """
+    Idempotent like toggle of an image for the current user.
+    - PUT: Likes the image; liking it again changes nothing.
+    - DELETE: Removes the like, if any.
+    Both answer with the like state and the new like count of the image,
+    so clients need no lookup of the like id and no second request. The
+    like is written with a single conflict-tolerant INSERT or DELETE.
+    Attributes:
+        permission_classes (list): Only authenticated users can like.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def toggle(self, request, pk, liked):
+        with transaction.atomic():
+            if not visible_image_ids(request.user, [pk]):
+                raise Http404
+            if liked:
+                Like.add(request.user, [pk])
+            else:
+                Like.remove(request.user, [pk])
+        return Response(like_states(request.user, [pk])[0])
+
+    def put(self, request, pk, *args, **kwargs):
+        return self.toggle(request, pk, liked=True)
+
+    def delete(self, request, pk, *args, **kwargs):
+        return self.toggle(request, pk, liked=False)
+
+
+class LikeBulk(generics.GenericAPIView):
+    """
+    API view syncing many likes and unlikes at once, e.g. from offline
+    clients, in one transaction: one INSERT for the likes and one DELETE
+    for the unlikes. Images the user cannot see are skipped.
+    Returns the like state of every synced image and the skipped ids.
+    Attributes:
+        permission_classes (list): Only authenticated users can like.
+        serializer_class (LikeBulkSerializer): Validates the batch.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = LikeBulkSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        like = serializer.validated_data['like']
+        unlike = serializer.validated_data['unlike']
+        requested = set(like) | set(unlike)
+
+        with transaction.atomic():
+            visible = visible_image_ids(request.user, requested)
+            Like.add(
+                request.user, [pk for pk in like if pk in visible]
+            )
+            Like.remove(
+                request.user, [pk for pk in unlike if pk in visible]
+            )
+        return Response({
+            'results': like_states(request.user, visible),
+            'skipped': sorted(requested - visible),
+        })
@@ -0,0 +1,70 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from api.utils import count_of
+from followers.models import Follower
+from likes.models import Like
+from profiles.models import ProfileStats
+from trips.models import Image, Trip
+
+
+class Command(BaseCommand):
+    """
+    Verify the precomputed profile statistics against the actual counts
+    and repair the rows that drifted, e.g. after writes bypassing the
+    model signals. Meant to run periodically; with --verify, only report.
+    Missing stats rows are created.
+    """
+
+    help = 'Verify and repair the precomputed profile statistics.'
+
+    COUNTS = {
+        'trips_count': (Trip.objects.all(), 'owner'),
+        'images_count': (Image.objects.all(), 'trip__owner'),
+        'likes_count': (Like.objects.all(), 'image__trip__owner'),
+        'followers_count': (Follower.objects.all(), 'followed'),
+        'following_count': (Follower.objects.all(), 'owner'),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Report the drifted rows without repairing them.'
+        )
+
+    def handle(self, *args, **options):
+        actual = {
+            f'actual_{name}': count_of(queryset, field)
+            for name, (queryset, field) in self.COUNTS.items()
+        }
+        drift = Q()
+        for name in self.COUNTS:
+            drift |= ~Q(**{name: F(f'actual_{name}')})
+
+        with transaction.atomic():
+            missing = User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+            if options['verify']:
+                created = missing.count()
+            else:
+                created = len(ProfileStats.objects.bulk_create(
+                    (ProfileStats(owner_id=pk) for pk in missing),
+                    ignore_conflicts=True
+                ))
+
+            drifted = ProfileStats.objects.annotate(**actual).filter(drift)
+            if options['verify']:
+                repaired = drifted.count()
+            else:
+                repaired = drifted.update(**{
+                    name: count_of(queryset, field)
+                    for name, (queryset, field) in self.COUNTS.items()
+                })
+
+        action = 'found' if options['verify'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{created} missing and {repaired} drifted profile stats {action}.'
+        ))
@@ -0,0 +1,72 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field):
+    # A frozen copy of api.utils.count_of: migrations must not depend on
+    # app code that may change after they are written.
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def fill_profile_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    ProfileStats = apps.get_model('profiles', 'ProfileStats')
+    Trip = apps.get_model('trips', 'Trip')
+    Image = apps.get_model('trips', 'Image')
+    Like = apps.get_model('likes', 'Like')
+    Follower = apps.get_model('followers', 'Follower')
+    ProfileStats.objects.bulk_create(
+        (ProfileStats(owner_id=pk)
+         for pk in User.objects.values_list('pk', flat=True)),
+        batch_size=1000
+    )
+    ProfileStats.objects.update(
+        trips_count=count_of(Trip.objects.all(), 'owner'),
+        images_count=count_of(Image.objects.all(), 'trip__owner'),
+        likes_count=count_of(Like.objects.all(), 'image__trip__owner'),
+        followers_count=count_of(Follower.objects.all(), 'followed'),
+        following_count=count_of(Follower.objects.all(), 'owner'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('profiles', '0001_initial'),
+        ('trips', '0007_trip_image_counters'),
+        ('likes', '0002_like_keyset_index'),
+        ('followers', '0002_follower_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileStats',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('trips_count', models.PositiveIntegerField(default=0)),
+                ('images_count', models.PositiveIntegerField(default=0)),
+                ('likes_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'profile stats',
+                'indexes': [models.Index(fields=['trips_count'], name='profiles_pr_trips_c_bc9269_idx'), models.Index(fields=['followers_count'], name='profiles_pr_followe_805ade_idx'), models.Index(fields=['following_count'], name='profiles_pr_followi_e07a65_idx')],
+            },
+        ),
+        migrations.RunPython(fill_profile_stats, migrations.RunPython.noop),
+    ]
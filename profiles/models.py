@@ -1,8 +1,16 @@
+from collections import Counter
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
+from api.cache import invalidate
+from followers.models import Follower
+from likes.models import Like
+from trips.models import Image, Trip
+from trips.signals import trips_bulk_created
 from trips.utils import validate_image
 
 
@@ -59,6 +67,59 @@ class Profile(models.Model):
         return f"{self.owner}'s profile"
 
 
+class ProfileStats(models.Model):
+    """
+    Precomputed statistics of a user's profile.
+    The counters are maintained incrementally with F() updates by the
+    Trip, Image, Like and Follower signal receivers below, and verified
+    by the repair_profile_stats command.
+    Attributes:
+        owner (User): The user, also the primary key.
+        trips_count (int): Number of trips of the user.
+        images_count (int): Number of images of the user's trips.
+        likes_count (int): Number of likes of the images of the user's trips.
+        followers_count (int): Number of users following the user.
+        following_count (int): Number of users the user follows.
+    """
+    owner = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE
+    )
+    trips_count = models.PositiveIntegerField(default=0)
+    images_count = models.PositiveIntegerField(default=0)
+    likes_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    COUNTERS = (
+        'trips_count', 'images_count', 'likes_count', 'followers_count',
+        'following_count',
+    )
+
+    class Meta:
+        verbose_name_plural = 'profile stats'
+        indexes = [
+            models.Index(fields=['trips_count']),
+            models.Index(fields=['followers_count']),
+            models.Index(fields=['following_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.owner}'s profile stats"
+
+    @classmethod
+    def increment(cls, lookup, **counters):
+        """
+        Add the given amounts to the counters of the stats matching the
+        lookup, e.g. increment({'owner': user_id}, followers_count=1).
+        """
+        cls.objects.filter(**lookup).update(**{
+            name: F(name) + amount for name, amount in counters.items()
+        })
+
+
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     """
@@ -74,3 +135,91 @@ def create_profile(sender, instance, created, **kwargs):
     """
     if created:
         Profile.objects.create(owner=instance)
+        ProfileStats.objects.create(owner=instance)
+
+
+@receiver(post_save, sender=User)
+def touch_profile(sender, instance, created, raw=False, update_fields=None,
+                  **kwargs):
+    """
+    Bump the profile timestamp when a user is saved, so the conditional
+    GET validators of the views showing the username change, and drop the
+    cached anonymous responses showing it. Saves of other fields only,
+    such as the last_login update on every login, are ignored.
+    """
+    if created or raw:
+        return
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    Profile.objects.filter(owner=instance).update(updated_at=timezone.now())
+    invalidate('profiles', 'trips', 'images')
+
+
+@receiver(post_save, sender=Trip)
+def count_created_trip(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProfileStats.increment({'owner': instance.owner_id}, trips_count=1)
+
+
+@receiver(trips_bulk_created)
+def count_bulk_created_trips(sender, trips, **kwargs):
+    owners = Counter(trip.owner_id for trip in trips)
+    for owner_id, count in owners.items():
+        ProfileStats.increment({'owner': owner_id}, trips_count=count)
+
+
+@receiver(post_delete, sender=Trip)
+def count_deleted_trip(sender, instance, **kwargs):
+    ProfileStats.increment({'owner': instance.owner_id}, trips_count=-1)
+
+
+@receiver(post_save, sender=Image)
+def count_created_image(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProfileStats.increment(
+            {'owner__trips': instance.trip_id}, images_count=1
+        )
+
+
+@receiver(post_delete, sender=Image)
+def count_deleted_image(sender, instance, **kwargs):
+    """
+    Images are deleted before their trip, so the trip still exists when
+    a trip deletion cascades.
+    """
+    ProfileStats.increment({'owner__trips': instance.trip_id}, images_count=-1)
+
+
+@receiver(post_save, sender=Like)
+def count_created_like(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProfileStats.increment(
+            {'owner__trips__images': instance.image_id}, likes_count=1
+        )
+
+
+@receiver(post_delete, sender=Like)
+def count_deleted_like(sender, instance, **kwargs):
+    ProfileStats.increment(
+        {'owner__trips__images': instance.image_id}, likes_count=-1
+    )
+
+
+@receiver(post_save, sender=Follower)
+def count_created_follower(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProfileStats.increment(
+            {'owner': instance.followed_id}, followers_count=1
+        )
+        ProfileStats.increment({'owner': instance.owner_id}, following_count=1)
+
+
+@receiver(post_delete, sender=Follower)
+def count_deleted_follower(sender, instance, **kwargs):
+    ProfileStats.increment({'owner': instance.followed_id}, followers_count=-1)
+    ProfileStats.increment({'owner': instance.owner_id}, following_count=-1)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profiles(sender, **kwargs):
+    invalidate('profiles')
@@ -1,10 +1,11 @@
 from rest_framework import serializers
 from cloudinary.utils import cloudinary_url
 from .models import Profile
-from followers.models import Follower
+from followers.mixins import FollowingSerializerMixin
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(FollowingSerializerMixin,
+                        serializers.ModelSerializer):
     """
     Serializer for the Profile model.
     This serializer handles the serialization and deserialization of Profile
@@ -65,7 +66,8 @@ class ProfileSerializer(serializers.ModelSerializer):
     def get_following_id(self, obj):
         """
         Retrieve the ID of the following relationship between the
-        authenticated user and the owner of the given object.
+        authenticated user and the owner of the given object, from the
+        follow map of the profile views when available.
         Args:
             obj: The object whose owner's following relationship
                 is to be checked.
@@ -73,15 +75,7 @@ class ProfileSerializer(serializers.ModelSerializer):
             int or None: The ID of the following relationship if it exists,
                 otherwise None.
         """
-        user = self.context['request'].user
-
-        if user.is_authenticated:
-            following = Follower.objects.filter(
-                owner=user,
-                followed=obj.owner
-            ).first()
-            return following.id if following else None
-        return None
+        return self.get_following(obj.owner_id)
 
     def get_image(self, obj):
         """
@@ -1,6 +1,15 @@
+from io import StringIO
+from unittest import mock
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
+from followers.models import Follower
+from likes.models import Like
+from trips.models import Image, Trip
+from .models import ProfileStats
 
 
 class ProfilePageAccessTests(APITestCase):
@@ -15,3 +24,131 @@ class ProfilePageAccessTests(APITestCase):
         response = self.client.get(f'/profiles/{self.user.pk}/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         print(response.data)
+
+
+@mock.patch('trips.models.get_coordinates', return_value=(59.91, 10.75))
+class ProfileStatsTests(APITestCase):
+    '''
+    Test the precomputed profile statistics.
+    '''
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='p')
+        self.fan = User.objects.create_user(username='fan', password='p')
+
+    def create_trip(self):
+        trip = Trip.objects.create(
+            owner=self.owner,
+            title='Trip',
+            place='Oslo',
+            country='Norway',
+            trip_category='Adventure',
+            trip_status='Planned',
+            start_date='2025-03-01',
+            end_date='2025-03-10'
+        )
+        image = Image.objects.create(
+            owner=self.owner,
+            trip=trip,
+            image_title='Image',
+            image=(
+                'https://res.cloudinary.com/dchoskzxj/image/upload/'
+                'v1721990160/yg9qwd4v15r23bxwv5u4.jpg'
+            ),
+            description='An image.'
+        )
+        Like.objects.create(owner=self.fan, image=image)
+        return trip
+
+    def get_stats(self, user):
+        response = self.client.get(f'/profiles/{user.profile.pk}/')
+        return {name: response.data[name] for name in ProfileStats.COUNTERS}
+
+    def test_stats_follow_writes(self, get_coordinates):
+        trip = self.create_trip()
+        self.create_trip()
+        Follower.objects.create(owner=self.fan, followed=self.owner)
+        self.assertEqual(self.get_stats(self.owner), {
+            'trips_count': 2, 'images_count': 2, 'likes_count': 2,
+            'followers_count': 1, 'following_count': 0,
+        })
+        self.assertEqual(self.get_stats(self.fan)['following_count'], 1)
+
+        trip.delete()
+        Follower.objects.all().delete()
+        self.assertEqual(self.get_stats(self.owner), {
+            'trips_count': 1, 'images_count': 1, 'likes_count': 1,
+            'followers_count': 0, 'following_count': 0,
+        })
+        self.assertEqual(self.get_stats(self.fan)['following_count'], 0)
+
+    def test_ordering_by_followers(self, get_coordinates):
+        Follower.objects.create(owner=self.owner, followed=self.fan)
+        response = self.client.get('/profiles/?ordering=-followers_count')
+        self.assertEqual(
+            [profile['owner'] for profile in response.data['results']],
+            ['fan', 'owner']
+        )
+
+    def test_repair(self, get_coordinates):
+        self.create_trip()
+        ProfileStats.objects.filter(owner=self.owner).update(
+            trips_count=5, likes_count=0
+        )
+        ProfileStats.objects.filter(owner=self.fan).delete()
+
+        out = StringIO()
+        call_command('repair_profile_stats', '--verify', stdout=out)
+        self.assertIn('1 missing and 1 drifted', out.getvalue())
+        self.assertEqual(ProfileStats.objects.count(), 1)
+
+        call_command('repair_profile_stats', stdout=out)
+        self.assertEqual(self.get_stats(self.owner)['trips_count'], 1)
+        self.assertEqual(self.get_stats(self.owner)['likes_count'], 1)
+        self.assertTrue(ProfileStats.objects.filter(owner=self.fan).exists())
+
+        out = StringIO()
+        call_command('repair_profile_stats', stdout=out)
+        self.assertIn('0 missing and 0 drifted', out.getvalue())
+
+
+class ProfileFollowingTests(APITestCase):
+    '''
+    Test that the follow status of the listed profiles is resolved in a
+    single query.
+    '''
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', password='p')
+        self.client.force_authenticate(user=self.viewer)
+
+    def test_following_id(self):
+        users = [
+            User.objects.create_user(username=f'user{i}', password='p')
+            for i in range(2)
+        ]
+        follower = Follower.objects.create(
+            owner=self.viewer, followed=users[0]
+        )
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/profiles/')
+        users += [
+            User.objects.create_user(username=f'user{i}', password='p')
+            for i in range(2, 6)
+        ]
+        for user in users[1:]:
+            Follower.objects.create(owner=self.viewer, followed=user)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get('/profiles/')
+        self.assertEqual(len(many), len(few))
+
+        following = {
+            profile['owner']: profile['following_id']
+            for profile in response.data['results']
+        }
+        self.assertEqual(following['user0'], follower.id)
+        self.assertIsNone(following['viewer'])
+        self.assertEqual(
+            self.client.get(
+                f'/profiles/{users[0].profile.pk}/'
+            ).data['following_id'],
+            follower.id
+        )
@@ -1,4 +1,4 @@
-from django.db.models import Count
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from rest_framework import generics, filters
@@ -7,39 +7,63 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenViewBase
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django_filters.rest_framework import DjangoFilterBackend
+from api.cache import AnonymousResponseCacheMixin
+from api.mixins import ConditionalGetMixin
 from api.permissions import IsOwnerOrReadOnly
-from .models import Profile
+from followers.mixins import FollowingMapMixin
+from followers.models import Follower
+from .models import Profile, ProfileStats
 from .serializers import ProfileSerializer
 
 
-class ProfileList(generics.ListAPIView):
+def profiles_with_stats():
     """
-    API view to retrieve a list of profiles with annotated counts and
-    filtering options.
+    Profiles with their owners, annotated with the counters of their
+    precomputed stats.
+    """
+    return Profile.objects.select_related('owner').annotate(**{
+        name: F(f'owner__stats__{name}') for name in ProfileStats.COUNTERS
+    })
+
+
+class ProfileConditionalGetMixin(ConditionalGetMixin):
+    """
+    Conditional GET validators of the profile views: the profile
+    timestamps, the precomputed counters and the follows of the user.
+    """
+
+    validator_counters = tuple(
+        f'owner__stats__{name}' for name in ProfileStats.COUNTERS
+    )
+    viewer_relations = ((Follower, 'owner'),)
+
+
+class ProfileList(AnonymousResponseCacheMixin, ProfileConditionalGetMixin,
+                  FollowingMapMixin, generics.ListAPIView):
+    """
+    API view to retrieve a list of profiles with their precomputed counts
+    and filtering options.
 
     Attributes:
         serializer_class (ProfileSerializer): The serializer class used for
                                                 the profiles.
-        queryset (QuerySet): The queryset of profiles with annotated counts
-                                for trips, images, likes, followers, and
-                                following profiles.
+        queryset (QuerySet): The queryset of profiles with the counts of
+                                trips, images, likes, followers, and
+                                following profiles read from ProfileStats.
         filter_backends (list): List of filter backends used for ordering and
                                     filtering the queryset.
         filterset_fields (list): List of fields that can be used for filtering
                                     the queryset.
         ordering_fields (list): List of fields that can be used for ordering
                                     the queryset.
+        cache_resources (tuple): Resources whose writes invalidate the
+                                 cached anonymous responses.
     """
     serializer_class = ProfileSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    cache_resources = ('profiles', 'trips', 'images', 'likes', 'followers')
 
-    queryset = Profile.objects.annotate(
-        trips_count=Count('owner__trips', distinct=True),
-        images_count=Count('owner__trips__images', distinct=True),
-        likes_count=Count('owner__trips__images', distinct=True),
-        followers_count=Count('owner__followed', distinct=True),
-        following_count=Count('owner__following', distinct=True)
-    ).order_by('-created_at')
+    queryset = profiles_with_stats().order_by('-created_at')
 
     filter_backends = [
         filters.OrderingFilter,
@@ -62,29 +86,26 @@ class ProfileList(generics.ListAPIView):
         ]
 
 
-class ProfileDetail(generics.RetrieveUpdateDestroyAPIView):
+class ProfileDetail(ProfileConditionalGetMixin, FollowingMapMixin,
+                    generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a profile instance.
     This view allows the owner of the profile to update or delete it, while
     other users can only read the profile details. The profile details include
-    counts of trips, images, followers, and following.
+    counts of trips, images, likes, followers, and following.
     Attributes:
         permission_classes (list): List of permission classes that determine
             access to this view. Only the owner can update or delete a profile.
         serializer_class (ProfileSerializer): The serializer class used to
             serialize and deserialize profile instances.
         queryset (QuerySet): The queryset used to retrieve profile instances,
-            annotated with counts of trips, images, followers, and following,
-            and ordered by creation date in descending order.
+            with the counts of trips, images, likes, followers, and following
+            read from ProfileStats, and ordered by creation date in
+            descending order.
     """
     permission_classes = [IsOwnerOrReadOnly]
     serializer_class = ProfileSerializer
-    queryset = Profile.objects.annotate(
-        trips_count=Count('owner__trips', distinct=True),
-        images_count=Count('owner__trips__images', distinct=True),
-        followers_count=Count('owner__followed', distinct=True),
-        following_count=Count('owner__following', distinct=True)
-    ).order_by('-created_at')
+    queryset = profiles_with_stats().order_by('-created_at')
 
 
 class ExtendedTokenObtainPairView(TokenViewBase):
@@ -1,5 +1,14 @@
 from django.contrib import admin
-from .models import Trip, Image
+from .models import (
+    Trip, Image, GeocodedLocation, GeocodeJob, TripCluster, TrendingImage,
+    TrendingState, TrendingTrip
+)
 
 admin.site.register(Trip)
 admin.site.register(Image)
+admin.site.register(GeocodedLocation)
+admin.site.register(GeocodeJob)
+admin.site.register(TripCluster)
+admin.site.register(TrendingImage)
+admin.site.register(TrendingTrip)
+admin.site.register(TrendingState)
@@ -0,0 +1,375 @@
+"""
+Pluggable geocoding backends used by `trips.utils.get_coordinates`.
+
+The backends listed in the GEOCODER_BACKENDS setting are tried in order
+and the first one that finds the location wins, e.g. the offline
+GeoNames gazetteer first and Nominatim as a fallback.
+"""
+import abc
+import logging
+import random
+import threading
+import time
+from array import array
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from geopy import geocoders
+from geopy.adapters import RequestsAdapter
+from geopy.exc import (
+    GeocoderQueryError, GeocoderRateLimited, GeocoderTimedOut,
+    GeocoderUnavailable,
+)
+from .countries import country_code, fold_name
+
+logger = logging.getLogger(__name__)
+
+
+class BaseGeocoder(abc.ABC):
+    """
+    Interface of a geocoding backend.
+    Methods:
+        geocode(location): Return (latitude, longitude) for a
+                           "place, country" string, or None if the backend
+                           does not know the location. Service failures
+                           raise a geopy exception.
+    """
+
+    @abc.abstractmethod
+    def geocode(self, location):
+        pass
+
+
+class RateLimiter:
+    """
+    Per-process rate limiter spacing calls at least `min_interval` seconds
+    apart, e.g. 1 second for the Nominatim usage policy.
+    Methods:
+        wait(): Block until the next call is allowed.
+    """
+
+    def __init__(self, min_interval=1.0):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_call = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._next_call > now:
+                time.sleep(self._next_call - now)
+                now = self._next_call
+            self._next_call = now + self.min_interval
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker protecting a degraded upstream service.
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls fail fast for `reset_timeout` seconds. Then a single trial call is
+    let through (half-open): success closes the circuit, failure opens it
+    again.
+    Methods:
+        allow(): Whether a call may be made now.
+        record_success(): Close the circuit.
+        record_failure(): Count a failure, opening the circuit if needed.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class NominatimGeocoder(BaseGeocoder):
+    """
+    Geocoding backend calling the OpenStreetMap Nominatim service.
+    One instance is shared by the whole process (see get_geocoders()), so
+    the underlying requests session and its HTTP connections are reused.
+    Requests are spaced by a rate limiter (Nominatim allows 1 request per
+    second), transient errors are retried with exponential backoff and
+    full jitter, and a circuit breaker fails fast while the service is
+    unhealthy. Every call ends by recording a success or a failure on the
+    breaker: rejected queries count as successes, since the service
+    answered, and any other error as a failure without retry.
+    GeoPy documentation:
+    https://geopy.readthedocs.io/en/latest/#geopy.exc.GeocoderTimedOut
+    Attributes:
+        max_attempts (int): Maximum attempts per location.
+        backoff (float): Base retry delay in seconds.
+        max_backoff (float): Upper bound of the retry delay in seconds.
+    """
+
+    RETRY_ERRORS = (
+        GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited,
+    )
+
+    def __init__(self, max_attempts=None, backoff=None, max_backoff=None):
+        self.max_attempts = max_attempts or getattr(
+            settings, 'GEOCODER_MAX_ATTEMPTS', 3
+        )
+        self.backoff = backoff or getattr(settings, 'GEOCODER_BACKOFF', 0.5)
+        self.max_backoff = max_backoff or getattr(
+            settings, 'GEOCODER_MAX_BACKOFF', 8.0
+        )
+        self.client = geocoders.Nominatim(
+            user_agent=getattr(settings, 'GEOCODER_USER_AGENT', 'trip'),
+            timeout=getattr(settings, 'GEOCODER_TIMEOUT', 5),
+            adapter_factory=RequestsAdapter
+        )
+        self.rate_limiter = RateLimiter(
+            getattr(settings, 'GEOCODER_MIN_INTERVAL', 1.0)
+        )
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=getattr(
+                settings, 'GEOCODER_BREAKER_THRESHOLD', 5
+            ),
+            reset_timeout=getattr(settings, 'GEOCODER_BREAKER_RESET', 60.0)
+        )
+
+    def retry_delay(self, attempt, error):
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after:
+            return min(self.max_backoff, retry_after)
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** attempt)
+        )
+
+    def geocode(self, location):
+        for attempt in range(self.max_attempts):
+            if not self.circuit_breaker.allow():
+                raise GeocoderUnavailable(
+                    "Nominatim is unavailable (circuit breaker open)"
+                )
+            self.rate_limiter.wait()
+            try:
+                get_location = self.client.geocode(
+                    location,
+                    exactly_one=True,
+                    language='en'
+                )
+            except self.RETRY_ERRORS as e:
+                self.circuit_breaker.record_failure()
+                if attempt + 1 >= self.max_attempts:
+                    raise
+                time.sleep(self.retry_delay(attempt, e))
+                continue
+            except GeocoderQueryError:
+                self.circuit_breaker.record_success()
+                raise
+            except Exception:
+                self.circuit_breaker.record_failure()
+                raise
+
+            self.circuit_breaker.record_success()
+            if get_location:
+                return get_location.latitude, get_location.longitude
+            return None
+
+
+class GazetteerGeocoder(BaseGeocoder):
+    """
+    Offline geocoding backend reading a GeoNames dump
+    (e.g. cities500.txt from https://download.geonames.org/export/dump/).
+    The tab-separated file is loaded once per process, on first use.
+    Coordinates are compacted into `array` buffers and looked up through a
+    dictionary keyed by the normalized place name and ISO country code.
+    When several places share a key, the most populous one is kept.
+    Without a configured path the backend finds nothing, so the next
+    backend in GEOCODER_BACKENDS is used.
+    Attributes:
+        path (str): Path of the GeoNames file
+                    (GEOCODER_GAZETTEER_PATH setting).
+        alternate_names (bool): Whether to index the alternate names column
+                                as well; uses considerably more memory.
+    Methods:
+        load(): Read the dump and build the index.
+        build_index(lines): Index the rows of a dump.
+        lookup(place, country): Coordinates of a place, or None.
+    """
+
+    NAME, ASCII_NAME, ALTERNATE_NAMES = 1, 2, 3
+    LATITUDE, LONGITUDE, COUNTRY_CODE, POPULATION = 4, 5, 8, 14
+
+    def __init__(self, path=None, alternate_names=None):
+        self.path = path or getattr(settings, 'GEOCODER_GAZETTEER_PATH', None)
+        if alternate_names is None:
+            alternate_names = getattr(
+                settings, 'GEOCODER_GAZETTEER_ALTERNATE_NAMES', False
+            )
+        self.alternate_names = alternate_names
+        self._lock = threading.Lock()
+        self._index = None
+        self._lat = array('d')
+        self._lon = array('d')
+        self._population = array('q')
+
+    def load(self):
+        """
+        Read the GeoNames dump and build the in-memory index.
+        A file that cannot be read is logged once and leaves the index
+        empty, so the next backend in GEOCODER_BACKENDS is used.
+        """
+        try:
+            with open(self.path, encoding='utf-8') as dump:
+                index, lat, lon, population = self.build_index(dump)
+        except OSError as e:
+            logger.error(
+                'Cannot read the gazetteer %s, it will find nothing: %s',
+                self.path, e
+            )
+            index = {}
+            lat, lon, population = array('d'), array('d'), array('q')
+
+        self._lat, self._lon, self._population = lat, lon, population
+        self._index = index
+
+    def build_index(self, lines):
+        """
+        Index the rows of a GeoNames dump. Every place is indexed under
+        "name<TAB>country code" and, for lookups without a country, under
+        its name alone.
+        Returns:
+            tuple: The index and the latitude, longitude and population
+                   arrays its positions refer to.
+        """
+        index = {}
+        lat, lon, population = array('d'), array('d'), array('q')
+        for line in lines:
+            columns = line.rstrip('\n').split('\t')
+            if len(columns) <= self.POPULATION:
+                continue
+            try:
+                row = (
+                    float(columns[self.LATITUDE]),
+                    float(columns[self.LONGITUDE]),
+                    int(columns[self.POPULATION] or 0),
+                )
+            except ValueError:
+                continue
+
+            position = len(lat)
+            lat.append(row[0])
+            lon.append(row[1])
+            population.append(row[2])
+
+            names = {columns[self.NAME], columns[self.ASCII_NAME]}
+            if self.alternate_names and columns[self.ALTERNATE_NAMES]:
+                names.update(columns[self.ALTERNATE_NAMES].split(','))
+            country = columns[self.COUNTRY_CODE].upper()
+            for name in names:
+                name = fold_name(name)
+                if not name:
+                    continue
+                for key in (f'{name}\t{country}', name):
+                    current = index.get(key)
+                    if (current is None
+                            or population[current] < row[2]):
+                        index[key] = position
+        return index, lat, lon, population
+
+    def _ensure_loaded(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self.load()
+
+    def lookup(self, place, country=None):
+        """
+        Find a place in the gazetteer.
+        Args:
+            place (str): The place name.
+            country (str, optional): Country name, alias or ISO code.
+        Returns:
+            tuple or None: (latitude, longitude) of the most populous
+                           matching place, or None if there is none.
+        """
+        if not self.path:
+            return None
+        self._ensure_loaded()
+
+        name = fold_name(place)
+        if country:
+            code = country_code(country)
+            if code is None:
+                return None
+            key = f'{name}\t{code}'
+        else:
+            key = name
+
+        position = self._index.get(key)
+        if position is None:
+            return None
+        return self._lat[position], self._lon[position]
+
+    def geocode(self, location):
+        place, _, country = str(location).rpartition(',')
+        if not place:
+            place, country = country, None
+        coords = self.lookup(place, country)
+        if coords is None and ',' in place:
+            coords = self.lookup(place.split(',')[0], country)
+        return coords
+
+
+_geocoders = None
+_geocoders_lock = threading.Lock()
+
+
+def get_geocoders():
+    """
+    Return the backend instances configured in GEOCODER_BACKENDS,
+    created once per process.
+    """
+    global _geocoders
+    if _geocoders is None:
+        with _geocoders_lock:
+            if _geocoders is None:
+                _geocoders = [
+                    import_string(path)()
+                    for path in settings.GEOCODER_BACKENDS
+                ]
+    return _geocoders
+
+
+@receiver(setting_changed)
+def reset_geocoders(*, setting=None, **kwargs):
+    """
+    Drop the cached backends when a geocoder setting changes
+    (e.g. with override_settings in tests).
+    """
+    global _geocoders
+    if setting is None or setting.startswith('GEOCODER_'):
+        _geocoders = None
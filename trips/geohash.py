@@ -0,0 +1,245 @@
+"""
+Geohash encoding and spatial query helpers for trip coordinates.
+
+A geohash interleaves longitude and latitude bits into a base32 string, so
+nearby points share a prefix and every geohash cell is a contiguous range
+of the sorted `Trip.geohash` index. Bounding-box and radius queries are
+first pruned to the index ranges of the cells covering the area, then
+refined with the exact coordinates.
+"""
+import math
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import (
+    ASin, Cos, Least, Power, Radians, Sin, Sqrt,
+)
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+DECODE = {char: value for value, char in enumerate(BASE32)}
+PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+MAX_CELLS = 32
+
+
+def encode(lat, lon, precision=PRECISION):
+    """
+    Encode a point as a geohash.
+    Args:
+        lat (float): Latitude in degrees.
+        lon (float): Longitude in degrees.
+        precision (int): Number of characters; 9 is about 5 meters.
+    Returns:
+        str: The geohash of the cell containing the point.
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, value, bits, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            target, coordinate = lon_range, lon
+        else:
+            target, coordinate = lat_range, lat
+        middle = (target[0] + target[1]) / 2
+        if coordinate >= middle:
+            value = value * 2 + 1
+            target[0] = middle
+        else:
+            value *= 2
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            value, bits = 0, 0
+    return ''.join(chars)
+
+
+def _to_int(geohash):
+    value = 0
+    for char in geohash:
+        value = value * 32 + DECODE[char]
+    return value
+
+
+def _from_int(value, precision):
+    chars = []
+    for _ in range(precision):
+        value, digit = divmod(value, 32)
+        chars.append(BASE32[digit])
+    return ''.join(reversed(chars))
+
+
+def _cell_size(precision):
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def _cells(south, west, north, east, precision):
+    """
+    Return the row and column index spans of the cells covering the box.
+    """
+    height, width = _cell_size(precision)
+    rows, columns = round(180 / height), round(360 / width)
+    first_row = min(int((south + 90) // height), rows - 1)
+    last_row = min(int((north + 90) // height), rows - 1)
+    first_column = min(int((west + 180) // width), columns - 1)
+    last_column = min(int((east + 180) // width), columns - 1)
+    return (
+        range(first_row, last_row + 1),
+        range(first_column, last_column + 1),
+    )
+
+
+def cover(south, west, north, east, max_cells=MAX_CELLS):
+    """
+    Return the geohashes of the finest cells covering a bounding box,
+    using at most `max_cells` cells. Boxes crossing the antimeridian
+    (west > east) are split in two.
+    """
+    if west > east:
+        return (
+            cover(south, west, north, 180.0, max_cells // 2)
+            + cover(south, -180.0, north, east, max_cells // 2)
+        )
+
+    cells = []
+    for precision in range(PRECISION, 0, -1):
+        rows, columns = _cells(south, west, north, east, precision)
+        if len(rows) * len(columns) <= max_cells or precision == 1:
+            height, width = _cell_size(precision)
+            for row in rows:
+                for column in columns:
+                    cells.append(encode(
+                        (row + 0.5) * height - 90,
+                        (column + 0.5) * width - 180,
+                        precision
+                    ))
+            break
+    return cells
+
+
+def _spans(cells):
+    """
+    Return the sorted, merged [start, end) integer spans of full-precision
+    geohashes covered by the cells.
+    """
+    spans = []
+    for cell in cells:
+        start = _to_int(cell) * 32 ** (PRECISION - len(cell))
+        spans.append((start, start + 32 ** (PRECISION - len(cell))))
+    spans.sort()
+
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def ranges(cells):
+    """
+    Convert geohash cells into sorted, merged (lower, upper) ranges of
+    full-precision geohashes; `upper` is exclusive and None for the end of
+    the keyspace.
+    """
+    return [
+        (
+            _from_int(start, PRECISION),
+            _from_int(end, PRECISION) if end < 32 ** PRECISION else None,
+        )
+        for start, end in _spans(cells)
+    ]
+
+
+def cell_ranges(cells, precision):
+    """
+    Convert geohash cells into inclusive (first, last) ranges of the
+    geohashes of length `precision` intersecting them.
+    """
+    size = 32 ** (PRECISION - precision)
+    return [
+        (_from_int(start // size, precision),
+         _from_int((end - 1) // size, precision))
+        for start, end in _spans(cells)
+    ]
+
+
+def cell_q(cell, field='geohash'):
+    """
+    Build a Q object selecting the geohashes inside a cell, as an index
+    range rather than a LIKE prefix match.
+    """
+    (lower, upper), = ranges([cell])
+    if upper is None:
+        return Q(**{f'{field}__gte': lower})
+    return Q(**{f'{field}__gte': lower, f'{field}__lt': upper})
+
+
+def bbox_q(south, west, north, east):
+    """
+    Build a Q object selecting trips inside a bounding box: index range
+    scans on `geohash` prune the candidates, the coordinates refine them.
+    """
+    prune = Q()
+    for lower, upper in ranges(cover(south, west, north, east)):
+        if upper is None:
+            prune |= Q(geohash__gte=lower)
+        else:
+            prune |= Q(geohash__gte=lower, geohash__lt=upper)
+
+    if west > east:
+        longitude = Q(lon__gte=west) | Q(lon__lte=east)
+    else:
+        longitude = Q(lon__gte=west, lon__lte=east)
+    return prune & Q(lat__gte=south, lat__lte=north) & longitude
+
+
+def radius_bbox(lat, lon, radius_km):
+    """
+    Return the (south, west, north, east) box enclosing a circle.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE
+    south, north = max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0
+
+    delta_lon = math.degrees(math.asin(min(
+        1.0, math.sin(radius_km / EARTH_RADIUS_KM)
+        / math.cos(math.radians(lat))
+    )))
+    if delta_lon >= 180.0:
+        return south, -180.0, north, 180.0
+    west = (lon - delta_lon + 540.0) % 360.0 - 180.0
+    east = (lon + delta_lon + 540.0) % 360.0 - 180.0
+    return south, west, north, east
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Return the great-circle distance between two points in kilometers.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2)
+        * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def distance_km(lat, lon):
+    """
+    Database expression of the haversine distance in kilometers between
+    the trip coordinates and a point.
+    """
+    phi = math.radians(lat)
+    a = (
+        Power(Sin((Radians(F('lat')) - Value(phi)) / 2), 2)
+        + Value(math.cos(phi)) * Cos(Radians(F('lat')))
+        * Power(Sin((Radians(F('lon')) - Value(math.radians(lon))) / 2), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(
+        Sqrt(Least(a, Value(1.0)), output_field=FloatField())
+    )
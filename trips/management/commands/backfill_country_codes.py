@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.cache import invalidate
+from trips.countries import country_code
+from trips.models import Trip
+
+
+class Command(BaseCommand):
+    """
+    Fill the ISO country codes of trips from their free-form country.
+    Codes are set when trips are saved; run this for rows written with
+    QuerySet.update() or raw SQL, and with --all after extending the
+    country aliases. Trips are updated with one query per distinct
+    country spelling, so variants like "USA" and "United States" are
+    resolved once each.
+    """
+
+    help = 'Fill the ISO country codes of trips.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute the codes of trips that already have one.'
+        )
+
+    def handle(self, *args, **options):
+        trips = Trip.objects.order_by()
+        if not options['all']:
+            trips = trips.filter(country_code__isnull=True)
+        countries = list(
+            trips.values_list('country', flat=True).distinct()
+        )
+        updated, unknown = 0, []
+        with transaction.atomic():
+            for country in countries:
+                code = country_code(country)
+                if code is None:
+                    unknown.append(country)
+                updated += trips.filter(country=country).exclude(
+                    country_code=code
+                ).update(country_code=code)
+            if updated:
+                invalidate('trips')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Updated the country code of {updated} trips.')
+        )
+        if unknown:
+            self.stdout.write(self.style.WARNING(
+                f'Unknown countries: {", ".join(sorted(unknown))}'
+            ))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from trips.models import Trip, GeocodedLocation
+from trips.utils import normalize_location
+
+
+class Command(BaseCommand):
+    """
+    Seed the persistent geocoding cache from trips that already have
+    coordinates, so their locations are never geocoded again.
+    Existing cache entries are left untouched.
+    """
+
+    help = 'Backfill the geocoding cache from existing Trip coordinates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of cache entries inserted per query.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        seen = set(
+            GeocodedLocation.objects.values_list('location', flat=True)
+        )
+        trips = Trip.objects.filter(
+            lat__isnull=False,
+            lon__isnull=False
+        ).order_by('-updated_at').values_list('place', 'country', 'lat', 'lon')
+
+        batch = []
+        created = 0
+        for place, country, lat, lon in trips.iterator(chunk_size=batch_size):
+            key = normalize_location(f'{place}, {country}')
+            if key in seen:
+                continue
+            seen.add(key)
+            batch.append(GeocodedLocation(location=key, lat=lat, lon=lon))
+            if len(batch) >= batch_size:
+                GeocodedLocation.objects.bulk_create(
+                    batch, ignore_conflicts=True
+                )
+                created += len(batch)
+                batch = []
+
+        if batch:
+            GeocodedLocation.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Backfilled {created} cached locations.')
+        )
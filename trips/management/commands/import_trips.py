@@ -0,0 +1,272 @@
+import csv
+import json
+import time
+from collections import Counter
+from itertools import islice
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from geopy.exc import GeopyError
+from trips.models import Trip, GeocodeJob
+from trips.signals import trips_bulk_created
+from trips.utils import (
+    cache_coordinates, geocode_location, get_cached_coordinates,
+    LOCATION_ERROR
+)
+
+
+class Command(BaseCommand):
+    """
+    Bulk import trips from an NDJSON or CSV file.
+    The file is streamed in batches. For every batch, the distinct
+    locations that are not cached yet are geocoded one after the other
+    (Nominatim's rate limiter serializes the requests anyway), then the
+    trips are inserted with bulk_create inside a transaction. Every
+    location is geocoded at most once per import, except after geocoder
+    errors, which are retried in the next batch.
+    Expected fields: owner (username), title, place, country, start_date,
+    end_date, and optionally content, trip_category, trip_status, shared,
+    lat and lon. Rows with coordinates are not geocoded. Trips whose
+    location cannot be found are imported with a FAILED geocode status;
+    trips hitting geocoder errors are queued for process_geocode_queue.
+    """
+
+    help = 'Import trips from an NDJSON or CSV file.'
+
+    REQUIRED_FIELDS = (
+        'owner', 'title', 'place', 'country', 'start_date', 'end_date',
+    )
+    MAX_REPORTED_ERRORS = 20
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON or CSV file to import.')
+        parser.add_argument(
+            '--format',
+            choices=['ndjson', 'csv'],
+            help='Input format; guessed from the file extension by default.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of trips inserted per transaction.'
+        )
+        parser.add_argument(
+            '--default-owner',
+            help='Username used for rows without an owner.'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stats = Counter()
+        self.owners = {}
+        self.coordinates = {}
+
+        fmt = options['format']
+        if fmt is None:
+            fmt = 'csv' if options['path'].lower().endswith('.csv') \
+                else 'ndjson'
+
+        started = time.monotonic()
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as f:
+                rows = self.read_rows(f, fmt)
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    self.import_batch(batch)
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["path"]}: {e}') from e
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        stats = self.stats
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["created"]} trips in {elapsed:.1f}s '
+            f'({stats["created"] / elapsed:.0f} trips/s): '
+            f'{stats["failed"]} rows failed, '
+            f'{stats["unresolved"]} locations not found, '
+            f'{stats["pending"]} queued for geocoding, '
+            f'{stats["geocoded"]} distinct locations geocoded.'
+        ))
+
+    def read_rows(self, f, fmt):
+        """
+        Yield (line number, row) pairs; malformed lines are reported and
+        skipped.
+        """
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                self.report_error(line_number, f'Invalid JSON: {e}')
+                continue
+            if not isinstance(row, dict):
+                self.report_error(line_number, 'Expected a JSON object.')
+                continue
+            yield line_number, row
+
+    def report_error(self, line_number, error):
+        self.stats['failed'] += 1
+        if self.stats['failed'] <= self.MAX_REPORTED_ERRORS:
+            self.stderr.write(f'Line {line_number}: {error}')
+
+    def import_batch(self, batch):
+        self.load_owners(
+            row.get('owner') or self.options['default_owner']
+            for _, row in batch
+        )
+
+        trips = []
+        for line_number, row in batch:
+            try:
+                trips.append(self.build_trip(row))
+            except ValidationError as e:
+                self.report_error(line_number, '; '.join(e.messages))
+
+        coordinates = self.geocode(
+            [trip for trip in trips if trip.lat is None or trip.lon is None]
+        )
+
+        for trip in trips:
+            if trip.lat is None or trip.lon is None:
+                self.set_coordinates(trip, coordinates)
+            trip.update_geohash()
+            trip.update_country_code()
+
+        with transaction.atomic():
+            created = Trip.objects.bulk_create(trips)
+            GeocodeJob.objects.bulk_create(
+                GeocodeJob(trip=trip) for trip in created
+                if trip.geocode_status == Trip.GEOCODE_PENDING
+            )
+            trips_bulk_created.send(sender=Trip, trips=created)
+
+        self.stats['created'] += len(created)
+        if self.options['verbosity'] > 1:
+            self.stdout.write(f'{self.stats["created"]} trips imported')
+
+    def set_coordinates(self, trip, coordinates):
+        coords = coordinates[trip.location_key]
+        if coords is None:
+            trip.geocode_status = Trip.GEOCODE_PENDING
+            self.stats['pending'] += 1
+        elif coords == LOCATION_ERROR:
+            trip.geocode_status = Trip.GEOCODE_FAILED
+            self.stats['unresolved'] += 1
+        else:
+            trip.lat, trip.lon = coords
+
+    def load_owners(self, usernames):
+        missing = {name for name in usernames if name} - self.owners.keys()
+        if not missing:
+            return
+        found = dict(
+            User.objects.filter(username__in=missing)
+            .values_list('username', 'id')
+        )
+        for name in missing:
+            self.owners[name] = found.get(name)
+
+    def build_trip(self, row):
+        """
+        Build an unsaved, validated Trip from an input row.
+        Raises:
+            ValidationError: If the row is incomplete or invalid.
+        """
+        missing = [
+            field for field in self.REQUIRED_FIELDS
+            if field != 'owner' and not row.get(field)
+        ]
+        if missing:
+            raise ValidationError(f'Missing fields: {", ".join(missing)}')
+
+        username = row.get('owner') or self.options['default_owner']
+        owner_id = self.owners.get(username)
+        if owner_id is None:
+            raise ValidationError(f'Unknown owner: {username!r}')
+
+        trip = Trip(
+            owner_id=owner_id,
+            title=row['title'],
+            place=row['place'],
+            country=row['country'],
+            content=row.get('content') or None,
+            start_date=row['start_date'],
+            end_date=row['end_date'],
+            trip_category=self.choice(row, 'trip_category'),
+            trip_status=self.choice(row, 'trip_status'),
+            shared=self.boolean(row.get('shared', True)),
+            lat=self.number(row.get('lat')),
+            lon=self.number(row.get('lon')),
+        )
+        trip.clean_fields(exclude=['owner'])
+        if trip.start_date > trip.end_date:
+            raise ValidationError('Start date must be before end date.')
+        return trip
+
+    def geocode(self, trips):
+        """
+        Resolve the distinct locations of the given trips, first from the
+        locations already known to the import and the geocoding cache,
+        then from the geocoding backends, one at a time.
+        Locations that failed with a geocoder error map to None and are
+        not remembered, so later batches try them again.
+        Returns:
+            dict: Location keys mapped to coordinates, 'location-error'
+                  or None.
+        """
+        coordinates = {}
+        for trip in trips:
+            key = trip.location_key
+            if key in coordinates:
+                continue
+            if key in self.coordinates:
+                coordinates[key] = self.coordinates[key]
+                continue
+            location = f'{trip.place}, {trip.country}'
+            coords = get_cached_coordinates(location)
+            if coords is None:
+                try:
+                    coords = geocode_location(location)
+                except GeopyError:
+                    coordinates[key] = None
+                    continue
+                cache_coordinates(location, coords)
+                self.stats['geocoded'] += 1
+            coordinates[key] = self.coordinates[key] = coords
+        return coordinates
+
+    def choice(self, row, field_name):
+        """
+        Match a choice value or label case-insensitively, falling back to
+        the model default.
+        """
+        field = Trip._meta.get_field(field_name)
+        value = row.get(field_name) or field.get_default()
+        for choice, label in field.choices:
+            if str(value).casefold() in (choice.casefold(), label.casefold()):
+                return choice
+        return value
+
+    def boolean(self, value):
+        if isinstance(value, str):
+            return value.strip().lower() not in ('', '0', 'false', 'no', 'n')
+        return bool(value)
+
+    def number(self, value):
+        if value in (None, ''):
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValidationError(f'Invalid coordinate: {value!r}') from None
@@ -0,0 +1,186 @@
+import random
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from geopy.exc import GeopyError
+from trips.models import Trip, GeocodeJob
+from trips.utils import get_coordinates, LOCATION_ERROR
+
+
+class Command(BaseCommand):
+    """
+    Background worker resolving coordinates of trips created with
+    deferred geocoding.
+    Jobs are claimed with a lease (`next_attempt_at` is pushed forward
+    while a job is processed), so several workers can poll the same queue
+    and a job held by a crashed worker is picked up again once the lease
+    expires. Geocoder errors are retried with exponential backoff and
+    jitter; unknown locations and jobs out of attempts are marked as failed.
+    Results are written to a fresh, locked copy of the trip, and discarded
+    if the trip was deleted or its location edited in the meantime.
+    """
+
+    help = 'Resolve coordinates of trips queued for background geocoding.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs that are due and exit.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Number of jobs claimed per poll.'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep when the queue is empty.'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=5,
+            help='Attempts before a job is marked as failed.'
+        )
+        parser.add_argument(
+            '--backoff',
+            type=float,
+            default=30.0,
+            help='Base retry delay in seconds, doubled on every attempt.'
+        )
+        parser.add_argument(
+            '--max-backoff',
+            type=float,
+            default=60.0 * 60,
+            help='Upper bound of the retry delay in seconds.'
+        )
+        parser.add_argument(
+            '--lease',
+            type=float,
+            default=5.0 * 60,
+            help='Seconds a claimed job is hidden from other workers.'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        while True:
+            jobs = self.claim_jobs()
+            for job in jobs:
+                self.process_job(job)
+            if options['once']:
+                break
+            if not jobs:
+                time.sleep(options['poll_interval'])
+
+    def claim_jobs(self):
+        """
+        Lock the due jobs, push their next attempt past the lease period
+        and return them.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            jobs = list(
+                GeocodeJob.objects.select_for_update(skip_locked=True)
+                .select_related('trip')
+                .filter(status=GeocodeJob.QUEUED, next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:self.options['batch_size']]
+            )
+            GeocodeJob.objects.filter(
+                pk__in=[job.pk for job in jobs]
+            ).update(
+                next_attempt_at=now + timedelta(seconds=self.options['lease'])
+            )
+        return jobs
+
+    def process_job(self, job):
+        trip = job.trip
+        try:
+            coords = get_coordinates(f'{trip.place}, {trip.country}')
+        except GeopyError as e:
+            self.retry(job, str(e) or e.__class__.__name__)
+            return
+
+        if coords == LOCATION_ERROR:
+            self.fail(job, 'Could not geocode the location.')
+            return
+
+        with transaction.atomic():
+            trip = self.lock_trip(job)
+            if trip is None:
+                return
+            trip.lat, trip.lon = coords
+            trip.geocode_status = Trip.GEOCODE_RESOLVED
+            trip.is_cleaned = True
+            trip.save(update_fields=['lat', 'lon', 'geocode_status'])
+            job.delete()
+        self.stdout.write(f'Geocoded trip {trip.pk}: {coords}')
+
+    def lock_trip(self, job):
+        """
+        Lock and return a fresh copy of the trip of a job, if it is still
+        pending at the location that was geocoded.
+        The trip may have been edited or deleted while the job was
+        processed: jobs of deleted trips and of trips that are no longer
+        pending are dropped, and jobs of trips whose place or country
+        changed are released, so the new location is geocoded on the
+        next poll.
+        Returns:
+            Trip: The locked trip, or None if the result must be discarded.
+        """
+        trip = Trip.objects.select_for_update().filter(
+            pk=job.trip_id, geocode_status=Trip.GEOCODE_PENDING
+        ).first()
+        if trip is None:
+            GeocodeJob.objects.filter(pk=job.pk).delete()
+            self.stderr.write(f'Dropped the job of trip {job.trip_id}.')
+            return None
+        if (trip.place, trip.country) != (job.trip.place, job.trip.country):
+            GeocodeJob.objects.filter(pk=job.pk).update(
+                next_attempt_at=timezone.now()
+            )
+            self.stderr.write(f'Location of trip {trip.pk} changed.')
+            return None
+        return trip
+
+    def retry(self, job, error):
+        job.attempts += 1
+        job.last_error = error
+        if job.attempts >= self.options['max_attempts']:
+            self.fail(job, error)
+            return
+
+        delay = min(
+            self.options['max_backoff'],
+            self.options['backoff'] * 2 ** (job.attempts - 1)
+        )
+        delay *= random.uniform(0.5, 1.0)
+        job.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        GeocodeJob.objects.filter(pk=job.pk).update(
+            attempts=job.attempts,
+            last_error=job.last_error,
+            next_attempt_at=job.next_attempt_at
+        )
+        self.stderr.write(
+            f'Retrying trip {job.trip_id} in {delay:.0f}s: {error}'
+        )
+
+    def fail(self, job, error):
+        with transaction.atomic():
+            trip = self.lock_trip(job)
+            if trip is None:
+                return
+            GeocodeJob.objects.filter(pk=job.pk).update(
+                status=GeocodeJob.FAILED,
+                attempts=job.attempts,
+                last_error=error
+            )
+            Trip.objects.filter(pk=trip.pk).update(
+                geocode_status=Trip.GEOCODE_FAILED
+            )
+        self.stderr.write(f'Geocoding failed for trip {job.trip_id}: {error}')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.cache import invalidate
+from trips import search
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the full-text search documents of trips and gallery images.
+    Documents are maintained on model saves and deletes; run this after
+    writes that bypass the model signals, such as QuerySet.update() on
+    titles or places, or renamed users.
+    """
+
+    help = 'Rebuild the full-text search index of trips and images.'
+
+    def handle(self, *args, **options):
+        if search.get_backend() is None:
+            self.stdout.write(self.style.WARNING(
+                'The database has no full-text index; ?q= searches use '
+                'substring matches.'
+            ))
+            return
+        with transaction.atomic():
+            trips, images = search.rebuild()
+            invalidate('trips', 'images')
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {trips} trips and {images} images.'
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import Substr
+from trips.models import Trip, TripCluster
+
+
+class Command(BaseCommand):
+    """
+    Recompute the precomputed map clusters from the shared trips.
+    Clusters are filled by their migration and maintained incrementally on
+    trip writes; run this after writes that bypass the model signals, such
+    as QuerySet.update() on coordinates or sharing, or loaddata.
+    """
+
+    help = 'Rebuild the map clusters of shared trips.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of clusters inserted per query.'
+        )
+
+    def handle(self, *args, **options):
+        trips = Trip.objects.filter(shared=True, geohash__isnull=False)
+        created = 0
+        with transaction.atomic():
+            TripCluster.objects.all().delete()
+            for level in range(1, TripCluster.MAX_LEVEL + 1):
+                rows = trips.annotate(
+                    cell=Substr('geohash', 1, level)
+                ).values('cell').annotate(
+                    count=Count('pk'),
+                    lat_sum=Sum('lat'),
+                    lon_sum=Sum('lon'),
+                    sample_trip_id=Min('pk')
+                ).order_by()
+                clusters = TripCluster.objects.bulk_create(
+                    (TripCluster(level=level, **row) for row in rows),
+                    batch_size=options['batch_size']
+                )
+                created += len(clusters)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {created} trip clusters.')
+        )
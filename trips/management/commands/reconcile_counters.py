@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from api.utils import count_of
+from likes.models import Like
+from trips.models import Image, Trip
+
+
+class Command(BaseCommand):
+    """
+    Repair the denormalized image and like counters of trips and images.
+    The counters are maintained with F() updates by signal receivers;
+    writes bypassing the model signals, such as QuerySet.delete() on
+    likes or raw SQL, let them drift. Only the rows whose stored counter
+    differs from the actual count are updated.
+    """
+
+    help = 'Recount the image and like counters of trips and images.'
+
+    COUNTERS = (
+        (Image, 'likes_count', Like.objects.all(), 'image'),
+        (Trip, 'images_count', Image.objects.all(), 'trip'),
+        (Trip, 'total_likes_count', Like.objects.all(), 'image__trip'),
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model, counter, related, field in self.COUNTERS:
+                repaired = model.objects.annotate(
+                    actual=count_of(related, field)
+                ).exclude(**{counter: F('actual')}).update(
+                    **{counter: count_of(related, field)}
+                )
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}.{counter}: '
+                    f'{repaired} repaired'
+                )
+        self.stdout.write(self.style.SUCCESS('Counters reconciled.'))
@@ -0,0 +1,62 @@
+import time
+from django.core.management.base import BaseCommand
+from trips import trending
+
+
+class Command(BaseCommand):
+    """
+    Periodic job maintaining the trending rankings of images and trips
+    served by /gallery/trending/ and /trips/trending/.
+    Every run adds the likes created since the previous one, up to
+    TRENDING_REFRESH_LAG_SECONDS ago, to the time-decayed scores, and
+    drops the rows that decayed below TRENDING_MIN_SCORE. Incremental
+    runs do not subtract deleted likes, so every --full-every runs the
+    scores are recomputed from scratch; with --once, schedule a run with
+    --full as well, e.g. hourly.
+    """
+
+    help = (
+        'Refresh the time-decayed trending scores of images and trips. '
+        'Deleted likes are only subtracted by full refreshes: the loop '
+        'runs one every --full-every refreshes; with --once, schedule '
+        'runs with --full too.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Refresh the scores once and exit.'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute the scores from all recent likes.'
+        )
+        parser.add_argument(
+            '--full-every',
+            type=int,
+            default=12,
+            help='Number of refreshes between two full refreshes.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0 * 60,
+            help='Seconds between two refreshes.'
+        )
+
+    def handle(self, *args, **options):
+        full = options['full']
+        runs = 0
+        while True:
+            likes, images, trips = trending.refresh(full=full)
+            self.stdout.write(
+                f'Counted {likes} likes; {images} images and {trips} '
+                f'trips are trending.'
+            )
+            if options['once']:
+                break
+            runs += 1
+            full = runs % max(options['full_every'], 1) == 0
+            time.sleep(options['interval'])
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(lat, lon, precision=9):
+    # A frozen copy of trips.geohash.encode: migrations must not depend on
+    # app code that may change after they are written.
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, value, bits, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            target, coordinate = lon_range, lon
+        else:
+            target, coordinate = lat_range, lat
+        middle = (target[0] + target[1]) / 2
+        if coordinate >= middle:
+            value = value * 2 + 1
+            target[0] = middle
+        else:
+            value *= 2
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            value, bits = 0, 0
+    return ''.join(chars)
+
+
+def fill_geohash(apps, schema_editor):
+    Trip = apps.get_model('trips', 'Trip')
+    trips = Trip.objects.filter(
+        lat__isnull=False, lon__isnull=False
+    ).only('lat', 'lon')
+    batch = []
+    for trip in trips.iterator(chunk_size=1000):
+        trip.geohash = encode(trip.lat, trip.lon)
+        batch.append(trip)
+        if len(batch) >= 1000:
+            Trip.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    Trip.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0003_trip_geocode_status_geocodejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=9, null=True),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
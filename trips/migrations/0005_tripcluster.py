@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import Substr
+
+# A frozen copy of TripCluster.MAX_LEVEL when the table was created.
+MAX_LEVEL = 8
+
+
+def fill_clusters(apps, schema_editor):
+    # The aggregation of the rebuild_trip_clusters command, frozen here.
+    Trip = apps.get_model('trips', 'Trip')
+    TripCluster = apps.get_model('trips', 'TripCluster')
+    trips = Trip.objects.filter(shared=True, geohash__isnull=False)
+    for level in range(1, MAX_LEVEL + 1):
+        rows = trips.annotate(
+            cell=Substr('geohash', 1, level)
+        ).values('cell').annotate(
+            count=Count('pk'),
+            lat_sum=Sum('lat'),
+            lon_sum=Sum('lon'),
+            sample_trip_id=Min('pk')
+        ).order_by()
+        TripCluster.objects.bulk_create(
+            (TripCluster(level=level, **row) for row in rows),
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0004_trip_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('cell', models.CharField(max_length=8)),
+                ('count', models.IntegerField(default=0)),
+                ('lat_sum', models.FloatField(default=0)),
+                ('lon_sum', models.FloatField(default=0)),
+                ('sample_trip', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='trips.trip')),
+            ],
+            options={
+                'unique_together': {('level', 'cell')},
+            },
+        ),
+        migrations.RunPython(fill_clusters, migrations.RunPython.noop),
+    ]
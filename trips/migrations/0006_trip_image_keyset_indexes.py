@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0005_tripcluster'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['uploaded_at', 'id'], name='trips_image_uploade_1a461b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['created_at', 'id'], name='trips_trip_created_378c32_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field):
+    # A frozen copy of api.utils.count_of: migrations must not depend on
+    # app code that may change after they are written.
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Trip = apps.get_model('trips', 'Trip')
+    Image = apps.get_model('trips', 'Image')
+    Like = apps.get_model('likes', 'Like')
+    Image.objects.update(likes_count=count_of(Like.objects.all(), 'image'))
+    Trip.objects.update(
+        images_count=count_of(Image.objects.all(), 'trip'),
+        total_likes_count=count_of(Like.objects.all(), 'image__trip'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0006_trip_image_keyset_indexes'),
+        ('likes', '0002_like_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='images_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='total_likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['shared', 'likes_count'], name='trips_image_shared_3798a8_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
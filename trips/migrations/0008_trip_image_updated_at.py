@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_uploaded_at(apps, schema_editor):
+    Image = apps.get_model('trips', 'Image')
+    Image.objects.update(updated_at=F('uploaded_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0007_trip_image_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_uploaded_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='trip',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
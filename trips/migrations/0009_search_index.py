@@ -0,0 +1,92 @@
+from django.db import migrations
+
+# The search tables and documents of trips.search when this migration was
+# written, frozen here: later changes to the live module must not change
+# what this migration does.
+TRIP_SELECT = '''
+    SELECT t.id,
+           COALESCE(t.title, ''),
+           t.place || ' ' || t.country,
+           COALESCE(t.content, '') || ' ' || t.trip_category || ' '
+               || t.trip_status || ' ' || u.username
+    FROM trips_trip t
+    JOIN auth_user u ON u.id = t.owner_id
+'''
+
+IMAGE_SELECT = '''
+    SELECT i.id,
+           i.image_title,
+           t.place || ' ' || t.country,
+           i.description || ' ' || t.trip_category || ' '
+               || t.trip_status || ' ' || u.username
+    FROM trips_image i
+    JOIN trips_trip t ON t.id = i.trip_id
+    JOIN auth_user u ON u.id = i.owner_id
+'''
+
+DOCUMENTS = (
+    ('trips_trip_search', TRIP_SELECT),
+    ('trips_image_search', IMAGE_SELECT),
+)
+
+
+def sqlite_sql(table, select):
+    return [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} '
+        f'USING fts5(title, place, body, '
+        f"tokenize = 'unicode61 remove_diacritics 2')",
+        f'INSERT OR REPLACE INTO {table} (rowid, title, place, body) '
+        f'{select}',
+    ]
+
+
+def postgresql_sql(table, select):
+    return [
+        f'CREATE TABLE IF NOT EXISTS {table} '
+        f'(object_id bigint PRIMARY KEY, document tsvector NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS {table}_document_idx '
+        f'ON {table} USING gin (document)',
+        f'''
+            INSERT INTO {table} (object_id, document)
+            SELECT id,
+                   setweight(to_tsvector('simple', title), 'A')
+                   || setweight(to_tsvector('simple', place), 'B')
+                   || setweight(to_tsvector('simple', body), 'C')
+            FROM ({select}) AS doc (id, title, place, body)
+            ON CONFLICT (object_id)
+                DO UPDATE SET document = EXCLUDED.document
+        ''',
+    ]
+
+
+CREATE_SQL = {
+    'sqlite': sqlite_sql,
+    'postgresql': postgresql_sql,
+}
+
+
+def create_search_index(apps, schema_editor):
+    create_sql = CREATE_SQL.get(schema_editor.connection.vendor)
+    if create_sql is None:
+        return
+    for table, select in DOCUMENTS:
+        for sql in create_sql(table, select):
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in CREATE_SQL:
+        return
+    for table, _ in DOCUMENTS:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0008_trip_image_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0010_trip_country_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingImage',
+            fields=[
+                ('score', models.FloatField(db_index=True)),
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='trips.image')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField()),
+                ('counted_until', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingTrip',
+            fields=[
+                ('score', models.FloatField(db_index=True)),
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='trips.trip')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -1,31 +1,141 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import MinLengthValidator, MaxLengthValidator
 from cloudinary.models import CloudinaryField
-from .utils import get_coordinates, validate_image
+from geopy.exc import GeopyError
+from api.cache import invalidate
+from . import places, search
+from .countries import country_code
+from .geohash import (
+    PRECISION as GEOHASH_PRECISION, encode as encode_geohash, cell_q
+)
+from .signals import trips_bulk_created
+from .utils import (
+    get_coordinates, normalize_location, validate_image, LOCATION_ERROR
+)
 
 
-class Trip(models.Model):
+class CounterFieldsMixin:
+    """
+    Mixin for models with denormalized counters that are maintained with
+    F() expressions by signal receivers.
+    Saving an existing instance writes every field except the counters,
+    so a stale in-memory value never overwrites concurrent increments.
+    Attributes:
+        counter_fields (tuple): Names of the counter fields.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class DirtyFieldsMixin:
+    """
+    Mixin recording the field values loaded from the database, so saves
+    and signal receivers can tell which fields changed.
+    Methods:
+        from_db(db, field_names, values): Records the loaded field values.
+        get_dirty_fields(): Returns the fields changed since the instance
+                            was loaded or last saved.
+        has_changed(*fields): Whether any of the fields changed.
+        reset_dirty_fields(): Records the current values as saved; called
+                              by save() once the post_save receivers ran.
+    """
+
+    _loaded_values = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if value is not models.DEFERRED
+        }
+        return instance
+
+    def get_dirty_fields(self):
+        """
+        Return the fields whose value changed since the instance was loaded
+        from the database or last saved.
+        Returns:
+            dict: Changed field attribute names mapped to their previous
+                  values; empty for instances that were never saved.
+        """
+        if self._loaded_values is None:
+            return {}
+        return {
+            name: value for name, value in self._loaded_values.items()
+            if getattr(self, name) != value
+        }
+
+    def has_changed(self, *fields):
+        dirty_fields = self.get_dirty_fields()
+        return any(field in dirty_fields for field in fields)
+
+    def reset_dirty_fields(self):
+        deferred_fields = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred_fields
+        }
+
+
+class Trip(DirtyFieldsMixin, CounterFieldsMixin, models.Model):
     """
     Model representing a trip.
     Attributes:
         owner (ForeignKey): The user who owns the trip.
         place (CharField): The place of the trip.
         country (CharField): The country of the trip.
+        country_code (CharField): ISO 3166-1 alpha-2 code of the country,
+                                  or None if unknown; set on save.
         lat (FloatField): The latitude of the trip location.
         lon (FloatField): The longitude of the trip location.
+        geohash (CharField): Indexed geohash of the coordinates, used to
+                             prune bounding-box and radius queries.
         trip_category (CharField): The category of the trip.
         start_date (DateField): The start date of the trip.
         end_date (DateField): The end date of the trip.
         created_at (DateTimeField): Date and time when the trip was created.
+        updated_at (DateTimeField): Date and time of the last save.
         trip_status (CharField): The status of the trip.
         shared (CharField): Indicates if the trip is shared.
         image (CloudinaryField): An image associated with the trip.
         coordinates (CharField): The coordinates of the trip location.
+        geocode_status (CharField): Whether the coordinates are resolved,
+                                    pending background geocoding, or failed.
+        images_count (PositiveIntegerField): Number of images of the trip.
+        total_likes_count (PositiveIntegerField): Number of likes of all
+                                                  images of the trip.
         is_cleaned (bool): Indicates if the model has been cleaned.
     Methods:
-        clean(): Cleans the model instance and sets latitude and longitude.
+        clean(): Cleans the model instance and sets latitude and longitude,
+                 unless geocoding is pending in the background queue.
+        resolve_coordinates(): Geocodes the place and country unless the
+                               current coordinates already belong to them.
+        mark_geocoded(): Records that the current coordinates belong to
+                         the current place and country.
+        update_geohash(): Recomputes the geohash from the coordinates.
+        update_country_code(): Looks up the ISO code of the country.
+        from_db(db, field_names, values): Records the loaded field values,
+                         so unchanged locations are not geocoded again.
+        get_dirty_fields(): Returns the fields changed since the instance
+                            was loaded or last saved (DirtyFieldsMixin).
         save(*args, **kwargs): Overrides the save method to ensure the model
                                 data is cleaned before saving.
         __str__(): Returns a string representation of the trip.
@@ -41,6 +151,12 @@ class Trip(models.Model):
                    ("Planned", 'PLANNED'))
     SHARE_CHOICES = (("Yes", "YES"),
                      ("NO", 'No'))
+    GEOCODE_PENDING = 'PENDING'
+    GEOCODE_RESOLVED = 'RESOLVED'
+    GEOCODE_FAILED = 'FAILED'
+    GEOCODE_STATUS = ((GEOCODE_PENDING, 'Pending'),
+                      (GEOCODE_RESOLVED, 'Resolved'),
+                      (GEOCODE_FAILED, 'Failed'))
 
     owner = models.ForeignKey(
         User,
@@ -67,6 +183,12 @@ class Trip(models.Model):
             MaxLengthValidator(56)
             ]
         )
+    country_code = models.CharField(
+        max_length=2,
+        blank=True,
+        null=True,
+        editable=False
+    )
     content = models.TextField(
         blank=True,
         null=True,
@@ -77,6 +199,13 @@ class Trip(models.Model):
         )
     lat = models.FloatField(blank=True, null=True)
     lon = models.FloatField(blank=True, null=True)
+    geohash = models.CharField(
+        max_length=GEOHASH_PRECISION,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True
+    )
     trip_category = models.CharField(
         max_length=50,
         choices=TRIP_CATEGORY,
@@ -85,7 +214,7 @@ class Trip(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     trip_status = models.CharField(
         choices=TRIP_STATUS,
@@ -93,21 +222,55 @@ class Trip(models.Model):
         max_length=50
     )
     shared = models.BooleanField(default=True)
+    images_count = models.PositiveIntegerField(default=0, editable=False)
+    total_likes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    geocode_status = models.CharField(
+        choices=GEOCODE_STATUS,
+        default=GEOCODE_RESOLVED,
+        max_length=10
+    )
 
+    counter_fields = ('images_count', 'total_likes_count')
     is_cleaned = False
+    _geocoded_location = None
 
-    def clean(self):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        location_fields = {'place', 'country', 'lat', 'lon'}
+        if location_fields <= instance._loaded_values.keys():
+            instance.mark_geocoded()
+        return instance
+
+    @property
+    def location_key(self):
+        return normalize_location(f"{self.place}, {self.country}")
+
+    def resolve_coordinates(self):
         """
-        Cleans the Trip instance by setting the `is_cleaned` attribute to True,
-        geocoding the `place` attribute to obtain latitude and longitude,
-        and raising a ValidationError if the geocoding fails.
+        Set latitude and longitude from the place and country.
+        The geocoder is only called when the coordinates are missing or were
+        resolved for a different location, so an instance validated once
+        (e.g. by TripSerializer) is not geocoded again when it is saved.
         Raises:
-            ValidationError: If the geocoding of the `place` attribute fails.
+            ValidationError: If the location could not be geocoded, or the
+                             geocoding service is unavailable.
         """
-        self.is_cleaned = True
-        coords = get_coordinates(f"{self.place}, {self.country}")
+        if (self._geocoded_location == self.location_key
+                and self.lat is not None and self.lon is not None):
+            return
 
-        if coords == 'location-error':
+        try:
+            coords = get_coordinates(f"{self.place}, {self.country}")
+        except GeopyError as e:
+            raise ValidationError(
+                "Error: the geocoding service is currently unavailable. "
+                "Please try again later."
+            ) from e
+        if coords == LOCATION_ERROR:
             raise ValidationError(
                 "Error: could not geocode the location.\
                 Please check the destination inputs"
@@ -115,6 +278,48 @@ class Trip(models.Model):
 
         self.lat = coords[0]
         self.lon = coords[1]
+        self.geocode_status = self.GEOCODE_RESOLVED
+        self._geocoded_location = self.location_key
+
+    def mark_geocoded(self):
+        """
+        Flag the current latitude and longitude as resolved for the current
+        place and country, so cleaning the instance does not geocode again.
+        """
+        if self.lat is not None and self.lon is not None:
+            self._geocoded_location = self.location_key
+
+    def update_geohash(self):
+        """
+        Recompute the geohash from the coordinates. Called by save(); code
+        writing trips with bulk_create() or update() must call it itself.
+        """
+        if self.lat is None or self.lon is None:
+            self.geohash = None
+        else:
+            self.geohash = encode_geohash(self.lat, self.lon)
+
+    def update_country_code(self):
+        """
+        Look up the ISO code of the country in the offline country table.
+        Called by save(); code writing trips with bulk_create() or update()
+        must call it itself.
+        """
+        self.country_code = country_code(self.country)
+
+    def clean(self):
+        """
+        Cleans the Trip instance by setting the `is_cleaned` attribute to True,
+        geocoding the `place` attribute to obtain latitude and longitude,
+        and raising a ValidationError if the geocoding fails.
+        Trips whose geocoding is pending are left without coordinates;
+        the background geocoding worker resolves them later.
+        Raises:
+            ValidationError: If the geocoding of the `place` attribute fails.
+        """
+        self.is_cleaned = True
+        if self.geocode_status != self.GEOCODE_PENDING:
+            self.resolve_coordinates()
 
         if self.start_date > self.end_date:
             raise ValidationError("Start date must be before end date.")
@@ -128,14 +333,29 @@ class Trip(models.Model):
         This method ensures that the instance is cleaned before saving by
         calling the full_clean() method if the instance has not been cleaned.
         After performing the cleaning, it calls the parent class's save()
-        method to save the instance.
+        method to save the instance, and resets the dirty field tracking.
+        Signal receivers can still read the previous values with
+        get_dirty_fields() during post_save. The geohash follows the
+        coordinates and the country code the country, also when saving
+        with update_fields, and updated_at is always refreshed.
         Args:
             *args: Variable length argument list.
             **kwargs: Arbitrary keyword arguments.
         """
         if not self.is_cleaned:
             self.full_clean()
+        self.update_geohash()
+        self.update_country_code()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = {*update_fields, 'updated_at'}
+            if {'lat', 'lon'} & update_fields:
+                update_fields.add('geohash')
+            if 'country' in update_fields:
+                update_fields.add('country_code')
+            kwargs['update_fields'] = update_fields
         super(Trip, self).save(*args, **kwargs)
+        self.reset_dirty_fields()
 
     def __str__(self):
         return (f'{self.trip_category} trip to {self.place}, '
@@ -145,9 +365,13 @@ class Trip(models.Model):
 
     class Meta:
         ordering = ["-created_at", 'country', 'start_date']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['country_code', 'shared']),
+        ]
 
 
-class Image(models.Model):
+class Image(DirtyFieldsMixin, CounterFieldsMixin, models.Model):
     owner = models.ForeignKey(
         User,
         on_delete=models.CASCADE
@@ -186,6 +410,10 @@ class Image(models.Model):
     )
 
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('likes_count',)
 
     def __str__(self):
         formatted_uploaded_at = self.uploaded_at.strftime('%Y-%m-%d %H:%M')
@@ -198,12 +426,451 @@ class Image(models.Model):
 
     class Meta:
         ordering = ["-uploaded_at", "owner"]
+        indexes = [
+            models.Index(fields=['uploaded_at', 'id']),
+            models.Index(fields=['shared', 'likes_count']),
+        ]
 
     def save(self, *args, **kwargs):
         """
-        Overrides the save method to include image validation.
+        Overrides the save method to include image validation, and resets
+        the dirty field tracking once the post_save receivers ran.
         Args:
             *args: Variable length argument list.
             **kwargs: Arbitrary keyword arguments.
         """
         super().save(*args, **kwargs)
+        self.reset_dirty_fields()
+
+
+class GeocodeJob(models.Model):
+    """
+    Queue entry for a trip whose coordinates are resolved in the background
+    by the `process_geocode_queue` management command.
+    Attributes:
+        trip (OneToOneField): The trip waiting to be geocoded.
+        status (CharField): QUEUED while the job is retried, FAILED once
+                            the worker gives up.
+        attempts (PositiveIntegerField): Number of attempts made so far.
+        next_attempt_at (DateTimeField): Earliest time of the next attempt.
+        last_error (TextField): Error message of the last failed attempt.
+        created_at (DateTimeField): Date and time when the job was queued.
+    Methods:
+        enqueue(trip): Queue a trip for geocoding, resetting any previous
+                       job for the same trip.
+    """
+
+    QUEUED = 'QUEUED'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = ((QUEUED, 'Queued'),
+                      (FAILED, 'Failed'))
+
+    trip = models.OneToOneField(
+        Trip,
+        on_delete=models.CASCADE,
+        related_name='geocode_job'
+    )
+    status = models.CharField(
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        max_length=10
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    @classmethod
+    def enqueue(cls, trip):
+        job, _ = cls.objects.update_or_create(
+            trip=trip,
+            defaults={
+                'status': cls.QUEUED,
+                'attempts': 0,
+                'next_attempt_at': timezone.now(),
+                'last_error': '',
+            }
+        )
+        return job
+
+    def __str__(self):
+        return f'Geocoding {self.status.lower()} for trip {self.trip_id}'
+
+
+class GeocodedLocation(models.Model):
+    """
+    Persistent geocoding cache entry, shared by all processes.
+    Attributes:
+        location (CharField): Normalized "place, country" key.
+        lat (FloatField): Latitude, or None for a negative result.
+        lon (FloatField): Longitude, or None for a negative result.
+        updated_at (DateTimeField): When the entry was last geocoded;
+                                    used to expire it.
+    Properties:
+        coordinates: (lat, lon) tuple, or 'location-error' if the
+                     location could not be geocoded.
+    """
+
+    location = models.CharField(max_length=160, unique=True)
+    lat = models.FloatField(blank=True, null=True)
+    lon = models.FloatField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def coordinates(self):
+        if self.lat is None or self.lon is None:
+            return LOCATION_ERROR
+        return self.lat, self.lon
+
+    def __str__(self):
+        return f'{self.location}: {self.coordinates}'
+
+
+class TripCluster(models.Model):
+    """
+    Precomputed map cluster: the shared trips whose geohash starts with
+    `cell`, aggregated per grid level (geohash length). Rows are updated
+    incrementally by signal receivers when trips are created, updated or
+    deleted, and can be recomputed with the `rebuild_trip_clusters`
+    management command.
+    Attributes:
+        level (PositiveSmallIntegerField): Grid level, the cell length.
+        cell (CharField): Geohash prefix of the grid cell.
+        count (IntegerField): Number of shared trips in the cell.
+        lat_sum (FloatField): Sum of their latitudes.
+        lon_sum (FloatField): Sum of their longitudes.
+        sample_trip (ForeignKey): One of the trips in the cell.
+    Methods:
+        level_for_zoom(zoom): Grid level whose cells are about a quarter
+                              of a map tile wide at the zoom level.
+        add(points): Add (trip id, geohash, lat, lon) points.
+        remove(points): Remove points, dropping empty cells.
+    """
+
+    MAX_LEVEL = 8
+
+    level = models.PositiveSmallIntegerField()
+    cell = models.CharField(max_length=MAX_LEVEL)
+    count = models.IntegerField(default=0)
+    lat_sum = models.FloatField(default=0)
+    lon_sum = models.FloatField(default=0)
+    sample_trip = models.ForeignKey(
+        Trip,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+'
+    )
+
+    class Meta:
+        unique_together = ['level', 'cell']
+
+    @property
+    def lat(self):
+        return self.lat_sum / self.count
+
+    @property
+    def lon(self):
+        return self.lon_sum / self.count
+
+    @classmethod
+    def level_for_zoom(cls, zoom):
+        tile_width = 360.0 / 2 ** zoom
+        for level in range(1, cls.MAX_LEVEL + 1):
+            cell_width = 360.0 / 2 ** ((5 * level + 1) // 2)
+            if cell_width <= tile_width / 4:
+                return level
+        return cls.MAX_LEVEL
+
+    @classmethod
+    def add(cls, points):
+        cls._apply(list(points), 1)
+
+    @classmethod
+    def remove(cls, points):
+        cls._apply(list(points), -1)
+
+    @classmethod
+    def _apply(cls, points, sign):
+        deltas = {}
+        for trip_id, geohash, lat, lon in points:
+            for level in range(1, cls.MAX_LEVEL + 1):
+                delta = deltas.setdefault(
+                    (level, geohash[:level]), [0, 0.0, 0.0, trip_id]
+                )
+                delta[0] += sign
+                delta[1] += sign * lat
+                delta[2] += sign * lon
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            if sign > 0:
+                cls.objects.bulk_create(
+                    [cls(level=level, cell=cell) for level, cell in deltas],
+                    ignore_conflicts=True
+                )
+            for (level, cell), delta in deltas.items():
+                count, lat_sum, lon_sum, trip_id = delta
+                changes = {
+                    'count': F('count') + count,
+                    'lat_sum': F('lat_sum') + lat_sum,
+                    'lon_sum': F('lon_sum') + lon_sum,
+                }
+                if sign > 0:
+                    changes['sample_trip_id'] = Coalesce(
+                        F('sample_trip_id'), Value(trip_id),
+                        output_field=models.BigIntegerField()
+                    )
+                cls.objects.filter(level=level, cell=cell).update(**changes)
+            if sign < 0:
+                cls._drop_removed(deltas, {point[0] for point in points})
+
+    @classmethod
+    def _drop_removed(cls, deltas, trip_ids):
+        """
+        Delete emptied cells and pick a new sample trip for cells whose
+        sample was removed.
+        """
+        cells = Q()
+        for level, cell in deltas:
+            cells |= Q(level=level, cell=cell)
+        clusters = cls.objects.filter(cells)
+        clusters.filter(count__lte=0).delete()
+        for cluster in clusters.filter(sample_trip_id__in=trip_ids):
+            cluster.sample_trip_id = Trip.objects.filter(
+                cell_q(cluster.cell), shared=True
+            ).exclude(pk__in=trip_ids).values_list('pk', flat=True).first()
+            cluster.save(update_fields=['sample_trip'])
+
+    def __str__(self):
+        return f'{self.count} trips in cell {self.cell}'
+
+
+class TrendingScore(models.Model):
+    """
+    Abstract row of a trending ranking. Scores are sums of likes weighted
+    by 2 ** ((liked_at - epoch) / half-life), relative to the epoch of
+    TrendingState, so new likes add to a score without decaying the other
+    rows; dividing by 2 ** ((now - epoch) / half-life) gives the decayed
+    score. Rows are written by the refresh_trending command.
+    Attributes:
+        score (FloatField): Indexed score relative to the epoch.
+    """
+
+    score = models.FloatField(db_index=True)
+
+    class Meta:
+        abstract = True
+
+
+class TrendingImage(TrendingScore):
+    image = models.OneToOneField(
+        Image,
+        primary_key=True,
+        related_name='trending',
+        on_delete=models.CASCADE
+    )
+
+    def __str__(self):
+        return f'Image {self.image_id} trending at {self.score:.3g}'
+
+
+class TrendingTrip(TrendingScore):
+    trip = models.OneToOneField(
+        Trip,
+        primary_key=True,
+        related_name='trending',
+        on_delete=models.CASCADE
+    )
+
+    def __str__(self):
+        return f'Trip {self.trip_id} trending at {self.score:.3g}'
+
+
+class TrendingState(models.Model):
+    """
+    Single row recording the progress of the trending rankings.
+    Attributes:
+        epoch (DateTimeField): Reference time of the stored scores.
+        counted_until (DateTimeField): Likes created up to this time are
+                                       counted; None before the first
+                                       full refresh.
+        refreshed_at (DateTimeField): Time of the last refresh.
+    """
+
+    epoch = models.DateTimeField()
+    counted_until = models.DateTimeField(blank=True, null=True)
+    refreshed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'Trending refreshed at {self.refreshed_at}'
+
+
+def cluster_point(trip_id, shared, geohash, lat, lon):
+    """
+    Return the (trip id, geohash, lat, lon) point a trip contributes to
+    the map clusters, or None for private or unlocated trips.
+    """
+    if not shared or geohash is None:
+        return None
+    return trip_id, geohash, lat, lon
+
+
+def stored_cluster_point(trip):
+    """
+    Return the cluster point of a trip as it was loaded or last saved.
+    """
+    dirty_fields = trip.get_dirty_fields()
+    return cluster_point(trip.pk, *(
+        dirty_fields.get(name, getattr(trip, name))
+        for name in ('shared', 'geohash', 'lat', 'lon')
+    ))
+
+
+@receiver(post_save, sender=Trip)
+def update_trip_clusters(sender, instance, created, raw=False, **kwargs):
+    """
+    Move a saved trip between map clusters when its visibility or
+    location changed.
+    """
+    if raw:
+        return
+    point = cluster_point(
+        instance.pk, instance.shared, instance.geohash,
+        instance.lat, instance.lon
+    )
+    previous = None if created else stored_cluster_point(instance)
+    if point == previous:
+        return
+    if previous is not None:
+        TripCluster.remove([previous])
+    if point is not None:
+        TripCluster.add([point])
+
+
+@receiver(post_delete, sender=Trip)
+def remove_trip_from_clusters(sender, instance, **kwargs):
+    point = stored_cluster_point(instance)
+    if point is not None:
+        TripCluster.remove([point])
+
+
+@receiver(trips_bulk_created, sender=Trip)
+def add_trips_to_clusters(sender, trips, **kwargs):
+    TripCluster.add(
+        point for point in (
+            cluster_point(
+                trip.pk, trip.shared, trip.geohash, trip.lat, trip.lon
+            )
+            for trip in trips
+        )
+        if point is not None
+    )
+
+
+def stored_place_point(trip):
+    """
+    Return the place index point of a trip as it was loaded or last saved.
+    """
+    dirty_fields = trip.get_dirty_fields()
+    return places.place_point(*(
+        dirty_fields.get(name, getattr(trip, name))
+        for name in ('shared', 'place', 'country', 'lat', 'lon')
+    ))
+
+
+def update_place_index(added=(), removed=()):
+    transaction.on_commit(lambda: places.update(added, removed))
+
+
+@receiver(post_save, sender=Trip)
+def update_trip_place(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    point = places.place_point(
+        instance.shared, instance.place, instance.country,
+        instance.lat, instance.lon
+    )
+    previous = None if created else stored_place_point(instance)
+    if point != previous:
+        update_place_index([point], [previous])
+
+
+@receiver(post_delete, sender=Trip)
+def remove_trip_place(sender, instance, **kwargs):
+    update_place_index(removed=[stored_place_point(instance)])
+
+
+@receiver(trips_bulk_created, sender=Trip)
+def add_trip_places(sender, trips, **kwargs):
+    update_place_index([
+        places.place_point(
+            trip.shared, trip.place, trip.country, trip.lat, trip.lon
+        )
+        for trip in trips
+    ])
+
+
+@receiver(post_save, sender=Image)
+def count_created_image(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Trip.objects.filter(pk=instance.trip_id).update(
+            images_count=F('images_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Image)
+def count_deleted_image(sender, instance, **kwargs):
+    """
+    Decrement the image counter of the trip. The likes of the image are
+    deleted first, so their own receivers already updated the trip's
+    like counter.
+    """
+    Trip.objects.filter(pk=instance.trip_id).update(
+        images_count=F('images_count') - 1
+    )
+
+
+@receiver([post_save, post_delete], sender=Trip)
+@receiver(trips_bulk_created)
+def invalidate_trips(sender, **kwargs):
+    invalidate('trips')
+
+
+@receiver([post_save, post_delete], sender=Image)
+def invalidate_images(sender, **kwargs):
+    invalidate('images')
+
+
+@receiver(post_save, sender=Trip)
+def index_saved_trip(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_trips([instance.pk])
+
+
+@receiver(trips_bulk_created, sender=Trip)
+def index_created_trips(sender, trips, **kwargs):
+    search.index_trips(trip.pk for trip in trips)
+
+
+@receiver(post_delete, sender=Trip)
+def remove_trip_from_index(sender, instance, **kwargs):
+    search.remove_trips([instance.pk])
+
+
+@receiver(post_save, sender=Image)
+def index_saved_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_images([instance.pk])
+
+
+@receiver(post_delete, sender=Image)
+def remove_image_from_index(sender, instance, **kwargs):
+    search.remove_images([instance.pk])
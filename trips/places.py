@@ -0,0 +1,192 @@
+"""
+In-memory prefix index of the destinations of shared trips, for the place
+autocomplete endpoint.
+
+Every distinct normalized "place, country" pair is one entry, with the
+number of shared trips going there and the coordinates of the latest one.
+Entries are reachable by the prefixes of both their place and their
+country, through a sorted array of (term, key) pairs: a prefix is a
+contiguous slice found with two binary searches, so lookups cost
+O(log n) plus the size of the slice, without touching the database.
+
+The index is loaded on first use and then updated incrementally by the
+Trip signal receivers, once their transaction commits. Writes made by
+other processes are picked up when the index is reloaded, every
+PLACE_INDEX_TTL seconds.
+"""
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from django.conf import settings
+from .utils import normalize_location
+
+MAX_PREFIX_END = '\U0010ffff'
+
+
+def fold(text):
+    """
+    Case-fold a string and strip its accents, so "sao" finds "São Paulo".
+    """
+    decomposed = unicodedata.normalize('NFKD', ' '.join(text.split()))
+    return ''.join(
+        char for char in decomposed if not unicodedata.combining(char)
+    ).casefold()
+
+
+def place_point(shared, place, country, lat, lon):
+    """
+    Return the (key, place, country, lat, lon) point a trip contributes
+    to the index, or None for private trips.
+    """
+    if not shared or not place or not country:
+        return None
+    key = normalize_location(f'{place}, {country}')
+    return key, ' '.join(place.split()), ' '.join(country.split()), lat, lon
+
+
+class PlaceIndex:
+    """
+    Sorted-array prefix index of place/country pairs with trip counts.
+    Attributes:
+        entries (dict): Normalized keys mapped to [place, country, count,
+                        lat, lon] lists.
+        terms (list): Sorted (folded place or country, key) pairs.
+        loaded_at (float): Monotonic time of the last load, or None.
+    Methods:
+        load(points): Replace the contents with the given points.
+        add(points) / remove(points): Count trips in or out of the index.
+        search(prefix, limit): The most visited entries matching a prefix.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.terms = []
+        self.loaded_at = None
+
+    def entry_terms(self, key, entry):
+        return {(fold(entry[0]), key), (fold(entry[1]), key)}
+
+    def load(self, points):
+        entries = {}
+        for point in points:
+            self._count(entries, point, 1)
+        terms = sorted(
+            term for key, entry in entries.items()
+            for term in self.entry_terms(key, entry)
+        )
+        with self.lock:
+            self.entries, self.terms = entries, terms
+            self.loaded_at = time.monotonic()
+
+    def clear(self):
+        with self.lock:
+            self.entries, self.terms = {}, []
+            self.loaded_at = None
+
+    def _count(self, entries, point, delta):
+        key, place, country, lat, lon = point
+        entry = entries.get(key)
+        if entry is None:
+            if delta < 0:
+                return None
+            entry = entries[key] = [place, country, 0, lat, lon]
+        entry[2] += delta
+        if delta > 0 and lat is not None and lon is not None:
+            entry[3], entry[4] = lat, lon
+        return entry
+
+    def add(self, points):
+        with self.lock:
+            for point in points:
+                created = point[0] not in self.entries
+                entry = self._count(self.entries, point, 1)
+                if created:
+                    for term in self.entry_terms(point[0], entry):
+                        insort(self.terms, term)
+
+    def remove(self, points):
+        with self.lock:
+            for point in points:
+                entry = self._count(self.entries, point, -1)
+                if entry is None or entry[2] > 0:
+                    continue
+                del self.entries[point[0]]
+                for term in self.entry_terms(point[0], entry):
+                    index = bisect_left(self.terms, term)
+                    if index < len(self.terms) and self.terms[index] == term:
+                        del self.terms[index]
+
+    def search(self, prefix, limit=10):
+        """
+        Return up to `limit` entries whose place or country starts with
+        `prefix`, most visited first, as dictionaries.
+        """
+        prefix = fold(prefix)
+        if not prefix:
+            return []
+        with self.lock:
+            start = bisect_left(self.terms, (prefix,))
+            end = bisect_left(self.terms, (prefix + MAX_PREFIX_END,))
+            keys = {key for _, key in self.terms[start:end]}
+            best = heapq.nsmallest(
+                limit, keys,
+                key=lambda key: (-self.entries[key][2], key)
+            )
+            return [
+                {
+                    'place': self.entries[key][0],
+                    'country': self.entries[key][1],
+                    'trips_count': self.entries[key][2],
+                    'lat': self.entries[key][3],
+                    'lon': self.entries[key][4],
+                }
+                for key in best
+            ]
+
+
+place_index = PlaceIndex()
+
+
+def load_points():
+    """
+    Read the points of all shared trips, oldest first, so the coordinates
+    of the latest trip to a place win.
+    """
+    from .models import Trip
+    rows = Trip.objects.filter(shared=True).order_by(
+        'created_at'
+    ).values_list('shared', 'place', 'country', 'lat', 'lon')
+    for row in rows.iterator():
+        point = place_point(*row)
+        if point is not None:
+            yield point
+
+
+def get_place_index():
+    """
+    Return the index, loading it on first use and after PLACE_INDEX_TTL
+    seconds.
+    """
+    ttl = getattr(settings, 'PLACE_INDEX_TTL', 300)
+    with place_index.lock:
+        loaded_at = place_index.loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > ttl:
+            place_index.load(load_points())
+    return place_index
+
+
+def update(added=(), removed=()):
+    """
+    Apply trip writes to a loaded index; an index that is not loaded yet
+    reads them from the database when it is.
+    """
+    added = [point for point in added if point is not None]
+    removed = [point for point in removed if point is not None]
+    with place_index.lock:
+        if place_index.loaded_at is None:
+            return
+        place_index.remove(removed)
+        place_index.add(added)
@@ -0,0 +1,276 @@
+"""
+Full-text search index for trips and gallery images.
+
+The documents live in dedicated tables, one per searchable model: an FTS5
+virtual table on SQLite, and a tsvector column with a GIN index on
+PostgreSQL. Each document has three weighted parts: the title, the place
+and the remaining text (content or description, category, status and
+owner username). Documents are built in SQL from the model tables, so
+saving a row, bulk imports and full rebuilds share the same statements.
+
+Queries are split into words, and every word is matched as a prefix, so
+`?q=ro bea` finds "Rome beach trip". Matches are ranked with BM25 on
+SQLite and ts_rank on PostgreSQL; higher ranks are better on both.
+"""
+import re
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+WORD = re.compile(r'\w+')
+MAX_TERMS = 8
+
+TRIP_DOCUMENT = {
+    'table': 'trips_trip_search',
+    'model_table': 'trips_trip',
+    'fallback_fields': (
+        'title', 'place', 'country', 'content', 'owner__username',
+    ),
+    'select': '''
+        SELECT t.id,
+               COALESCE(t.title, ''),
+               t.place || ' ' || t.country,
+               COALESCE(t.content, '') || ' ' || t.trip_category || ' '
+                   || t.trip_status || ' ' || u.username
+        FROM trips_trip t
+        JOIN auth_user u ON u.id = t.owner_id
+    ''',
+}
+
+IMAGE_DOCUMENT = {
+    'table': 'trips_image_search',
+    'model_table': 'trips_image',
+    'fallback_fields': (
+        'image_title', 'description', 'trip__place', 'trip__country',
+        'owner__username',
+    ),
+    'select': '''
+        SELECT i.id,
+               i.image_title,
+               t.place || ' ' || t.country,
+               i.description || ' ' || t.trip_category || ' '
+                   || t.trip_status || ' ' || u.username
+        FROM trips_image i
+        JOIN trips_trip t ON t.id = i.trip_id
+        JOIN auth_user u ON u.id = i.owner_id
+    ''',
+}
+
+DOCUMENTS = (TRIP_DOCUMENT, IMAGE_DOCUMENT)
+
+
+class SQLiteBackend:
+    """
+    FTS5 virtual tables; the rowid is the id of the indexed row.
+    """
+
+    def create_sql(self, document):
+        return [
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {document["table"]} '
+            f'USING fts5(title, place, body, '
+            f"tokenize = 'unicode61 remove_diacritics 2')"
+        ]
+
+    def drop_sql(self, document):
+        return [f'DROP TABLE IF EXISTS {document["table"]}']
+
+    def upsert_sql(self, document, where):
+        return (
+            f'INSERT OR REPLACE INTO {document["table"]} '
+            f'(rowid, title, place, body) {document["select"]} {where}'
+        )
+
+    def delete_sql(self, document, placeholders):
+        return (
+            f'DELETE FROM {document["table"]} '
+            f'WHERE rowid IN ({placeholders})'
+        )
+
+    def query(self, terms):
+        return ' AND '.join(f'"{term}"*' for term in terms)
+
+    def match_sql(self, document):
+        table = document['table']
+        return f'SELECT rowid FROM {table} WHERE {table} MATCH %s'
+
+    def rank_sql(self, document):
+        table = document['table']
+        return (
+            f'SELECT -bm25({table}, 10.0, 5.0, 1.0) FROM {table} '
+            f'WHERE {table} MATCH %s '
+            f'AND rowid = {document["model_table"]}.id'
+        )
+
+
+class PostgreSQLBackend:
+    """
+    Tables holding a weighted tsvector per row, with a GIN index. The
+    'simple' configuration keeps words unstemmed, for prefix matching on
+    names of places.
+    """
+
+    def create_sql(self, document):
+        table = document['table']
+        return [
+            f'CREATE TABLE IF NOT EXISTS {table} '
+            f'(object_id bigint PRIMARY KEY, document tsvector NOT NULL)',
+            f'CREATE INDEX IF NOT EXISTS {table}_document_idx '
+            f'ON {table} USING gin (document)',
+        ]
+
+    def drop_sql(self, document):
+        return [f'DROP TABLE IF EXISTS {document["table"]}']
+
+    def upsert_sql(self, document, where):
+        return f'''
+            INSERT INTO {document["table"]} (object_id, document)
+            SELECT id,
+                   setweight(to_tsvector('simple', title), 'A')
+                   || setweight(to_tsvector('simple', place), 'B')
+                   || setweight(to_tsvector('simple', body), 'C')
+            FROM ({document["select"]} {where})
+                AS doc (id, title, place, body)
+            ON CONFLICT (object_id)
+                DO UPDATE SET document = EXCLUDED.document
+        '''
+
+    def delete_sql(self, document, placeholders):
+        return (
+            f'DELETE FROM {document["table"]} '
+            f'WHERE object_id IN ({placeholders})'
+        )
+
+    def query(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def match_sql(self, document):
+        return (
+            f'SELECT object_id FROM {document["table"]} '
+            f"WHERE document @@ to_tsquery('simple', %s)"
+        )
+
+    def rank_sql(self, document):
+        return (
+            f"SELECT ts_rank(document, to_tsquery('simple', %s)) "
+            f'FROM {document["table"]} '
+            f'WHERE object_id = {document["model_table"]}.id'
+        )
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgreSQLBackend,
+}
+
+
+def get_backend(conn=connection):
+    """
+    Return the search backend of a database connection, or None when
+    its vendor has no full-text index.
+    """
+    backend = BACKENDS.get(conn.vendor)
+    return backend() if backend else None
+
+
+def _index(document, where='', params=()):
+    backend = get_backend()
+    if backend is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(backend.upsert_sql(document, where), params)
+
+
+def _placeholders(ids):
+    return ', '.join(['%s'] * len(ids))
+
+
+def index_trips(ids):
+    """
+    Index the trips with the given ids and their images, whose documents
+    include the trip location.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    placeholders = _placeholders(ids)
+    _index(TRIP_DOCUMENT, f'WHERE t.id IN ({placeholders})', ids)
+    _index(IMAGE_DOCUMENT, f'WHERE i.trip_id IN ({placeholders})', ids)
+
+
+def index_images(ids):
+    ids = list(ids)
+    if ids:
+        _index(IMAGE_DOCUMENT, f'WHERE i.id IN ({_placeholders(ids)})', ids)
+
+
+def _remove(document, ids):
+    backend = get_backend()
+    ids = list(ids)
+    if backend is None or not ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            backend.delete_sql(document, _placeholders(ids)), ids
+        )
+
+
+def remove_trips(ids):
+    _remove(TRIP_DOCUMENT, ids)
+
+
+def remove_images(ids):
+    _remove(IMAGE_DOCUMENT, ids)
+
+
+def rebuild():
+    """
+    Rebuild all search documents, e.g. after writes that bypass the model
+    signals. Returns the number of indexed (trips, images).
+    """
+    backend = get_backend()
+    if backend is None:
+        return 0, 0
+    counts = []
+    with connection.cursor() as cursor:
+        for document in DOCUMENTS:
+            cursor.execute(f'DELETE FROM {document["table"]}')
+            cursor.execute(backend.upsert_sql(document, ''))
+            cursor.execute(f'SELECT COUNT(*) FROM {document["table"]}')
+            counts.append(cursor.fetchone()[0])
+    return tuple(counts)
+
+
+def search(queryset, text, document):
+    """
+    Filter a queryset to the rows matching every word of `text` as a
+    prefix, annotated with their `search_rank`. Text without words
+    filters nothing. Databases without a full-text index fall back to
+    unranked substring matches.
+    """
+    terms = WORD.findall(text.lower())[:MAX_TERMS]
+    if not terms:
+        return queryset
+    backend = get_backend()
+    if backend is None:
+        for term in terms:
+            match = Q()
+            for field in document['fallback_fields']:
+                match |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(match)
+        return queryset.annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+    query = backend.query(terms)
+    return queryset.filter(
+        id__in=RawSQL(backend.match_sql(document), [query])
+    ).annotate(search_rank=RawSQL(
+        backend.rank_sql(document), [query], output_field=FloatField()
+    ))
+
+
+def search_trips(queryset, text):
+    return search(queryset, text, TRIP_DOCUMENT)
+
+
+def search_images(queryset, text):
+    return search(queryset, text, IMAGE_DOCUMENT)
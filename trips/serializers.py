@@ -1,17 +1,31 @@
 from rest_framework import serializers
-from django.db.models import Count
+from django.conf import settings
 from django.core.exceptions import ValidationError as DjangoValidationError
+from api.mixins import SparseFieldsetSerializerMixin
+from followers.mixins import FollowingSerializerMixin
+from likes.models import Like
 from .utils import validate_image as validate_image_file
 from .models import Trip, Image
 from likes.serializers import LikeSerializer
 
 
-class ImageSerializer(serializers.ModelSerializer):
+class ImageSerializer(SparseFieldsetSerializerMixin, FollowingSerializerMixin,
+                      serializers.ModelSerializer):
     """
     Serializer for the Image model.
     Fields:
         image (ImageField): The uploaded image file.
         owner_name (ReadOnlyField): The username of the image owner, read-only.
+        is_following_owner (SerializerMethodField): Whether the request user
+                                                    follows the image owner.
+        is_liked (SerializerMethodField): Whether the request user liked the
+                                          image.
+        like_id (SerializerMethodField): The id of the request user's like,
+                                         or None.
+        likes (SerializerMethodField): The LIKES_PREVIEW_SIZE most recent
+                                likes of the image; the full list is
+                                served by /gallery/<pk>/likes/. With sparse
+                                fieldsets, only included with expand=likes.
     Methods:
         validate_image(value):
             Validates the uploaded image file.
@@ -32,17 +46,52 @@ class ImageSerializer(serializers.ModelSerializer):
             - 'description': The description of the image.
             - 'shared': Whether the image is shared or not.
             - 'uploaded_at': The timestamp when the image was uploaded.
+            - 'likes_count': The stored number of likes, read-only.
+            - 'is_following_owner': Whether the request user follows the
+                                    image owner.
+            - 'is_liked', 'like_id': The request user's like of the image.
     """
+    expandable_fields = ('likes',)
+
     image = serializers.ImageField()
-    likes_count = serializers.SerializerMethodField(read_only=True)
     owner_name = serializers.ReadOnlyField(source='owner.username')
-    likes = LikeSerializer(many=True, read_only=True)
+    is_following_owner = serializers.SerializerMethodField()
+    is_liked = serializers.SerializerMethodField()
+    like_id = serializers.SerializerMethodField()
+    likes = serializers.SerializerMethodField()
+
+    def get_is_following_owner(self, obj):
+        return self.get_following(obj.owner_id) is not None
+
+    def get_like_id(self, obj):
+        """
+        Return the id of the request user's like of the image. The image
+        views annotate it as `like_id` for the whole page; other images
+        fall back to a query.
+        """
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return None
+        if hasattr(obj, 'like_id'):
+            return obj.like_id
+        return Like.objects.filter(
+            owner=request.user, image=obj
+        ).values_list('pk', flat=True).first()
 
-    def get_likes_count(self, obj):
-        '''
-        Validate the like counts
-        '''
-        return getattr(obj, 'likes_count', 0)
+    def get_is_liked(self, obj):
+        return self.get_like_id(obj) is not None
+
+    def get_likes(self, obj):
+        """
+        Return the most recent likes of the image, prefetched by the image
+        views into `recent_likes` or queried for this image.
+        """
+        likes = getattr(obj, 'recent_likes', None)
+        if likes is None:
+            likes = obj.likes.select_related('owner').order_by(
+                '-created_at', '-id'
+            )[:settings.LIKES_PREVIEW_SIZE]
+        return LikeSerializer(likes, many=True, context=self.context).data
 
     def validate_image(self, value):
         """
@@ -90,12 +139,13 @@ class ImageSerializer(serializers.ModelSerializer):
         fields = [
             'id',  'owner', 'owner_name', 'trip_id', 'image_title',
             'image', 'description', 'shared', 'uploaded_at', 'likes_count',
-            'likes'
+            'is_following_owner', 'is_liked', 'like_id', 'likes'
         ]
         read_only_fields = ['owner', 'trip_id', 'uploaded_at', 'id']
 
 
-class TripSerializer(serializers.ModelSerializer):
+class TripSerializer(SparseFieldsetSerializerMixin, FollowingSerializerMixin,
+                     serializers.ModelSerializer):
     '''
     Serializer for the Trip model.
     This serializer handles the serialization and deserialization of
@@ -104,83 +154,83 @@ class TripSerializer(serializers.ModelSerializer):
     owner (serializers.ReadOnlyField): The username of the trip owner.
     is_owner (serializers.SerializerMethodField): Indicates if the request
                                                 user is the owner of the trip.
+    is_following_owner (serializers.SerializerMethodField): Indicates if the
+                                                request user follows the trip
+                                                owner.
     profile_id (serializers.ReadOnlyField): The profile ID of the trip owner.
     profile_image (serializers.ReadOnlyField): The profile image URL of
                                                 the trip owner.
-    images_count (serializers.SerializerMethodField): The count of images
-                                                    associated with the trip.
-    likes_count (serializers.SerializerMethodField): The count of likes
-                                                    associated with the trip.
     images (serializers.SerializerMethodField): The images associated
-                                                    with the trip.
+                                                    with the trip; with sparse
+                                                    fieldsets, only included
+                                                    with expand=images.
     Methods:
     get_images(obj): Retrieve images associated with the given object.
     get_is_owner(obj): Check if the request user is the owner of the trip.
-    get_images_count(obj): Get the count of images associated with the trip.
-    get_likes_count(obj): Get the count of likes associated with the trip.
-    to_representation(instance): Customize the representation of the instance.
-    validate(data): Validate that the start date is before the end date.
+    get_is_following_owner(obj): Check if the request user follows the trip
+                    owner, from the follow map of the trip views.
+    validate(data): Validate that the start date is before the end date
+                    and geocode the destination, unless the view defers
+                    geocoding via the `defer_geocoding` context flag.
+    create(validated_data) / update(instance, validated_data): Save the
+                    trip with the coordinates resolved in validate().
     '''
+    expandable_fields = ('images',)
+
     owner = serializers.ReadOnlyField(source='owner.username')
     is_owner = serializers.SerializerMethodField()
+    is_following_owner = serializers.SerializerMethodField()
     profile_id = serializers.ReadOnlyField(source='owner.profile.id')
     profile_image = serializers.ReadOnlyField(source='owner.profile.image.url')
-    images_count = serializers.SerializerMethodField()
-    total_likes_count = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
 
+    LOCATION_FIELDS = (
+        'place', 'country', 'start_date', 'end_date', 'lat', 'lon',
+        'geocode_status'
+    )
+
     def get_images(self, obj):
         """
         Retrieve images associated with the given object.
         If the request user is authenticated and is either the object owner
         or the object is shared, return all images associated with the object.
         Otherwise, return only the images that are marked as shared.
+        The trip views prefetch the visible images into `visible_images`;
+        other trips fall back to a query per trip.
         Args:
             obj: The object for which images are to be retrieved.
         Returns:
             A list of serialized image data.
         """
 
+        images = getattr(obj, 'visible_images', None)
         request = self.context.get('request')
-        if request.user.is_authenticated and obj.owner == request.user:
-            images = obj.images.all().annotate(
-                likes_count=Count('likes')
-            ).order_by('-uploaded_at')
-        else:
-            images = obj.images.filter(shared=True).annotate(
-                likes_count=Count('likes')
-            ).order_by('-uploaded_at')
+        if images is None:
+            if request.user.is_authenticated and obj.owner == request.user:
+                images = obj.images.all()
+            else:
+                images = obj.images.filter(shared=True)
+            images = images.order_by('-uploaded_at')
 
-        return ImageSerializer(images, many=True, context=self.context).data
+        kwargs = {'expand': self.expand} if self.is_sparse else {}
+        return ImageSerializer(
+            images, many=True, context=self.context, **kwargs
+        ).data
 
     def get_is_owner(self, obj):
         request = self.context.get('request')
         return request.user == obj.owner
 
-    def get_images_count(self, obj):
-        return getattr(obj, 'images_count', 0)
-
-    def get_total_likes_count(self, obj):
-        return getattr(obj, 'total_likes_count', 0)
-
-    def to_representation(self, instance):
-        """
-        Customize the representation of the instance by adding an
-        'images_count' field.
-        Args:
-            instance (Model): The instance of the model being serialized.
-        Returns:
-            dict: The serialized representation of the instance with an
-                    additional 'images_count' field.
-        """
-        representation = super().to_representation(instance)
-        representation['images_count'] = self.get_images_count(instance)
-        return representation
+    def get_is_following_owner(self, obj):
+        return self.get_following(obj.owner_id) is not None
 
     def validate(self, data):
         """
         Validate the start and end dates of a trip and ensure they are
-        in the correct order.
+        in the correct order, and geocode the destination.
+        On updates, fields missing from a partial payload are taken from
+        the existing trip. The resolved coordinates are added to the
+        validated data, so saving the trip does not geocode it again.
         Args:
             data (dict): A dictionary containing the trip data to be validated.
         Raises:
@@ -198,6 +248,13 @@ class TripSerializer(serializers.ModelSerializer):
             })
         try:
             instance = Trip(**data)
+            if self.instance is not None:
+                for field in self.LOCATION_FIELDS:
+                    if field not in data:
+                        setattr(instance, field, getattr(self.instance, field))
+                instance._geocoded_location = self.instance._geocoded_location
+            if self.context.get('defer_geocoding'):
+                instance.geocode_status = Trip.GEOCODE_PENDING
             instance.clean()
         except DjangoValidationError as e:
             raise serializers.ValidationError(
@@ -205,14 +262,42 @@ class TripSerializer(serializers.ModelSerializer):
                     'non_field_errors': [str(e)]
                 }
             )
+        data['lat'] = instance.lat
+        data['lon'] = instance.lon
+        data['geocode_status'] = instance.geocode_status
         return data
 
+    def create(self, validated_data):
+        return self.save_trip(Trip(), validated_data)
+
+    def update(self, instance, validated_data):
+        return self.save_trip(instance, validated_data)
+
+    def save_trip(self, instance, validated_data):
+        """
+        Save a trip with the coordinates resolved in validate(), without
+        geocoding the destination a second time.
+        Args:
+            instance (Trip): The trip to create or update.
+            validated_data (dict): The validated trip data.
+        Returns:
+            Trip: The saved trip.
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.mark_geocoded()
+        instance.save()
+        return instance
+
     class Meta:
         model = Trip
         fields = [
-            "id", "owner", 'is_owner',  'profile_id', "profile_image",
-            "place", "country", "trip_category", "start_date", "end_date",
-            "created_at", "updated_at", "trip_status", "shared",
+            "id", "owner", 'is_owner', 'is_following_owner', 'profile_id',
+            "profile_image", "place", "country", "country_code",
+            "trip_category",
+            "start_date", "end_date", "created_at", "updated_at",
+            "trip_status", "shared",
             "images_count", "total_likes_count", "lat", "lon", 'images',
-            'content', "title"
+            'content', "title", "geocode_status"
         ]
+        read_only_fields = ['lat', 'lon', 'geocode_status']
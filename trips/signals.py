@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+
+trips_bulk_created = Signal()
+"""
+Sent after a batch of trips is inserted with bulk_create(), which skips
+Trip.save() and the post_save signal. Receivers maintaining data derived
+from trips get the saved instances, with primary keys, as `trips`.
+"""
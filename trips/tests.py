@@ -1,10 +1,36 @@
-from django.test import TestCase, TransactionTestCase
+import os
+from io import StringIO
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from .models import Trip, Image
+from django.utils import timezone
+from geopy.exc import (
+    GeocoderServiceError, GeocoderTimedOut, GeocoderUnavailable,
+)
+from api import cache as response_cache
+from followers.models import Follower
+from likes.models import Like
+from .views import ImageListGallery
+from .models import (
+    Trip, Image, GeocodedLocation, GeocodeJob, TripCluster, TrendingImage,
+    TrendingState
+)
+from .geocoding import CircuitBreaker, GazetteerGeocoder, NominatimGeocoder
+from . import geohash, places, trending
+from .utils import (
+    geocode_location, get_coordinates, location_cache, normalize_location
+)
 
 
 class TripListViewTests(TestCase):
@@ -414,3 +440,1797 @@ class ImageModelValidationTests(TransactionTestCase):
         image.image = 'https://example.com/invalid.pdf'
         with self.assertRaises(ValidationError):
             image.full_clean()
+
+
+class GeocodingCacheTests(TestCase):
+    '''
+    Test suite for the two-tier geocoding cache used by get_coordinates.
+    '''
+
+    def setUp(self):
+        location_cache.clear()
+
+    def tearDown(self):
+        location_cache.clear()
+
+    def test_normalize_location(self):
+        self.assertEqual(
+            normalize_location('  Paris ,FRANCE '),
+            normalize_location('paris, france')
+        )
+
+    @mock.patch('trips.utils.geocode_location', return_value=(48.85, 2.35))
+    def test_repeated_lookups_geocode_once(self, geocode):
+        self.assertEqual(get_coordinates('Paris, France'), (48.85, 2.35))
+        self.assertEqual(get_coordinates('paris,  France'), (48.85, 2.35))
+        location_cache.clear()
+        self.assertEqual(get_coordinates('Paris, France'), (48.85, 2.35))
+        self.assertEqual(geocode.call_count, 1)
+        self.assertTrue(
+            GeocodedLocation.objects.filter(location='paris, france').exists()
+        )
+
+    @mock.patch('trips.utils.geocode_location', return_value='location-error')
+    def test_negative_results_are_cached(self, geocode):
+        for _ in range(2):
+            self.assertEqual(
+                get_coordinates('Nowhere, Atlantis'), 'location-error'
+            )
+        self.assertEqual(geocode.call_count, 1)
+
+    @mock.patch('trips.utils.geocode_location', return_value=(1.0, 1.0))
+    def test_expired_entries_are_geocoded_again(self, geocode):
+        with self.settings(GEOCODE_CACHE_TTL=0):
+            get_coordinates('Oslo, Norway')
+            get_coordinates('Oslo, Norway')
+        self.assertEqual(geocode.call_count, 2)
+
+    @mock.patch('trips.models.get_coordinates', return_value=(59.9, 10.7))
+    def test_backfill_command(self, _):
+        user = User.objects.create_user(username='admin', password='pass')
+        Trip.objects.create(
+            title='Oslo',
+            owner=user,
+            place='Oslo',
+            country='Norway',
+            trip_category='Adventure',
+            start_date='2025-03-01',
+            end_date='2025-03-10',
+            trip_status='Planned',
+        )
+        call_command('backfill_geocode_cache', stdout=mock.MagicMock())
+        entry = GeocodedLocation.objects.get(location='oslo, norway')
+        self.assertEqual(entry.coordinates, (59.9, 10.7))
+
+
+@mock.patch('trips.models.get_coordinates', return_value=(40.7, -74.0))
+class DeferredGeocodingTests(APITestCase):
+    '''
+    Test suite for trip creation with deferred geocoding and the
+    process_geocode_queue worker.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='admin',
+            password='pass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.data = {
+            'title': 'New York',
+            'place': 'New York',
+            'country': 'USA',
+            'trip_category': 'Adventure',
+            'start_date': '2025-03-01',
+            'end_date': '2025-03-10',
+            'trip_status': 'Planned',
+        }
+
+    def create_pending_trip(self):
+        with self.settings(GEOCODE_DEFERRED=True):
+            response = self.client.post('/trips/', self.data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response
+
+    def run_worker(self):
+        call_command(
+            'process_geocode_queue', '--once',
+            stdout=mock.MagicMock(), stderr=mock.MagicMock()
+        )
+
+    def test_create_returns_pending_trip(self, get_coordinates):
+        response = self.create_pending_trip()
+        self.assertEqual(response.data['geocode_status'], 'PENDING')
+        self.assertIsNone(response.data['lat'])
+        get_coordinates.assert_not_called()
+        self.assertTrue(
+            GeocodeJob.objects.filter(trip_id=response.data['id']).exists()
+        )
+
+    def test_public_endpoint_defers_geocoding(self, get_coordinates):
+        with self.settings(GEOCODE_DEFERRED=True):
+            response = self.client.post('/public/', self.data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['geocode_status'], 'PENDING')
+        get_coordinates.assert_not_called()
+        self.assertTrue(
+            GeocodeJob.objects.filter(trip_id=response.data['id']).exists()
+        )
+
+    @mock.patch(
+        'trips.management.commands.process_geocode_queue.get_coordinates',
+        return_value=(40.7, -74.0)
+    )
+    def test_worker_resolves_pending_trip(self, worker_geocode, _):
+        trip_id = self.create_pending_trip().data['id']
+        self.run_worker()
+        trip = Trip.objects.get(pk=trip_id)
+        self.assertEqual(trip.geocode_status, Trip.GEOCODE_RESOLVED)
+        self.assertEqual((trip.lat, trip.lon), (40.7, -74.0))
+        self.assertFalse(GeocodeJob.objects.exists())
+
+    @mock.patch(
+        'trips.management.commands.process_geocode_queue.get_coordinates',
+        side_effect=GeocoderUnavailable('down')
+    )
+    def test_worker_retries_with_backoff(self, worker_geocode, _):
+        trip_id = self.create_pending_trip().data['id']
+        self.run_worker()
+        job = GeocodeJob.objects.get(trip_id=trip_id)
+        self.assertEqual(job.status, GeocodeJob.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.last_error, 'down')
+        self.run_worker()
+        self.assertEqual(GeocodeJob.objects.get(pk=job.pk).attempts, 1)
+
+    @mock.patch(
+        'trips.management.commands.process_geocode_queue.get_coordinates',
+        return_value='location-error'
+    )
+    def test_worker_records_failures(self, worker_geocode, _):
+        trip_id = self.create_pending_trip().data['id']
+        self.run_worker()
+        self.assertEqual(
+            Trip.objects.get(pk=trip_id).geocode_status,
+            Trip.GEOCODE_FAILED
+        )
+        self.assertEqual(
+            GeocodeJob.objects.get(trip_id=trip_id).status,
+            GeocodeJob.FAILED
+        )
+
+    def test_worker_discards_stale_locations(self, _):
+        trip_id = self.create_pending_trip().data['id']
+        GeocodeJob.objects.filter(trip_id=trip_id).update(attempts=3)
+
+        def edit_trip(location):
+            response = self.client.patch(
+                f'/trips/{trip_id}/', {'place': 'Boston'}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return (40.7, -74.0)
+
+        with mock.patch(
+            'trips.management.commands.process_geocode_queue'
+            '.get_coordinates', side_effect=edit_trip
+        ) as worker_geocode:
+            self.run_worker()
+        trip = Trip.objects.get(pk=trip_id)
+        self.assertEqual(trip.geocode_status, Trip.GEOCODE_PENDING)
+        self.assertIsNone(trip.lat)
+        job = GeocodeJob.objects.get(trip_id=trip_id)
+        self.assertEqual(job.attempts, 0)
+
+        worker_geocode.side_effect = None
+        worker_geocode.return_value = (42.36, -71.06)
+        with mock.patch(
+            'trips.management.commands.process_geocode_queue'
+            '.get_coordinates', worker_geocode
+        ):
+            self.run_worker()
+        worker_geocode.assert_called_with('Boston, USA')
+        trip = Trip.objects.get(pk=trip_id)
+        self.assertEqual(trip.geocode_status, Trip.GEOCODE_RESOLVED)
+        self.assertEqual((trip.lat, trip.lon), (42.36, -71.06))
+        self.assertFalse(GeocodeJob.objects.exists())
+
+    def test_worker_skips_deleted_trips(self, _):
+        trip_id = self.create_pending_trip().data['id']
+
+        def delete_trip(location):
+            Trip.objects.filter(pk=trip_id).delete()
+            return (40.7, -74.0)
+
+        with mock.patch(
+            'trips.management.commands.process_geocode_queue'
+            '.get_coordinates', side_effect=delete_trip
+        ):
+            self.run_worker()
+        self.assertFalse(Trip.objects.filter(pk=trip_id).exists())
+        self.assertFalse(GeocodeJob.objects.exists())
+
+
+@mock.patch('trips.models.get_coordinates', return_value=(40.7, -74.0))
+class TripGeocodingCallTests(APITestCase):
+    '''
+    Test suite counting the geocoder calls made by trip writes through
+    the API: each create or update geocodes the destination at most once.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='admin',
+            password='pass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.data = {
+            'title': 'New York',
+            'place': 'New York',
+            'country': 'USA',
+            'trip_category': 'Adventure',
+            'start_date': '2025-03-01',
+            'end_date': '2025-03-10',
+            'trip_status': 'Planned',
+        }
+
+    def test_create_geocodes_once(self, get_coordinates):
+        response = self.client.post('/trips/', self.data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(get_coordinates.call_count, 1)
+        self.assertEqual(response.data['lat'], 40.7)
+
+    def test_update_geocodes_once(self, get_coordinates):
+        trip_id = self.client.post('/trips/', self.data).data['id']
+        get_coordinates.reset_mock()
+        get_coordinates.return_value = (42.36, -71.06)
+
+        response = self.client.put(
+            f'/trips/{trip_id}/',
+            {**self.data, 'place': 'Boston'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_coordinates.call_count, 1)
+        self.assertEqual(Trip.objects.get(pk=trip_id).lat, 42.36)
+
+    def test_partial_update_keeps_existing_location(self, get_coordinates):
+        trip_id = self.client.post('/trips/', self.data).data['id']
+        get_coordinates.reset_mock()
+
+        response = self.client.patch(
+            f'/trips/{trip_id}/',
+            {'end_date': '2025-03-12', 'title': 'Big Apple'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        get_coordinates.assert_not_called()
+        self.assertEqual(response.data['lat'], 40.7)
+
+    def test_coordinates_are_read_only(self, get_coordinates):
+        trip_id = self.client.post(
+            '/trips/', {**self.data, 'lat': 0, 'lon': 0}
+        ).data['id']
+        response = self.client.patch(
+            f'/trips/{trip_id}/', {'lat': 1, 'lon': 1}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        trip = Trip.objects.get(pk=trip_id)
+        self.assertEqual((trip.lat, trip.lon), (40.7, -74.0))
+
+    def test_model_update_without_location_change(self, get_coordinates):
+        trip_id = self.client.post('/trips/', self.data).data['id']
+        get_coordinates.reset_mock()
+
+        trip = Trip.objects.get(pk=trip_id)
+        trip.trip_status = 'Completed'
+        trip.place = ' new york'
+        self.assertEqual(
+            set(trip.get_dirty_fields()), {'trip_status', 'place'}
+        )
+        trip.save()
+        get_coordinates.assert_not_called()
+        self.assertEqual(trip.get_dirty_fields(), {})
+
+        trip.country = 'United States'
+        trip.full_clean()
+        get_coordinates.assert_called_once()
+
+
+GEONAMES_ROWS = (
+    ('3143244', 'Oslo', 'Oslo', 'Christiania', '59.91273', '10.74609',
+     'P', 'PPLC', 'NO', '', '12', '0301', '', '', '580000'),
+    ('2988507', 'Paris', 'Paris', 'Lutece', '48.85341', '2.3488',
+     'P', 'PPLC', 'FR', '', '11', '75', '', '', '2138551'),
+    ('4717560', 'Paris', 'Paris', '', '33.66094', '-95.55551',
+     'P', 'PPLA2', 'US', '', 'TX', '277', '', '', '24782'),
+    ('3017382', 'Sao Paulo', 'Sao Paulo', '', '-23.5475', '-46.63611',
+     'P', 'PPLA', 'BR', '', '27', '', '', '', '10021295'),
+)
+
+
+class GazetteerGeocoderTests(SimpleTestCase):
+    '''
+    Test suite for the offline GeoNames gazetteer geocoding backend.
+    '''
+
+    def setUp(self):
+        dump = tempfile.NamedTemporaryFile(
+            'w', suffix='.txt', encoding='utf-8', delete=False
+        )
+        with dump:
+            for row in GEONAMES_ROWS:
+                dump.write('\t'.join(row) + '\n')
+        self.addCleanup(os.remove, dump.name)
+        self.path = dump.name
+
+    def test_lookup_by_place_and_country(self):
+        gazetteer = GazetteerGeocoder(path=self.path)
+        self.assertEqual(
+            gazetteer.geocode('Oslo, Norway'), (59.91273, 10.74609)
+        )
+        self.assertEqual(
+            gazetteer.geocode('paris, USA'), (33.66094, -95.55551)
+        )
+        self.assertEqual(
+            gazetteer.geocode('São Paulo, BR'), (-23.5475, -46.63611)
+        )
+        self.assertIsNone(gazetteer.geocode('Oslo, France'))
+
+    def test_lookup_without_country_prefers_most_populous(self):
+        gazetteer = GazetteerGeocoder(path=self.path)
+        self.assertEqual(gazetteer.geocode('Paris'), (48.85341, 2.3488))
+
+    def test_alternate_names(self):
+        self.assertIsNone(
+            GazetteerGeocoder(path=self.path).geocode('Christiania, Norway')
+        )
+        gazetteer = GazetteerGeocoder(path=self.path, alternate_names=True)
+        self.assertEqual(
+            gazetteer.geocode('Christiania, Norway'), (59.91273, 10.74609)
+        )
+
+    def test_unreadable_file_is_logged_once(self):
+        gazetteer = GazetteerGeocoder(path=self.path + '.missing')
+        with self.assertLogs('trips.geocoding', 'ERROR') as logs:
+            self.assertIsNone(gazetteer.geocode('Oslo, Norway'))
+            self.assertIsNone(gazetteer.geocode('Paris, France'))
+        self.assertEqual(len(logs.records), 1)
+
+    def test_backends_fall_back_in_order(self):
+        with self.settings(
+            GEOCODER_GAZETTEER_PATH=self.path,
+            GEOCODER_BACKENDS=['trips.geocoding.GazetteerGeocoder']
+        ):
+            self.assertEqual(
+                geocode_location('Oslo, Norway'), (59.91273, 10.74609)
+            )
+            self.assertEqual(
+                geocode_location('Atlantis, Norway'), 'location-error'
+            )
+
+
+@mock.patch('trips.geocoding.time.sleep')
+class NominatimGeocoderTests(SimpleTestCase):
+    '''
+    Test suite for the retry, rate limiting and circuit breaker behaviour
+    of the Nominatim geocoding backend.
+    '''
+
+    def make_geocoder(self, *results):
+        geocoder = NominatimGeocoder(max_attempts=3)
+        geocoder.rate_limiter.min_interval = 0
+        geocoder.client = mock.Mock()
+        geocoder.client.geocode.side_effect = results
+        return geocoder
+
+    def test_retries_timeouts_with_backoff(self, sleep):
+        location = mock.Mock(latitude=59.9, longitude=10.7)
+        geocoder = self.make_geocoder(GeocoderTimedOut(), location)
+        self.assertEqual(geocoder.geocode('Oslo, Norway'), (59.9, 10.7))
+        self.assertEqual(geocoder.client.geocode.call_count, 2)
+        sleep.assert_called_once()
+        self.assertLessEqual(sleep.call_args[0][0], geocoder.backoff)
+
+    def test_gives_up_after_max_attempts(self, sleep):
+        geocoder = self.make_geocoder(*[GeocoderTimedOut()] * 3)
+        with self.assertRaises(GeocoderTimedOut):
+            geocoder.geocode('Oslo, Norway')
+        self.assertEqual(geocoder.client.geocode.call_count, 3)
+
+    def test_open_circuit_fails_fast(self, sleep):
+        geocoder = self.make_geocoder(*[GeocoderUnavailable()] * 3)
+        geocoder.circuit_breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=60
+        )
+        with self.assertRaises(GeocoderUnavailable):
+            geocoder.geocode('Oslo, Norway')
+        self.assertEqual(geocoder.client.geocode.call_count, 2)
+        with self.assertRaises(GeocoderUnavailable):
+            geocoder.geocode('Oslo, Norway')
+        self.assertEqual(geocoder.client.geocode.call_count, 2)
+
+    def test_half_open_trial_error_reopens_circuit(self, sleep):
+        location = mock.Mock(latitude=59.9, longitude=10.7)
+        geocoder = self.make_geocoder(
+            GeocoderUnavailable(), GeocoderServiceError('500'), location
+        )
+        geocoder.max_attempts = 1
+        geocoder.circuit_breaker = CircuitBreaker(
+            failure_threshold=1, reset_timeout=0
+        )
+        with self.assertRaises(GeocoderUnavailable):
+            geocoder.geocode('Oslo, Norway')
+        with self.assertRaises(GeocoderServiceError):
+            geocoder.geocode('Oslo, Norway')
+        self.assertEqual(geocoder.client.geocode.call_count, 2)
+        self.assertEqual(geocoder.geocode('Oslo, Norway'), (59.9, 10.7))
+        self.assertFalse(geocoder.circuit_breaker.is_open)
+
+    def test_half_open_circuit_closes_on_success(self, sleep):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertFalse(breaker.is_open)
+
+
+class GeocodingFallbackTests(TestCase):
+    '''
+    Test that expired cache entries are served while the geocoding
+    service is unavailable.
+    '''
+
+    def setUp(self):
+        location_cache.clear()
+        self.addCleanup(location_cache.clear)
+
+    @mock.patch(
+        'trips.utils.geocode_location', side_effect=GeocoderUnavailable()
+    )
+    def test_stale_coordinates_served_when_upstream_fails(self, geocode):
+        GeocodedLocation.objects.create(
+            location='oslo, norway', lat=59.9, lon=10.7
+        )
+        with self.settings(GEOCODE_CACHE_TTL=0):
+            self.assertEqual(get_coordinates('Oslo, Norway'), (59.9, 10.7))
+            with self.assertRaises(GeocoderUnavailable):
+                get_coordinates('Bergen, Norway')
+
+
+class ImportTripsCommandTests(TestCase):
+    '''
+    Test the import_trips management command.
+    '''
+
+    def setUp(self):
+        location_cache.clear()
+        self.addCleanup(location_cache.clear)
+        User.objects.create_user(username='admin', password='pass')
+
+    def write_file(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_trips(self, path, **options):
+        with mock.patch(
+            'trips.management.commands.import_trips.geocode_location',
+            side_effect=lambda location: (
+                'location-error' if location.startswith('Nowhere')
+                else (59.9, 10.7)
+            )
+        ) as geocode:
+            call_command(
+                'import_trips', path, stdout=StringIO(),
+                stderr=StringIO(), **options
+            )
+        return geocode
+
+    def test_import_ndjson_geocodes_each_location_once(self):
+        row = (
+            '{"owner": "admin", "title": "Trip %d", "place": "%s", '
+            '"country": "Norway", "start_date": "2024-01-01", '
+            '"end_date": "2024-01-02", "trip_category": "adventure", '
+            '"trip_status": "Planned"}\n'
+        )
+        path = self.write_file('.ndjson', ''.join([
+            row % (1, 'Oslo'), row % (2, 'oslo '), row % (3, 'Nowhere'),
+            'not json\n',
+            '{"owner": "ghost", "title": "Trip 4"}\n',
+        ]))
+        geocode = self.import_trips(path, batch_size=2)
+
+        self.assertEqual(geocode.call_count, 2)
+        self.assertEqual(Trip.objects.count(), 3)
+        self.assertEqual(
+            Trip.objects.filter(
+                lat=59.9, geocode_status=Trip.GEOCODE_RESOLVED
+            ).count(),
+            2
+        )
+        self.assertEqual(
+            Trip.objects.get(place='Nowhere').geocode_status,
+            Trip.GEOCODE_FAILED
+        )
+        self.assertEqual(
+            Trip.objects.get(title='Trip 1').trip_category, 'Adventure'
+        )
+        self.assertTrue(GeocodedLocation.objects.filter(
+            location='oslo, norway'
+        ).exists())
+
+    def test_import_csv_with_coordinates_skips_geocoding(self):
+        path = self.write_file('.csv', (
+            'title,place,country,start_date,end_date,lat,lon,shared\n'
+            'Trip,Oslo,Norway,2024-01-01,2024-01-02,59.9,10.7,false\n'
+        ))
+        geocode = self.import_trips(path, default_owner='admin')
+
+        geocode.assert_not_called()
+        trip = Trip.objects.get()
+        self.assertEqual((trip.lat, trip.lon), (59.9, 10.7))
+        self.assertEqual(trip.geohash, geohash.encode(59.9, 10.7))
+        self.assertFalse(trip.shared)
+
+    def test_geocoder_errors_queue_trips(self):
+        path = self.write_file('.ndjson', (
+            '{"owner": "admin", "title": "Trip", "place": "Oslo", '
+            '"country": "Norway", "start_date": "2024-01-01", '
+            '"end_date": "2024-01-02"}\n'
+        ))
+        with mock.patch(
+            'trips.management.commands.import_trips.geocode_location',
+            side_effect=GeocoderUnavailable()
+        ):
+            call_command('import_trips', path, stdout=StringIO())
+
+        trip = Trip.objects.get()
+        self.assertEqual(trip.geocode_status, Trip.GEOCODE_PENDING)
+        self.assertTrue(GeocodeJob.objects.filter(trip=trip).exists())
+
+    def test_geocoder_errors_are_retried_in_later_batches(self):
+        row = (
+            '{"owner": "admin", "title": "Trip %d", "place": "Oslo", '
+            '"country": "Norway", "start_date": "2024-01-01", '
+            '"end_date": "2024-01-02"}\n'
+        )
+        path = self.write_file('.ndjson', row % 1 + row % 2)
+        with mock.patch(
+            'trips.management.commands.import_trips.geocode_location',
+            side_effect=[GeocoderUnavailable(), (59.9, 10.7)]
+        ) as geocode:
+            call_command(
+                'import_trips', path, batch_size=1, stdout=StringIO()
+            )
+
+        self.assertEqual(geocode.call_count, 2)
+        self.assertEqual(
+            Trip.objects.get(title='Trip 1').geocode_status,
+            Trip.GEOCODE_PENDING
+        )
+        self.assertEqual(Trip.objects.get(title='Trip 2').lat, 59.9)
+
+
+class GeohashTests(SimpleTestCase):
+    '''
+    Test suite for the geohash helpers.
+    '''
+
+    def test_encode(self):
+        self.assertEqual(
+            geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj'
+        )
+
+    def test_ranges_contain_points_inside_the_box(self):
+        box = (59.8, 10.6, 60.0, 10.9)
+        point = geohash.encode(59.91, 10.75)
+        self.assertTrue(any(
+            lower <= point and (upper is None or point < upper)
+            for lower, upper in geohash.ranges(geohash.cover(*box))
+        ))
+
+    def test_cover_splits_the_antimeridian(self):
+        cells = geohash.cover(-10, 170, 10, -170)
+        self.assertIn(geohash.encode(0, 179.5, 2), cells)
+        self.assertIn(geohash.encode(0, -179.5, 2), cells)
+
+    def test_haversine(self):
+        self.assertAlmostEqual(
+            geohash.haversine_km(59.91, 10.75, 60.39, 5.32), 304.9, places=0
+        )
+
+
+COORDINATES = {
+    'oslo, norway': (59.91, 10.75),
+    'drammen, norway': (59.74, 10.2),
+    'bergen, norway': (60.39, 5.32),
+    'suva, fiji': (-18.14, 178.44),
+}
+
+
+def create_located_trips(owner):
+    for location in COORDINATES:
+        place, country = location.title().split(', ')
+        Trip.objects.create(
+            owner=owner,
+            title=place,
+            place=place,
+            country=country,
+            trip_category='Adventure',
+            trip_status='Planned',
+            start_date='2025-03-01',
+            end_date='2025-03-10'
+        )
+
+
+@mock.patch(
+    'trips.models.get_coordinates',
+    side_effect=lambda location: COORDINATES[normalize_location(location)]
+)
+class TripSpatialFilterTests(APITestCase):
+    '''
+    Test suite for the bounding-box and radius filters of the trip list.
+    '''
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='admin',
+            password='pass'
+        )
+
+    def titles(self, query):
+        response = self.client.get(f'/trips/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [trip['title'] for trip in response.data['results']]
+
+    def test_geohash_follows_coordinates(self, get_coordinates):
+        create_located_trips(self.user)
+        trip = Trip.objects.get(place='Oslo')
+        self.assertEqual(trip.geohash, geohash.encode(59.91, 10.75))
+
+        trip.lat, trip.lon = 60.39, 5.32
+        trip.save(update_fields=['lat', 'lon'])
+        trip.refresh_from_db()
+        self.assertEqual(trip.geohash, geohash.encode(60.39, 5.32))
+
+    def test_bbox(self, get_coordinates):
+        create_located_trips(self.user)
+        self.assertCountEqual(
+            self.titles('bbox=59.5,10,60,11'), ['Oslo', 'Drammen']
+        )
+        self.assertEqual(self.titles('bbox=-20,170,-10,-170'), ['Suva'])
+
+    def test_near_orders_by_distance(self, get_coordinates):
+        create_located_trips(self.user)
+        self.assertEqual(
+            self.titles('near=59.9,10.7&radius_km=100'), ['Oslo', 'Drammen']
+        )
+        self.assertEqual(
+            self.titles('near=59.75,10.2&radius_km=500'),
+            ['Drammen', 'Oslo', 'Bergen']
+        )
+
+    def test_zero_radius(self, get_coordinates):
+        create_located_trips(self.user)
+        self.assertEqual(self.titles('near=59.91,10.75&radius_km=0'), ['Oslo'])
+        self.assertEqual(self.titles('near=59.9,10.7&radius_km=0'), [])
+
+    def test_near_with_cursor_pagination_keeps_distance_order(
+            self, get_coordinates):
+        create_located_trips(self.user)
+        response = self.client.get(
+            '/trips/?near=59.75,10.2&radius_km=500&pagination=cursor'
+        )
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [trip['title'] for trip in response.data['results']],
+            ['Drammen', 'Oslo', 'Bergen']
+        )
+
+    def test_invalid_bbox(self, get_coordinates):
+        response = self.client.get('/trips/?bbox=1,2,3')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TripClusterTests(APITestCase):
+    '''
+    Test suite for the precomputed map clusters and their endpoint.
+    '''
+
+    def setUp(self):
+        patcher = mock.patch(
+            'trips.models.get_coordinates',
+            side_effect=lambda location: COORDINATES[
+                normalize_location(location)
+            ]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(
+            username='admin',
+            password='pass'
+        )
+        create_located_trips(self.user)
+
+    def clusters(self, query='zoom=0'):
+        response = self.client.get(f'/trips/clusters/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {
+            cluster['cell']: cluster for cluster in response.data['clusters']
+        }
+
+    def snapshot(self):
+        return sorted(
+            (c.level, c.cell, c.count, round(c.lat_sum, 6))
+            for c in TripCluster.objects.all()
+        )
+
+    def test_clusters_follow_trip_writes(self):
+        clusters = self.clusters()
+        self.assertEqual(clusters['u']['count'], 3)
+        self.assertAlmostEqual(
+            clusters['u']['lat'], (59.91 + 59.74 + 60.39) / 3
+        )
+        self.assertEqual(sum(c['count'] for c in clusters.values()), 4)
+
+        oslo = Trip.objects.get(place='Oslo')
+        oslo.shared = False
+        oslo.save()
+        self.assertEqual(self.clusters()['u']['count'], 2)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.clusters()['u']['count'], 3)
+        self.client.force_authenticate(user=None)
+
+        Trip.objects.get(place='Suva').delete()
+        Trip.objects.get(place='Bergen').delete()
+        clusters = self.clusters()
+        self.assertEqual(list(clusters), ['u'])
+        self.assertEqual(
+            clusters['u']['sample_trip_id'],
+            Trip.objects.get(place='Drammen').pk
+        )
+
+    def test_bbox_and_zoom(self):
+        clusters = self.clusters('zoom=8&bbox=59.5,10,60,11')
+        self.assertEqual(sum(c['count'] for c in clusters.values()), 2)
+        self.assertTrue(all(len(cell) == 4 for cell in clusters))
+
+        response = self.client.get('/trips/clusters/?zoom=99')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_matches_incremental_updates(self):
+        trip = Trip.objects.get(place='Oslo')
+        trip.lat, trip.lon = 60.39, 5.32
+        trip.save()
+        incremental = self.snapshot()
+        call_command('rebuild_trip_clusters', stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+
+class GeocodedTestCase(APITestCase):
+    '''
+    Base test case for the trip API tests that do not exercise geocoding:
+    the geocoder of Trip.clean() returns `coordinates` for every location.
+    '''
+
+    coordinates = (59.91, 10.75)
+
+    def setUp(self):
+        patcher = mock.patch(
+            'trips.models.get_coordinates', return_value=self.coordinates
+        )
+        self.get_coordinates = patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TripImageTestCase(GeocodedTestCase):
+    '''
+    Trips with shared and private images, liked by two users.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(
+            username='owner',
+            password='pass'
+        )
+        self.liker = User.objects.create_user(
+            username='liker',
+            password='pass'
+        )
+
+    def create_trip(self):
+        trip = Trip.objects.create(
+            owner=self.owner,
+            title='Trip',
+            place='Oslo',
+            country='Norway',
+            trip_category='Adventure',
+            trip_status='Planned',
+            start_date='2025-03-01',
+            end_date='2025-03-10'
+        )
+        for shared in (True, False):
+            image = Image.objects.create(
+                owner=self.owner,
+                trip=trip,
+                image_title='Image',
+                image=(
+                    'https://res.cloudinary.com/dchoskzxj/image/upload/'
+                    'v1721990160/yg9qwd4v15r23bxwv5u4.jpg'
+                ),
+                description='An image.',
+                shared=shared
+            )
+            Like.objects.create(owner=self.liker, image=image)
+            Like.objects.create(owner=self.owner, image=image)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+
+class TripListQueryCountTests(TripImageTestCase):
+    '''
+    Test that listing trips with their nested images and likes runs a
+    constant number of queries, whatever the number of trips.
+    '''
+
+    def test_query_count_is_flat(self):
+        for user in (None, self.liker, self.owner):
+            self.client.force_authenticate(user=user)
+            for url in ('/trips/', '/public/'):
+                self.create_trip()
+                one_trip, _ = self.count_queries(url)
+                for _ in range(4):
+                    self.create_trip()
+                queries, _ = self.count_queries(url)
+                self.assertEqual(queries, one_trip)
+                Trip.objects.all().delete()
+
+    def test_image_visibility(self):
+        self.create_trip()
+        trip = Trip.objects.get()
+        for user, images in ((None, 1), (self.liker, 1), (self.owner, 2)):
+            self.client.force_authenticate(user=user)
+            for url in ('/trips/', '/public/'):
+                data = self.client.get(url).data['results'][0]
+                self.assertEqual(len(data['images']), images)
+                self.assertEqual(data['images'][0]['likes_count'], 2)
+                self.assertCountEqual(
+                    [like['owner'] for like in data['images'][0]['likes']],
+                    ['liker', 'owner']
+                )
+            queries, response = self.count_queries(f'/trips/{trip.pk}/')
+            self.assertEqual(len(response.data['images']), images)
+            self.assertLessEqual(queries, 6)
+
+    def test_following_owner(self):
+        self.create_trip()
+        Follower.objects.create(owner=self.liker, followed=self.owner)
+        self.client.force_authenticate(user=self.liker)
+        one_trip, response = self.count_queries('/trips/')
+        data = response.data['results'][0]
+        self.assertTrue(data['is_following_owner'])
+        self.assertTrue(data['images'][0]['is_following_owner'])
+        for _ in range(3):
+            self.create_trip()
+        queries, _ = self.count_queries('/trips/')
+        self.assertEqual(queries, one_trip)
+
+        self.client.force_authenticate(user=self.owner)
+        data = self.client.get('/gallery/').data['results'][0]
+        self.assertFalse(data['is_following_owner'])
+
+
+class SparseFieldsetTests(TripImageTestCase):
+    '''
+    Test the `?fields=` and `?expand=` query parameters of the trip and
+    image list views.
+    '''
+
+    def test_trip_fields(self):
+        self.create_trip()
+        full_queries, _ = self.count_queries('/trips/')
+        queries, response = self.count_queries(
+            '/trips/?fields=id,title,place'
+        )
+        self.assertEqual(
+            set(response.data['results'][0]), {'id', 'title', 'place'}
+        )
+        self.assertLess(queries, full_queries)
+
+    def test_trip_expand(self):
+        self.create_trip()
+        data = self.client.get(
+            '/trips/?fields=title&expand=images'
+        ).data['results'][0]
+        self.assertEqual(set(data), {'title', 'images'})
+        self.assertNotIn('likes', data['images'][0])
+
+        data = self.client.get(
+            '/public/?expand=images,likes'
+        ).data['results'][0]
+        self.assertIn('images_count', data)
+        self.assertEqual(len(data['images'][0]['likes']), 2)
+
+    def test_image_fields(self):
+        self.create_trip()
+        trip = Trip.objects.get()
+        for url in ('/gallery/', f'/trips/{trip.pk}/images/'):
+            data = self.client.get(
+                f'{url}?fields=id,image_title&ordering=-likes_count'
+            ).data['results']
+            self.assertEqual(set(data[0]), {'id', 'image_title'})
+            data = self.client.get(f'{url}?expand=likes').data['results']
+            self.assertEqual(data[0]['likes_count'], 2)
+            self.assertEqual(len(data[0]['likes']), 2)
+
+    def test_unknown_field(self):
+        response = self.client.get('/trips/?fields=title,secret')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class KeysetPaginationTests(GeocodedTestCase):
+    '''
+    Test the cursor pagination mode of the trip and gallery lists.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            username='admin',
+            password='pass'
+        )
+
+    def create_trips(self, count):
+        for number in range(count):
+            Trip.objects.create(
+                owner=self.user,
+                title=f'Trip {number}',
+                place='Oslo',
+                country='Norway',
+                trip_category='Adventure',
+                trip_status='Planned',
+                start_date='2025-03-01',
+                end_date='2025-03-10'
+            )
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, len(queries)
+
+    def test_walk_pages(self):
+        self.create_trips(25)
+        expected = list(
+            Trip.objects.order_by('-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+        for url in ('/trips/?pagination=cursor', '/public/?pagination=cursor'):
+            pages, query_counts = [], []
+            while url:
+                data, queries = self.get(url)
+                self.assertNotIn('count', data)
+                pages.append(data)
+                query_counts.append(queries)
+                url = data['next']
+            self.assertEqual(
+                [trip['id'] for page in pages for trip in page['results']],
+                expected
+            )
+            self.assertEqual(len(set(query_counts)), 1)
+
+            previous, _ = self.get(pages[2]['previous'])
+            self.assertEqual(previous['results'], pages[1]['results'])
+            first, _ = self.get(pages[1]['previous'])
+            self.assertEqual(first['results'], pages[0]['results'])
+            self.assertIsNone(first['previous'])
+
+    def test_gallery_pages(self):
+        self.create_trips(1)
+        trip = Trip.objects.get()
+        for number in range(12):
+            Image.objects.create(
+                owner=self.user,
+                trip=trip,
+                image_title=f'Image {number}',
+                image=(
+                    'https://res.cloudinary.com/dchoskzxj/image/upload/'
+                    'v1721990160/yg9qwd4v15r23bxwv5u4.jpg'
+                ),
+                description='An image.'
+            )
+        data, _ = self.get('/gallery/?pagination=cursor')
+        next_page, _ = self.get(data['next'])
+        self.assertEqual(
+            len(data['results']) + len(next_page['results']), 12
+        )
+        self.assertIsNone(next_page['next'])
+
+    def test_page_numbers_remain_the_default(self):
+        self.create_trips(1)
+        data, _ = self.get('/trips/')
+        self.assertEqual(data['count'], 1)
+        response = self.client.get('/trips/?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CounterTests(TripImageTestCase):
+    '''
+    Test the stored image and like counters of trips and images.
+    '''
+
+    def assertCounters(self, trip, images_count, total_likes_count):
+        trip.refresh_from_db()
+        self.assertEqual(trip.images_count, images_count)
+        self.assertEqual(trip.total_likes_count, total_likes_count)
+
+    def test_counters_follow_writes(self):
+        self.create_trip()
+        trip = Trip.objects.get()
+        self.assertCounters(trip, 2, 4)
+        image = trip.images.first()
+        self.assertEqual(image.likes_count, 2)
+
+        image.likes.get(owner=self.liker).delete()
+        image.refresh_from_db()
+        self.assertEqual(image.likes_count, 1)
+        self.assertCounters(trip, 2, 3)
+
+        image.delete()
+        self.assertCounters(trip, 1, 2)
+
+    def test_save_keeps_counters(self):
+        self.create_trip()
+        trip = Trip.objects.get()
+        image = trip.images.first()
+        other = User.objects.create_user(username='other', password='pass')
+        Like.objects.create(owner=other, image=image)
+
+        trip.title = 'Renamed'
+        trip.save()
+        image.description = 'Renamed.'
+        image.save()
+        image.refresh_from_db()
+        self.assertEqual(image.likes_count, 3)
+        self.assertCounters(trip, 2, 5)
+
+    def test_reconcile_counters(self):
+        self.create_trip()
+        trip = Trip.objects.get()
+        Trip.objects.update(images_count=7, total_likes_count=0)
+        Image.objects.update(likes_count=0)
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('images.likes_count: 2 repaired', out.getvalue())
+        self.assertCounters(trip, 2, 4)
+        self.assertEqual(
+            list(trip.images.values_list('likes_count', flat=True)), [2, 2]
+        )
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertEqual(out.getvalue().count(': 0 repaired'), 3)
+
+    def test_gallery_ordering(self):
+        self.create_trip()
+        image = Image.objects.filter(shared=True).first()
+        Like.objects.filter(image=image, owner=self.liker).delete()
+        Image.objects.create(
+            owner=self.owner,
+            trip=image.trip,
+            image_title='Other',
+            image=image.image,
+            description='Another image.'
+        )
+        data = self.client.get('/gallery/?ordering=likes_count').data
+        self.assertEqual(
+            [item['likes_count'] for item in data['results']], [0, 1]
+        )
+
+
+class LikedByViewerTests(TripImageTestCase):
+    '''
+    Test the `is_liked` and `like_id` fields of the image payloads.
+    '''
+
+    def test_gallery(self):
+        self.create_trip()
+        self.client.force_authenticate(user=self.liker)
+        one_image, response = self.count_queries('/gallery/?fields=id,like_id')
+        like = Like.objects.get(
+            owner=self.liker, image=response.data['results'][0]['id']
+        )
+        self.assertEqual(response.data['results'][0]['like_id'], like.id)
+
+        self.create_trip()
+        Image.objects.filter(shared=True).first().likes.all().delete()
+        queries, response = self.count_queries('/gallery/')
+        self.assertLessEqual(queries, one_image + 1)
+        self.assertEqual(
+            [image['is_liked'] for image in response.data['results']],
+            [False, True]
+        )
+
+        self.client.force_authenticate(user=None)
+        data = self.client.get('/gallery/').data['results'][1]
+        self.assertEqual((data['is_liked'], data['like_id']), (False, None))
+
+    def test_trip_images_and_detail(self):
+        self.create_trip()
+        image = Image.objects.get(shared=True)
+        like = Like.objects.get(owner=self.liker, image=image)
+        self.client.force_authenticate(user=self.liker)
+        data = self.client.get(
+            '/trips/?expand=images'
+        ).data['results'][0]['images'][0]
+        self.assertEqual((data['is_liked'], data['like_id']), (True, like.id))
+        data = self.client.get(
+            f'/trips/{image.trip_id}/images/{image.pk}/'
+        ).data
+        self.assertEqual(data['like_id'], like.id)
+
+
+class LikesPreviewTests(TripImageTestCase):
+    '''
+    Test the capped preview of the likes of images and the paginated list
+    of all likes.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        self.likers = [
+            User.objects.create_user(username=f'fan{i}', password='pass')
+            for i in range(4)
+        ]
+
+    def like_all(self, image):
+        for user in self.likers:
+            Like.objects.create(owner=user, image=image)
+
+    @override_settings(LIKES_PREVIEW_SIZE=2)
+    def test_preview_is_capped(self):
+        self.create_trip()
+        self.create_trip()
+        for image in Image.objects.filter(shared=True):
+            self.like_all(image)
+        data = self.client.get('/gallery/').data['results']
+        for image in data:
+            self.assertEqual(image['likes_count'], 6)
+            self.assertEqual(
+                [like['owner'] for like in image['likes']], ['fan3', 'fan2']
+            )
+        data = self.client.get(f'/gallery/{data[0]["id"]}/').data
+        self.assertEqual(len(data['results'][0]['likes']), 2)
+
+    def test_likes_endpoint(self):
+        self.create_trip()
+        image = Image.objects.get(shared=True)
+        self.like_all(image)
+        response = self.client.get(f'/gallery/{image.pk}/likes/')
+        self.assertEqual(response.data['count'], 6)
+        self.assertEqual(response.data['results'][0]['owner'], 'fan3')
+
+        response = self.client.get(
+            f'/gallery/{image.pk}/likes/?pagination=cursor'
+        )
+        self.assertEqual(len(response.data['results']), 6)
+
+        private = Image.objects.get(shared=False)
+        response = self.client.get(f'/gallery/{private.pk}/likes/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(f'/gallery/{private.pk}/likes/')
+        self.assertEqual(response.data['count'], 2)
+
+
+class ResponseCacheTests(TripImageTestCase):
+    '''
+    Test the versioned response cache of the anonymous public endpoints.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        response_cache.get_cache().clear()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_hit_and_invalidation(self):
+        self.create_trip()
+        self.assertEqual(self.get('/public/')['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('/public/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(
+            self.get('/gallery/?b=1&a=2')['X-Cache'], 'MISS'
+        )
+        self.assertEqual(self.get('/gallery/?a=2&b=1')['X-Cache'], 'HIT')
+
+        Like.objects.filter(owner=self.liker).delete()
+        data = self.get('/public/').data['results'][0]
+        self.assertEqual(data['total_likes_count'], 2)
+        self.assertEqual(self.get('/gallery/?a=2&b=1')['X-Cache'], 'MISS')
+
+        Follower.objects.create(owner=self.liker, followed=self.owner)
+        self.assertEqual(self.get('/public/')['X-Cache'], 'HIT')
+        self.assertEqual(self.get('/profiles/')['X-Cache'], 'MISS')
+
+    def test_authenticated_bypass(self):
+        self.create_trip()
+        self.client.force_authenticate(user=self.liker)
+        self.assertEqual(self.get('/gallery/')['X-Cache'], 'BYPASS')
+        self.assertEqual(self.get('/gallery/')['X-Cache'], 'BYPASS')
+        self.assertTrue(self.get('/gallery/').data['results'][0]['is_liked'])
+
+    def test_stampede_protection(self):
+        self.create_trip()
+        self.get('/gallery/')
+        Image.objects.update(description='Changed.')
+        response_cache.bump_version('images')
+        key = ImageListGallery().get_response_cache_key(
+            APIRequestFactory().get('/gallery/')
+        )
+        response_cache.get_cache().add(f'{key}:lock', 1)
+        response = self.get('/gallery/')
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(response.data['results'][0]['description'],
+                         'An image.')
+
+        response_cache.get_cache().delete(f'{key}:lock')
+        response = self.get('/gallery/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['description'],
+                         'Changed.')
+
+    def test_metrics(self):
+        response_cache.reset_metrics()
+        self.get('/profiles/')
+        self.get('/profiles/')
+        self.client.force_authenticate(user=self.owner)
+        self.get('/profiles/')
+        self.assertEqual(response_cache.get_metrics(), {
+            'hit': 1, 'miss': 1, 'stale': 0, 'wait': 0, 'bypass': 1,
+        })
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                           'FileBasedCache',
+                'LOCATION': directory,
+            }}
+        ):
+            self.create_trip()
+            self.assertEqual(self.get('/gallery/')['X-Cache'], 'MISS')
+            response = self.get('/gallery/')
+            self.assertEqual(response['X-Cache'], 'HIT')
+            self.assertEqual(response.data['results'][0]['likes_count'], 2)
+            Like.objects.filter(owner=self.liker).delete()
+            self.assertEqual(self.get('/gallery/')['X-Cache'], 'MISS')
+
+
+class ConditionalGetTests(TripImageTestCase):
+    '''
+    Test the ETag validators and 304 responses of the trip, image and
+    profile views.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        response_cache.get_cache().clear()
+
+    def assertNotModified(self, url, etag, max_queries=1):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertLessEqual(len(queries), max_queries)
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_trip_detail(self):
+        self.create_trip()
+        trip = Trip.objects.get()
+        self.client.force_authenticate(user=self.liker)
+        url = f'/trips/{trip.pk}/'
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertNotModified(url, etag, max_queries=2)
+
+        Like.objects.filter(owner=self.liker).first().delete()
+        etag = self.assertModified(url, etag)
+        image = Image.objects.get(shared=True)
+        image.description = 'Changed.'
+        image.save()
+        etag = self.assertModified(url, etag)
+        trip.title = 'Renamed'
+        trip.save()
+        etag = self.assertModified(url, etag)
+
+        self.client.force_authenticate(user=self.owner)
+        self.assertModified(url, etag)
+        self.assertEqual(
+            self.client.get('/trips/0/').status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+
+    def test_image_views(self):
+        self.create_trip()
+        image = Image.objects.get(shared=True)
+        url = f'/trips/{image.trip_id}/images/{image.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+        image.description = 'Changed.'
+        image.save()
+        self.assertModified(url, etag)
+
+        etag = self.client.get(f'/gallery/{image.pk}/')['ETag']
+        self.assertNotModified(f'/gallery/{image.pk}/', etag, max_queries=0)
+
+    def test_lists(self):
+        self.create_trip()
+        self.client.force_authenticate(user=self.owner)
+        etag = self.client.get('/trips/')['ETag']
+        self.assertNotModified('/trips/', etag, max_queries=4)
+        self.assertModified('/trips/?page=1', etag)
+
+        self.client.force_authenticate(user=None)
+        etag = self.client.get('/gallery/')['ETag']
+        self.assertNotModified('/gallery/', etag, max_queries=0)
+        Image.objects.filter(shared=True).delete()
+        self.assertModified('/gallery/', etag)
+
+    def test_viewer_state(self):
+        self.create_trip()
+        other = User.objects.create_user(username='other', password='pass')
+        self.client.force_authenticate(user=other)
+        etag = self.client.get('/trips/')['ETag']
+        Follower.objects.create(owner=other, followed=self.owner)
+        etag = self.assertModified('/trips/', etag)
+        image = Image.objects.get(shared=True)
+        like = Like.objects.create(owner=other, image=image)
+        etag = self.assertModified(f'/trips/{image.trip_id}/', etag)
+
+        Image.objects.filter(pk=image.pk).update(likes_count=2)
+        like.delete()
+        self.assertModified(f'/trips/{image.trip_id}/', etag)
+
+    def test_list_validators_cover_the_page(self):
+        for _ in range(11):
+            self.create_trip()
+        self.client.force_authenticate(user=self.owner)
+        etag = self.client.get('/trips/?pagination=cursor')['ETag']
+        Trip.objects.filter(
+            pk=Trip.objects.order_by('created_at', 'id').first().pk
+        ).update(updated_at=timezone.now())
+        self.assertNotModified(
+            '/trips/?pagination=cursor', etag, max_queries=3
+        )
+        Trip.objects.filter(
+            pk=Trip.objects.order_by('-created_at', '-id').first().pk
+        ).update(updated_at=timezone.now())
+        self.assertModified('/trips/?pagination=cursor', etag)
+
+    def test_profiles(self):
+        url = f'/profiles/{self.owner.profile.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+        Follower.objects.create(owner=self.liker, followed=self.owner)
+        self.assertModified(url, etag)
+
+    def test_renamed_owner(self):
+        self.create_trip()
+        urls = ('/public/', '/gallery/', f'/profiles/{self.owner.profile.pk}/')
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        self.client.login(username='owner', password='pass')
+        self.client.logout()
+        self.assertNotModified(urls[0], etags[0])
+        self.assertEqual(self.client.get('/public/')['X-Cache'], 'HIT')
+
+        self.owner.username = 'renamed'
+        self.owner.save()
+        for url, etag in zip(urls, etags):
+            self.assertModified(url, etag)
+        response = self.client.get('/public/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['results'][0]['owner'], 'renamed')
+
+
+class SearchTests(TripImageTestCase):
+    '''
+    Test the full-text `q` search of trips and gallery images, and the
+    maintenance of the search index.
+    '''
+
+    def create_search_trip(self, title, place='Oslo', content='Notes.'):
+        return Trip.objects.create(
+            owner=self.owner,
+            title=title,
+            place=place,
+            country='Norway',
+            content=content,
+            trip_category='Adventure',
+            trip_status='Planned',
+            shared=True,
+            start_date='2025-03-01',
+            end_date='2025-03-10'
+        )
+
+    def search_titles(self, query, url='/trips/', **params):
+        response = self.client.get(url, {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            row.get('title') or row.get('image_title')
+            for row in response.data['results']
+        ]
+
+    def test_prefix_match(self):
+        self.create_search_trip('Rome beach trip', place='Rome')
+        self.create_search_trip('Mountain hike')
+        self.assertEqual(self.search_titles('ro bea'), ['Rome beach trip'])
+        self.assertEqual(self.search_titles('BEACH'), ['Rome beach trip'])
+        self.assertEqual(self.search_titles('owner'), [
+            'Mountain hike', 'Rome beach trip'
+        ])
+        self.assertEqual(self.search_titles('lisbon'), [])
+        self.assertEqual(len(self.search_titles('')), 2)
+
+    def test_title_match_ranks_first(self):
+        self.create_search_trip('Fjords', content='Sailing along coasts.')
+        self.create_search_trip('Sailing week')
+        self.create_search_trip('Museums', content='Rainy days.')
+        self.assertEqual(
+            self.search_titles('sailing'), ['Sailing week', 'Fjords']
+        )
+        self.assertEqual(
+            self.search_titles('sailing', ordering='created_at'),
+            ['Fjords', 'Sailing week']
+        )
+
+    def test_index_follows_saves_and_deletes(self):
+        trip = self.create_search_trip('Desert crossing')
+        self.assertEqual(self.search_titles('desert'), ['Desert crossing'])
+        trip.title = 'Jungle crossing'
+        trip.save()
+        self.assertEqual(self.search_titles('desert'), [])
+        self.assertEqual(self.search_titles('jungle'), ['Jungle crossing'])
+        trip.delete()
+        self.assertEqual(self.search_titles('crossing'), [])
+
+    def test_gallery_search(self):
+        self.create_trip()
+        image = Image.objects.get(shared=True)
+        image.image_title = 'Harbour sunset'
+        image.save()
+        self.assertEqual(
+            self.search_titles('harb', '/gallery/'), ['Harbour sunset']
+        )
+        self.assertEqual(
+            self.search_titles('oslo', '/gallery/'), ['Harbour sunset']
+        )
+        Trip.objects.update(place='Bergen')
+        self.assertEqual(self.search_titles('bergen', '/gallery/'), [])
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 1 trips and 2 images.', out.getvalue())
+        self.assertEqual(
+            self.search_titles('bergen', '/gallery/'), ['Harbour sunset']
+        )
+
+
+class PlaceIndexTests(SimpleTestCase):
+    '''
+    Test the prefix matching and counting of the in-memory place index.
+    '''
+
+    def point(self, place, country, lat=None, lon=None):
+        return places.place_point(True, place, country, lat, lon)
+
+    def test_search(self):
+        index = places.PlaceIndex()
+        index.load([
+            self.point('Paris', 'France', 48.85, 2.35),
+            self.point('paris ', 'FRANCE', 48.86, 2.35),
+            self.point('Parma', 'Italy'),
+            self.point('São Paulo', 'Brazil'),
+        ])
+        self.assertEqual(
+            [(row['place'], row['trips_count'])
+             for row in index.search('PAR')],
+            [('Paris', 2), ('Parma', 1)]
+        )
+        self.assertEqual(index.search('par')[0]['lat'], 48.86)
+        self.assertEqual(index.search('ital')[0]['place'], 'Parma')
+        self.assertEqual(index.search('sao')[0]['place'], 'São Paulo')
+        self.assertEqual(len(index.search('p', limit=1)), 1)
+        self.assertEqual(index.search(' '), [])
+        self.assertIsNone(places.place_point(False, 'Oslo', 'Norway', 0, 0))
+
+    def test_add_and_remove(self):
+        index = places.PlaceIndex()
+        index.load([])
+        index.add([self.point('Oslo', 'Norway')] * 2)
+        index.remove([self.point('Oslo', 'Norway')])
+        self.assertEqual(index.search('osl')[0]['trips_count'], 1)
+        index.remove([self.point('oslo', 'norway')])
+        self.assertEqual(index.search('nor'), [])
+        self.assertEqual(index.terms, [])
+        index.remove([self.point('Bergen', 'Norway')])
+        self.assertEqual(index.entries, {})
+
+
+class PlaceAutocompleteTests(GeocodedTestCase):
+    '''
+    Test the place autocomplete endpoint and the incremental updates of
+    its index on trip writes.
+    '''
+
+    url = '/trips/places/autocomplete/'
+
+    def setUp(self):
+        super().setUp()
+        places.place_index.clear()
+        self.user = User.objects.create_user(
+            username='traveller',
+            password='pass'
+        )
+
+    def create_trip(self, place, country='Norway', shared=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Trip.objects.create(
+                owner=self.user,
+                title='Trip',
+                place=place,
+                country=country,
+                trip_category='Adventure',
+                trip_status='Planned',
+                shared=shared,
+                start_date='2025-03-01',
+                end_date='2025-03-10'
+            )
+
+    def suggest(self, query):
+        response = self.client.get(self.url, {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['place'], row['trips_count']) for row in response.data]
+
+    def test_suggestions(self):
+        self.create_trip('Oslo')
+        self.create_trip('Bergen')
+        self.create_trip('Hidden', shared=False)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.suggest('os'), [('Oslo', 1)])
+        self.assertEqual(len(queries), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                self.suggest('norway'), [('Bergen', 1), ('Oslo', 1)]
+            )
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.suggest('hid'), [])
+        response = self.client.get(self.url, {'q': 'o', 'limit': 100})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_incremental_updates(self):
+        trip = self.create_trip('Oslo')
+        self.assertEqual(self.suggest('os'), [('Oslo', 1)])
+        self.create_trip('oslo')
+        self.assertEqual(self.suggest('os'), [('Oslo', 2)])
+
+        trip.place = 'Tromsø'
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.save()
+        self.assertEqual(self.suggest('os'), [('Oslo', 1)])
+        self.assertEqual(self.suggest('troms'), [('Tromsø', 1)])
+
+        trip.shared = False
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.save()
+        self.assertEqual(self.suggest('troms'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Trip.objects.filter(place='oslo').delete()
+        self.assertEqual(self.suggest('os'), [])
+
+
+class CountryCodeTests(GeocodedTestCase):
+    '''
+    Test the ISO country codes of trips, the country filters and the
+    per-country counts.
+    '''
+
+    coordinates = (38.9, -77.0)
+
+    def setUp(self):
+        super().setUp()
+        response_cache.get_cache().clear()
+        self.user = User.objects.create_user(
+            username='traveller',
+            password='pass'
+        )
+
+    def create_trip(self, country, shared=True):
+        return Trip.objects.create(
+            owner=self.user,
+            title='Trip',
+            place='Washington',
+            country=country,
+            trip_category='Adventure',
+            trip_status='Planned',
+            shared=shared,
+            start_date='2025-03-01',
+            end_date='2025-03-10'
+        )
+
+    def test_code_set_on_save(self):
+        for country in ('USA', 'United States', 'us'):
+            self.assertEqual(self.create_trip(country).country_code, 'US')
+        trip = self.create_trip('Atlantis')
+        self.assertIsNone(trip.country_code)
+        trip.country = 'Côte d’Ivoire'
+        trip.save(update_fields=['country'])
+        trip.refresh_from_db()
+        self.assertEqual(trip.country_code, 'CI')
+
+    def test_country_filter(self):
+        for country in ('USA', 'United States', 'us', 'Canada'):
+            self.create_trip(country)
+        self.create_trip('Atlantis')
+        for param in ('country', 'country_code'):
+            response = self.client.get('/trips/', {param: 'usa'})
+            self.assertEqual(response.data['count'], 3)
+        response = self.client.get('/trips/', {'country': 'Atlantis'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertIsNone(response.data['results'][0]['country_code'])
+
+    def test_country_counts(self):
+        for country in ('USA', 'United States', 'Canada', 'Atlantis'):
+            self.create_trip(country)
+        self.create_trip('Canada', shared=False)
+        response = self.client.get('/trips/countries/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'country_code': 'US', 'country': 'United States',
+             'trips_count': 2},
+            {'country_code': 'CA', 'country': 'Canada', 'trips_count': 1},
+        ])
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(
+            '/trips/countries/', {'trip_status': 'Planned'}
+        )
+        self.assertEqual(
+            [row['trips_count'] for row in response.data], [2, 2]
+        )
+
+    def test_backfill_command(self):
+        self.create_trip('USA')
+        self.create_trip('Atlantis')
+        Trip.objects.update(country_code=None)
+        out = StringIO()
+        call_command('backfill_country_codes', stdout=out)
+        self.assertIn('Updated the country code of 1 trips.', out.getvalue())
+        self.assertIn('Unknown countries: Atlantis', out.getvalue())
+        self.assertEqual(
+            Trip.objects.get(country='USA').country_code, 'US'
+        )
+        out = StringIO()
+        call_command('backfill_country_codes', '--all', stdout=out)
+        self.assertIn('Updated the country code of 0 trips.', out.getvalue())
+
+
+@override_settings(
+    TRENDING_HALF_LIFE_HOURS=24, TRENDING_MIN_SCORE=0.01,
+    TRENDING_REFRESH_LAG_SECONDS=0
+)
+class TrendingTests(TripImageTestCase):
+    '''
+    Test the time-decayed trending scores and the trending endpoints.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        response_cache.get_cache().clear()
+        self.fan = User.objects.create_user(username='fan', password='pass')
+
+    def age_likes(self, image, days):
+        Like.objects.filter(image=image).update(
+            created_at=timezone.now() - timedelta(days=days)
+        )
+
+    def ranked_images(self):
+        response = self.client.get('/gallery/trending/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['id'] for row in response.data['results']]
+
+    def test_recent_likes_rank_first(self):
+        self.create_trip()
+        self.create_trip()
+        old, recent = Image.objects.filter(shared=True).order_by('pk')
+        Like.objects.create(owner=self.fan, image=old)
+        self.age_likes(old, 3)
+        self.assertEqual(trending.refresh(), (9, 4, 2))
+        self.assertEqual(self.ranked_images(), [recent.pk, old.pk])
+
+        response = self.client.get('/trips/trending/')
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [recent.trip_id, old.trip_id]
+        )
+
+    def test_incremental_refresh(self):
+        self.create_trip()
+        self.create_trip()
+        first, second = Image.objects.filter(shared=True).order_by('pk')
+        trending.refresh()
+        self.assertEqual(self.ranked_images(), [second.pk, first.pk])
+        Like.objects.create(owner=self.fan, image=first)
+        self.assertEqual(trending.refresh()[0], 1)
+        self.assertEqual(self.ranked_images(), [first.pk, second.pk])
+        self.assertAlmostEqual(
+            TrendingImage.objects.get(pk=first.pk).score,
+            TrendingImage.objects.get(pk=second.pk).score * 1.5,
+            places=3
+        )
+
+    @override_settings(TRENDING_REFRESH_LAG_SECONDS=60)
+    def test_late_commits_are_counted(self):
+        self.create_trip()
+        image = Image.objects.get(shared=True)
+        now = timezone.now()
+        self.assertEqual(trending.refresh(now=now)[0], 0)
+        self.assertEqual(trending.refresh(now=now + timedelta(minutes=2)), (
+            4, 2, 1
+        ))
+
+        like = Like.objects.create(owner=self.fan, image=image)
+        Like.objects.filter(pk=like.pk).update(
+            created_at=now + timedelta(seconds=90)
+        )
+        self.assertEqual(
+            trending.refresh(now=now + timedelta(minutes=4))[0], 1
+        )
+        self.assertEqual(
+            trending.refresh(now=now + timedelta(minutes=6))[0], 0
+        )
+
+    def test_prune_and_rebase(self):
+        self.create_trip()
+        self.create_trip()
+        old, recent = Image.objects.filter(shared=True).order_by('pk')
+        self.age_likes(old, 10)
+        trending.refresh(full=True)
+        self.assertEqual(self.ranked_images(), [recent.pk])
+
+        later = timezone.now() + timedelta(days=100)
+        Like.objects.create(owner=self.fan, image=old)
+        Like.objects.filter(owner=self.fan).update(created_at=later)
+        trending.refresh(now=later)
+        state = TrendingState.objects.get()
+        self.assertEqual(state.epoch, later)
+        self.assertEqual(self.ranked_images(), [old.pk])
+        self.assertAlmostEqual(
+            TrendingImage.objects.get(pk=old.pk).score, 1.0, places=6
+        )
+
+    def test_command(self):
+        self.create_trip()
+        out = StringIO()
+        call_command('refresh_trending', '--once', '--full', stdout=out)
+        self.assertIn(
+            'Counted 4 likes; 2 images and 1 trips are trending.',
+            out.getvalue()
+        )
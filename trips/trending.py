@@ -0,0 +1,147 @@
+"""
+Time-decayed trending rankings of images and trips.
+
+Every like counts 1 when it is given, and half as much after each
+TRENDING_HALF_LIFE_HOURS. Instead of decaying every stored score on each
+run, scores are kept relative to a fixed epoch: a like given at time t
+adds 2 ** ((t - epoch) / half-life), and the decayed score at time `now`
+is the stored score times 2 ** ((epoch - now) / half-life). The factor is
+the same for every row, so the index on the stored scores orders the
+rankings at any time, and a refresh only adds the likes written since the
+previous one. The epoch is moved forward before the weights grow too
+large, with one UPDATE, and rows whose decayed score fell below
+TRENDING_MIN_SCORE are deleted, which keeps the tables small.
+
+Refreshes count likes by creation time, up to TRENDING_REFRESH_LAG_SECONDS
+before the refresh: a like's created_at is set just before its INSERT,
+so a like that commits late (with a lower id than likes counted
+already) is still counted by the next refresh, as long as its
+transaction commits within the lag.
+
+Deleted likes are not subtracted by incremental refreshes; a full
+refresh recomputes the scores from the likes of the last
+TRENDING_MAX_AGE_DAYS, and the refresh_trending command runs one
+periodically.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from api.cache import invalidate
+from likes.models import Like
+from .models import TrendingImage, TrendingState, TrendingTrip
+
+REBASE_HALF_LIVES = 64
+BATCH_SIZE = 2000
+
+
+def half_life():
+    return timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def weight(timestamp, epoch):
+    return 2.0 ** ((timestamp - epoch) / half_life())
+
+
+def decay_factor(epoch, now):
+    """
+    Return the factor turning scores stored relative to `epoch` into
+    scores decayed to `now`.
+    """
+    return 2.0 ** ((epoch - now) / half_life())
+
+
+def add_scores(model, field, scores):
+    existing = dict(
+        model.objects.filter(pk__in=scores).values_list('pk', 'score')
+    )
+    model.objects.bulk_create(
+        [
+            model(**{f'{field}_id': pk, 'score': existing.get(pk, 0) + score})
+            for pk, score in scores.items()
+        ],
+        update_conflicts=True,
+        unique_fields=[field],
+        update_fields=['score']
+    )
+
+
+def add_likes(likes, epoch):
+    """
+    Add a batch of (id, image id, trip id, created_at) likes to the
+    scores.
+    """
+    image_scores, trip_scores = {}, {}
+    for _, image_id, trip_id, created_at in likes:
+        value = weight(created_at, epoch)
+        image_scores[image_id] = image_scores.get(image_id, 0) + value
+        trip_scores[trip_id] = trip_scores.get(trip_id, 0) + value
+    add_scores(TrendingImage, 'image', image_scores)
+    add_scores(TrendingTrip, 'trip', trip_scores)
+
+
+def refresh(full=False, now=None):
+    """
+    Update the trending scores with the likes created since the last
+    refresh, or recompute them all when `full` is set or no full refresh
+    ran yet.
+    Returns:
+        tuple: The number of likes counted, and of ranked images and
+               trips.
+    """
+    now = now or timezone.now()
+    until = now - timedelta(seconds=settings.TRENDING_REFRESH_LAG_SECONDS)
+    with transaction.atomic():
+        state = TrendingState.objects.select_for_update().first()
+        if state is None:
+            state = TrendingState.objects.create(epoch=now)
+
+        likes = Like.objects.filter(created_at__lte=until)
+        if full or state.counted_until is None:
+            TrendingImage.objects.all().delete()
+            TrendingTrip.objects.all().delete()
+            state.epoch = now
+            state.counted_until = None
+            likes = likes.filter(created_at__gte=now - timedelta(
+                days=settings.TRENDING_MAX_AGE_DAYS
+            ))
+        else:
+            if (now - state.epoch) / half_life() > REBASE_HALF_LIVES:
+                factor = decay_factor(state.epoch, now)
+                for model in (TrendingImage, TrendingTrip):
+                    model.objects.update(score=F('score') * factor)
+                state.epoch = now
+            likes = likes.filter(created_at__gt=state.counted_until)
+
+        counted = 0
+        last_key = None
+        while True:
+            batch = likes.order_by('created_at', 'pk')
+            if last_key is not None:
+                batch = batch.filter(
+                    Q(created_at__gt=last_key[0])
+                    | Q(created_at=last_key[0], pk__gt=last_key[1])
+                )
+            batch = list(batch.values_list(
+                'pk', 'image_id', 'image__trip_id', 'created_at'
+            )[:BATCH_SIZE])
+            if not batch:
+                break
+            add_likes(batch, state.epoch)
+            last_key = batch[-1][3], batch[-1][0]
+            counted += len(batch)
+
+        threshold = settings.TRENDING_MIN_SCORE / decay_factor(
+            state.epoch, now
+        )
+        for model in (TrendingImage, TrendingTrip):
+            model.objects.filter(score__lt=threshold).delete()
+
+        state.counted_until = max(until, state.counted_until or until)
+        state.refreshed_at = now
+        state.save()
+        invalidate('trending')
+    return (
+        counted, TrendingImage.objects.count(), TrendingTrip.objects.count()
+    )
@@ -12,6 +12,26 @@ urlpatterns = [
         views.TripList.as_view(),
         name='trip_list'
     ),
+    path(
+        'trips/clusters/',
+        views.TripClusterList.as_view(),
+        name='trip-clusters'
+    ),
+    path(
+        'trips/trending/',
+        views.TripTrendingList.as_view(),
+        name='trip-trending'
+    ),
+    path(
+        'trips/countries/',
+        views.TripCountryList.as_view(),
+        name='trip-countries'
+    ),
+    path(
+        'trips/places/autocomplete/',
+        views.PlaceAutocomplete.as_view(),
+        name='place-autocomplete'
+    ),
     path(
         'trips/<int:pk>/',
         views.TripDetail.as_view(),
@@ -32,9 +52,19 @@ urlpatterns = [
         views.ImageListGallery.as_view(),
         name='image-gallery'
     ),
+    path(
+        'gallery/trending/',
+        views.ImageTrendingList.as_view(),
+        name='image-trending'
+    ),
     path(
         'gallery/<int:pk>/',
         views.ImageListGalleryDetail.as_view(),
         name='detail-gallery'
     ),
+    path(
+        'gallery/<int:pk>/likes/',
+        views.ImageLikeList.as_view(),
+        name='image-likes'
+    ),
 ]
@@ -1,44 +1,244 @@
 import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from geopy import geocoders
-from geopy.exc import GeocoderTimedOut
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from geopy.exc import GeopyError
 from cloudinary import CloudinaryResource
+from .geocoding import get_geocoders
 
 
-def get_coordinates(location, attempt=1, max_attempts=5):
+LOCATION_ERROR = 'location-error'
+
+
+class LocationCache:
+    """
+    Thread-safe, in-process LRU cache for geocoding results.
+    Every entry carries its own expiry time, so positive and negative
+    results can be kept for different periods.
+    Attributes:
+        maxsize (int): Maximum number of entries kept in memory.
+    Methods:
+        get(key): Return the cached value, or None if missing or expired.
+        set(key, value, ttl): Store a value for `ttl` seconds.
+        clear(): Drop all entries.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+location_cache = LocationCache(
+    maxsize=getattr(settings, 'GEOCODE_CACHE_SIZE', 1024)
+)
+
+
+def normalize_location(location):
+    '''
+    Normalize a "place, country" string into the key used by the
+    geocoding cache: case-folded, with collapsed whitespace and a single
+    space after each comma, so "  Paris ,FRANCE" and "paris, france"
+    share one entry.
+    '''
+    parts = (' '.join(part.split()) for part in str(location).split(','))
+    return ', '.join(part for part in parts if part).casefold()
+
+
+def _cache_ttl(coords):
+    """
+    Return the lifetime in seconds of a cached geocoding result.
+    Negative results ('location-error') expire sooner than coordinates.
+    """
+    if coords == LOCATION_ERROR:
+        return getattr(settings, 'GEOCODE_CACHE_NEGATIVE_TTL', 60 * 60 * 24)
+    return getattr(settings, 'GEOCODE_CACHE_TTL', 60 * 60 * 24 * 30)
+
+
+def _load_stored_coordinates(key, allow_stale=False):
+    """
+    Look up a location in the persistent geocoding cache.
+    Args:
+        key (str): The normalized location.
+        allow_stale (bool): Also return expired coordinates, used when the
+                            geocoding service is unavailable.
+    Returns:
+        tuple or None: (coords, remaining_ttl) for a fresh entry,
+                       None if the entry is missing or expired.
+    """
+    from .models import GeocodedLocation
+
+    entry = GeocodedLocation.objects.filter(location=key).first()
+    if entry is None:
+        return None
+    coords = entry.coordinates
+    age = (timezone.now() - entry.updated_at).total_seconds()
+    remaining_ttl = _cache_ttl(coords) - age
+    if remaining_ttl <= 0:
+        if allow_stale and coords != LOCATION_ERROR:
+            return coords, 0
+        return None
+    return coords, remaining_ttl
+
+
+def _store_coordinates(key, coords):
+    """
+    Save a geocoding result, positive or negative, in the persistent cache.
+    """
+    from .models import GeocodedLocation
+
+    lat, lon = (None, None) if coords == LOCATION_ERROR else coords
+    GeocodedLocation.objects.update_or_create(
+        location=key,
+        defaults={'lat': lat, 'lon': lon}
+    )
+
+
+def get_cached_coordinates(location):
     '''
-    Geocodes an address with retry on timeout.
-    GeoPy documentation:
-    https://geopy.readthedocs.io/en/latest/#geopy.exc.GeocoderTimedOut
+    Look up a location in the in-process and persistent geocoding caches,
+    without calling the geocoding service.
+
+    Parameters:
+        location (str): The location to look up.
+
+    Returns:
+        tuple or str or None: Cached coordinates or 'location-error',
+                              None if the location is not cached.
+    '''
+    key = normalize_location(location)
+    coords = location_cache.get(key)
+    if coords is not None:
+        return coords
+
+    stored = _load_stored_coordinates(key)
+    if stored is None:
+        return None
+    coords, ttl = stored
+    location_cache.set(key, coords, ttl)
+    return coords
+
+
+def cache_coordinates(location, coords):
+    '''
+    Store a geocoding result in both cache tiers.
+
+    Parameters:
+        location (str): The geocoded location.
+        coords (tuple or str): Coordinates, or 'location-error'.
+    '''
+    key = normalize_location(location)
+    _store_coordinates(key, coords)
+    location_cache.set(key, coords, _cache_ttl(coords))
+
+
+def get_coordinates(location):
+    '''
+    Geocodes an address through a two-tier cache.
+    Results are looked up first in the in-process LRU cache, then in the
+    GeocodedLocation table, and only then requested from the geocoding
+    service. Both found coordinates and 'location-error' results are
+    cached, each with its own TTL (GEOCODE_CACHE_TTL and
+    GEOCODE_CACHE_NEGATIVE_TTL settings). If the geocoding service fails,
+    expired coordinates from the table are returned when available.
 
     Parameters:
         location (str): The location to geocode.
-        attempts (int, optional): Current retry attempt. Default is 1.
-        max_attempts (int, optional): Maximum retry attempts. Default is 5.
 
     Returns:
-        tuple: Geocoded location data (Latitude and Longitude).
+        tuple: Geocoded location data (Latitude and Longitude),
+               or 'location-error' if the location could not be found.
 
     Raises:
-        GeocoderTimedOut: If the max number of attempts is exceeded.
+        GeopyError: If the geocoding backends fail.
     '''
-    geocoder = geocoders.Nominatim(user_agent='trip')
+    coords = get_cached_coordinates(location)
+    if coords is not None:
+        return coords
+
     try:
-        get_location = geocoder.geocode(
-            location,
-            exactly_one=True,
-            language='en'
+        coords = geocode_location(location)
+    except GeopyError:
+        stored = _load_stored_coordinates(
+            normalize_location(location), allow_stale=True
         )
+        if stored is None:
+            raise
+        return stored[0]
 
-        if get_location:
-            return get_location.latitude, get_location.longitude
-        return 'location-error'
-    except GeocoderTimedOut:
-        if attempt < max_attempts:
-            return get_coordinates(location,
-                                   attempt=attempt+1,
-                                   max_attempts=max_attempts)
-        raise GeocoderTimedOut("Max attempts exceeded") from None
+    cache_coordinates(location, coords)
+    return coords
+
+
+def geocode_location(location):
+    '''
+    Geocodes an address with the backends listed in the
+    GEOCODER_BACKENDS setting, bypassing the cache. Backends are tried in
+    order until one of them finds the location.
+
+    Parameters:
+        location (str): The location to geocode.
+
+    Returns:
+        tuple: Geocoded location data (Latitude and Longitude),
+               or 'location-error' if no backend found the location.
+
+    Raises:
+        GeopyError: If a backend fails, e.g. GeocoderTimedOut when the
+                    max number of attempts is exceeded.
+    '''
+    for geocoder in get_geocoders():
+        coords = geocoder.geocode(location)
+        if coords is not None:
+            return coords
+    return LOCATION_ERROR
+
+
+def annotate_like_id(queryset, user):
+    """
+    Annotate an Image queryset with `like_id`, the id of the user's like
+    of each image or None, read by ImageSerializer for `is_liked` and
+    `like_id`. Anonymous users get no annotation. The Like model is
+    reached through the `likes` relation, as the likes app imports this
+    module's models.
+    """
+    if not user.is_authenticated:
+        return queryset
+    like_model = queryset.model._meta.get_field('likes').related_model
+    return queryset.annotate(like_id=Subquery(
+        like_model.objects.filter(
+            owner=user, image=OuterRef('pk')
+        ).values('pk')
+    ))
 
 
 def validate_image(image):
@@ -1,18 +1,207 @@
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Q
+from django.db.models import Count, Prefetch, Q
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import (
     FilterSet, DateFilter, CharFilter, MultipleChoiceFilter,
-    BooleanFilter,
+    BooleanFilter, BaseCSVFilter, NumberFilter,
 )
 from rest_framework import status
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework import generics, filters
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from api.cache import AnonymousResponseCacheMixin
+from api.mixins import ConditionalGetMixin, SparseFieldsetMixin
+from api.pagination import SelectablePagination
 from api.permissions import IsOwnerOrReadOnly
-from .models import Trip, Image
+from followers.mixins import FollowingMapMixin
+from followers.models import Follower
+from likes.models import Like
+from likes.serializers import LikeSerializer
+from . import geohash, places, search
+from .countries import COUNTRY_NAMES, country_code
+from .models import Trip, Image, GeocodeJob, TripCluster
 from .serializers import TripSerializer, ImageSerializer
+from .utils import annotate_like_id
+
+DEFAULT_RADIUS_KM = 50
+MAX_RADIUS_KM = 20000
+MAX_ZOOM = 22
+
+
+def parse_bbox(values):
+    """
+    Validate a "south,west,north,east" bounding box.
+    Raises:
+        ValidationError: If the box is malformed.
+    """
+    try:
+        south, west, north, east = map(float, values)
+    except (TypeError, ValueError):
+        raise ValidationError(
+            {'bbox': ['Expected "south,west,north,east".']}
+        ) from None
+    if not (-90 <= south <= north <= 90
+            and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValidationError({'bbox': ['Invalid bounding box.']})
+    return south, west, north, east
+
+
+def prefetch_image_relations(queryset, user, likes=True, like_id=True):
+    """
+    Load the owners of an Image queryset, annotate the user's like ids
+    and, on request, prefetch the LIKES_PREVIEW_SIZE most recent likes of
+    every image with the like owners into `recent_likes`. The sliced
+    prefetch runs as one window function query for the whole page.
+    """
+    queryset = queryset.select_related('owner')
+    if like_id:
+        queryset = annotate_like_id(queryset, user)
+    if likes:
+        recent_likes = Like.objects.select_related('owner').order_by(
+            '-created_at', '-id'
+        )[:settings.LIKES_PREVIEW_SIZE]
+        queryset = queryset.prefetch_related(
+            Prefetch('likes', queryset=recent_likes, to_attr='recent_likes')
+        )
+    return queryset
+
+
+def prefetch_trip_relations(queryset, user, images=True, likes=True):
+    """
+    Load the owners, profiles, visible images, their likes, like owners
+    and the user's like ids of a Trip queryset in a constant number of queries.
+    Trip owners see all images of their trips; other users only see the
+    shared ones. The images are stored in the `visible_images` attribute
+    read by TripSerializer.get_images().
+    """
+    queryset = queryset.select_related('owner__profile')
+    if not images:
+        return queryset
+
+    images = prefetch_image_relations(
+        Image.objects.order_by('-uploaded_at'), user, likes=likes
+    )
+    if user.is_authenticated:
+        images = images.filter(Q(shared=True) | Q(trip__owner=user))
+    else:
+        images = images.filter(shared=True)
+    return queryset.prefetch_related(
+        Prefetch('images', queryset=images, to_attr='visible_images')
+    )
+
+
+class TripQuerysetMixin(SparseFieldsetMixin):
+    """
+    Mixin for the trip list views, supporting sparse fieldsets
+    (`?fields=` and `?expand=images,likes`) and skipping the prefetches
+    of the fields that are not requested.
+    Methods:
+        optimize_trip_queryset(queryset): Prefetch the relations of the
+            requested fields.
+    """
+
+    def optimize_trip_queryset(self, queryset):
+        return prefetch_trip_relations(
+            queryset,
+            self.request.user,
+            images=self.is_field_requested('images', expandable=True),
+            likes=self.is_field_requested('likes', expandable=True)
+        )
+
+
+class TripConditionalGetMixin(ConditionalGetMixin):
+    """
+    Conditional GET validators of the trip views: the trips, their images
+    and owner profiles timestamps, the trip counters, and the follows and
+    likes of the user.
+    """
+
+    validator_timestamps = (
+        'updated_at', 'images__updated_at', 'owner__profile__updated_at',
+    )
+    validator_counters = ('images_count', 'total_likes_count')
+    viewer_relations = ((Follower, 'owner'), (Like, 'owner'))
+
+
+class ImageConditionalGetMixin(ConditionalGetMixin):
+    """
+    Conditional GET validators of the image views: the images and owner
+    profiles timestamps, the like counters, and the follows and likes of
+    the user.
+    """
+
+    validator_timestamps = ('updated_at', 'owner__profile__updated_at')
+    validator_counters = ('likes_count',)
+    viewer_relations = ((Follower, 'owner'), (Like, 'owner'))
+
+
+class TripFollowingMapMixin(FollowingMapMixin):
+    """
+    Follow map of the trip views, covering the owners of the trips and of
+    their prefetched images.
+    """
+
+    def get_following_owner_ids(self, objects):
+        owner_ids = super().get_following_owner_ids(objects)
+        for trip in objects:
+            owner_ids.update(
+                image.owner_id
+                for image in getattr(trip, 'visible_images', ())
+            )
+        return owner_ids
+
+
+class ImageQuerysetMixin(SparseFieldsetMixin):
+    """
+    Mixin for the image list views, supporting sparse fieldsets
+    (`?fields=` and `?expand=likes`) and skipping the likes prefetch
+    and like id annotation when they are not requested.
+    """
+
+    def optimize_image_queryset(self, queryset):
+        return prefetch_image_relations(
+            queryset,
+            self.request.user,
+            likes=self.is_field_requested('likes', expandable=True),
+            like_id=(
+                self.is_field_requested('is_liked')
+                or self.is_field_requested('like_id')
+            )
+        )
+
+
+class DeferredGeocodingMixin:
+    """
+    Mixin for the trip creation views. With GEOCODE_DEFERRED enabled, new
+    trips are saved with a pending geocode status and queued for the
+    background geocoding worker instead of being geocoded in the request.
+    Methods:
+        get_serializer_context():
+            Adds the deferred geocoding flag to the serializer context.
+        perform_create(serializer):
+            Saves the new trip with the owner set to the current user,
+                queueing it for geocoding when deferred.
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['defer_geocoding'] = settings.GEOCODE_DEFERRED
+        return context
+
+    def perform_create(self, serializer):
+        if not settings.GEOCODE_DEFERRED:
+            serializer.save(owner=self.request.user)
+            return
+
+        with transaction.atomic():
+            trip = serializer.save(
+                owner=self.request.user,
+                geocode_status=Trip.GEOCODE_PENDING
+            )
+            GeocodeJob.enqueue(trip)
 
 
 class UserFilteredMixin:
@@ -41,12 +230,46 @@ class UserFilteredMixin:
         return queryset
 
 
-class TripFilter(UserFilteredMixin, FilterSet):
+class RankedSearchMixin:
+    """
+    A mixin for filter sets with a ranked full-text search filter, `q`.
+    Attributes:
+        search_document (dict): The search document of the model.
+        search_ordering (tuple): Ordering of results with equal ranks.
+    Methods:
+        filter_q(queryset, name, value):
+            Filters the queryset to the rows matching every word of the
+                value as a prefix, best ranked first unless the request
+                has an `ordering` parameter.
+    """
+    search_document = None
+    search_ordering = ()
+
+    def filter_q(self, queryset, name, value):
+        queryset = search.search(queryset, value, self.search_document)
+        ranked = 'search_rank' in queryset.query.annotations
+        if ranked and 'ordering' not in self.request.query_params:
+            return queryset.order_by('-search_rank', *self.search_ordering)
+        return queryset
+
+
+class NumberListFilter(BaseCSVFilter, NumberFilter):
+    """
+    Filter taking a comma-separated list of numbers, e.g. coordinates.
+    """
+
+
+class TripFilter(RankedSearchMixin, UserFilteredMixin, FilterSet):
     """
     A filter class for filtering Trip instances based on various criteria.
     Attributes:
+        q (CharFilter): Full-text search of title, place, country, content,
+                        category, status and owner, with prefix matching.
         owner__username (CharFilter): Filters trips by the owner's username.
-        country (CharFilter): Filters trips by country.
+        country (CharFilter): Filters trips by country; names, aliases and
+                              ISO codes of a known country match all its
+                              spellings through the indexed country_code.
+        country_code (CharFilter): Same as `country`.
         place (CharFilter): Filters trips by place.
         liked_by_user (BooleanFilter): Filters trips liked by the current user.
         user_trips (BooleanFilter): Filters trips by the user's profile.
@@ -54,20 +277,40 @@ class TripFilter(UserFilteredMixin, FilterSet):
         followed_users (BooleanFilter): Filters trips by followed users.
         trip_category (MultipleChoiceFilter): Filters trips by category.
         trip_status (MultipleChoiceFilter): Filters trips by status.
+        geocode_status (MultipleChoiceFilter): Filters trips by geocoding
+                                                status.
         trip_shared (BooleanFilter): Filters trips by shared status.
         start_date (DateFilter): Filters trips starting from a specific date.
         end_date (DateFilter): Filters trips ending by a specific date.
+        bbox (NumberListFilter): Filters trips inside a bounding box given
+                                 as "south,west,north,east".
+        near (NumberListFilter): Filters trips within `radius_km` of a
+                                 point given as "lat,lon", nearest first.
+        radius_km (NumberFilter): Radius of the `near` filter, in km.
     Methods:
         filter_current_user_trips(queryset, name, value):
             Filters trips to include only those owned by the
                 current user if authenticated.
+        filter_country(queryset, name, value):
+            Filters trips by the ISO code of a known country, or by the
+                exact country text otherwise.
+        filter_bbox(queryset, name, value):
+            Prunes trips by geohash ranges, then by exact coordinates.
+        filter_near(queryset, name, value):
+            Prunes trips by the geohash ranges of the enclosing box, then
+                by haversine distance, annotated as `distance`.
     Meta:
         model (Trip): The model to filter.
         fields (list): The list of fields that can be filtered.
     """
 
+    search_document = search.TRIP_DOCUMENT
+    search_ordering = ('-created_at', '-id')
+
+    q = CharFilter(method='filter_q')
     owner__username = CharFilter(field_name='owner__username')
-    country = CharFilter(field_name='country')
+    country = CharFilter(method='filter_country')
+    country_code = CharFilter(method='filter_country')
     place = CharFilter(field_name='place')
     trip_shared = BooleanFilter(field_name='shared')
     start_date = DateFilter(field_name='start_date', lookup_expr='gte')
@@ -100,26 +343,71 @@ class TripFilter(UserFilteredMixin, FilterSet):
         choices=Trip.TRIP_STATUS
     )
 
+    geocode_status = MultipleChoiceFilter(
+        field_name='geocode_status',
+        choices=Trip.GEOCODE_STATUS
+    )
+
+    bbox = NumberListFilter(method='filter_bbox')
+    near = NumberListFilter(method='filter_near')
+    radius_km = NumberFilter(
+        method='filter_radius_km',
+        min_value=0,
+        max_value=MAX_RADIUS_KM
+    )
+
     def filter_current_user_trips(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
             return queryset.filter(owner=user)
         return queryset
 
+    def filter_country(self, queryset, name, value):
+        code = country_code(value)
+        if code is None:
+            return queryset.filter(country=value)
+        return queryset.filter(country_code=code)
+
+    def filter_bbox(self, queryset, name, value):
+        return queryset.filter(geohash.bbox_q(*parse_bbox(value)))
+
+    def filter_near(self, queryset, name, value):
+        if len(value) != 2:
+            raise ValidationError({'near': ['Expected "lat,lon".']})
+        lat, lon = map(float, value)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValidationError({'near': ['Invalid coordinates.']})
+
+        radius_km = self.form.cleaned_data.get('radius_km')
+        if radius_km is None:
+            radius_km = DEFAULT_RADIUS_KM
+        radius_km = float(radius_km)
+        return queryset.filter(
+            geohash.bbox_q(*geohash.radius_bbox(lat, lon, radius_km))
+        ).annotate(
+            distance=geohash.distance_km(lat, lon)
+        ).filter(distance__lte=radius_km).order_by('distance')
+
+    def filter_radius_km(self, queryset, name, value):
+        return queryset
+
     class Meta:
         model = Trip
         fields = [
             'start_date', 'end_date', 'owner__username', 'place', 'country',
+            'country_code',
             'trip_category', 'trip_status', 'liked_by_user', 'trip_shared',
             'start_date', 'end_date',
-            'profile_id'
+            'profile_id', 'geocode_status', 'bbox', 'near', 'radius_km', 'q'
         ]
 
 
-class ImageFilter(UserFilteredMixin, FilterSet):
+class ImageFilter(RankedSearchMixin, UserFilteredMixin, FilterSet):
     """
     A filter class for filtering Image objects based on various fields.
     Attributes (case-insensitive):
+        q (CharFilter): Full-text search of title, description, trip place
+                        and country, and owner, with prefix matching.
         owner__username (CharFilter): Filters images by the owner's username
         image_title (CharFilter): Filters images by their title.
         description (CharFilter): Filters images by their description.
@@ -133,6 +421,10 @@ class ImageFilter(UserFilteredMixin, FilterSet):
         filter_shared(queryset, name, value): Filter by shared status.
         filter_uploaded_at(queryset, name, value): Filter by upload date range.
     """
+    search_document = search.IMAGE_DOCUMENT
+    search_ordering = ('-uploaded_at', '-id')
+
+    q = CharFilter(method='filter_q')
     owner__username = CharFilter(
         field_name='owner__username',
         lookup_expr='iexact'
@@ -200,18 +492,19 @@ class ImageFilter(UserFilteredMixin, FilterSet):
         model = Image
         fields = [
             'owner__username', 'image_title', 'description', 'shared',
-            'uploaded_at', 'like_id', 'liked_by_user'
+            'uploaded_at', 'like_id', 'liked_by_user', 'q'
         ]
 
 
-class TripList(generics.ListCreateAPIView):
+class TripList(DeferredGeocodingMixin, TripConditionalGetMixin,
+               TripFollowingMapMixin, TripQuerysetMixin,
+               generics.ListCreateAPIView):
     """
     API view to retrieve list of trips or create a new trip.
     Attributes:
         serializer_class (TripSerializer): Serializer class used for the view.
         permission_classes (list): Permission classes for access to the view.
         queryset (QuerySet): The base queryset for retrieving trips,
-                                annotated with likes and images count, and
                                 ordered by creation date.
         filter_backends (list): List of filter backends used for filtering and
                                     searching the queryset.
@@ -220,21 +513,18 @@ class TripList(generics.ListCreateAPIView):
         ordering_fields (list): List of fields for ordering the queryset.
     Methods:
         perform_create(serializer):
-            Saves the new trip instance with the owner set to the current user.
-        get_serializer_context():
-            Adds the current user to the serializer context.
+            Saves the new trip instance with the owner set to the current user
+            (see DeferredGeocodingMixin).
     """
 
     serializer_class = TripSerializer
     permission_classes = [IsOwnerOrReadOnly, IsAuthenticatedOrReadOnly]
+    pagination_class = SelectablePagination
 
     def get_queryset(self):
         '''
-        Returns a queryset of Trip objects with additional annotations
-        and filters. The queryset is annotated with:
-            - images_count: The count of associated images, distinct by trip.
-            - total_likes_count: The total count of likes for all images
-                associated with the trip, ensuring each like is counted once.
+        Returns a queryset of Trip objects with filters. The image and
+        like counts are stored on the trips.
         The queryset is ordered by the creation date in descending order.
         If the user is authenticated, the queryset includes all trips.
         If the user is not authenticated, the queryset includes only the
@@ -244,17 +534,13 @@ class TripList(generics.ListCreateAPIView):
         if user.is_authenticated:
             queryset = Trip.objects.filter(
                 Q(shared=True) | Q(owner=user)
-            ).annotate(
-                images_count=Count('images', distinct=True),
-                total_likes_count=Count('images__likes', distinct=True),
             ).order_by('-created_at')
         else:
-            queryset = Trip.objects.filter(shared=True).annotate(
-                images_count=Count('images', distinct=True),
-                total_likes_count=Count('images__likes', distinct=True),
+            queryset = Trip.objects.filter(
+                shared=True
             ).order_by('-created_at')
 
-        return queryset
+        return self.optimize_trip_queryset(queryset)
 
     filter_backends = [
         filters.OrderingFilter,
@@ -277,44 +563,45 @@ class TripList(generics.ListCreateAPIView):
         'owner__username',
         'created_at',
         'updated_at',
-        'likes_count',
+        'images_count',
+        'total_likes_count',
     ]
 
-    def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
-
 
-class TripListPublic(generics.ListCreateAPIView):
+class TripListPublic(DeferredGeocodingMixin, AnonymousResponseCacheMixin,
+                     TripConditionalGetMixin, TripFollowingMapMixin,
+                     TripQuerysetMixin, generics.ListCreateAPIView):
     """
     API view to retrieve list of trips or create a new trip.
     Attributes:
         serializer_class (TripSerializer): Serializer class used for the view.
         permission_classes (list): Permission classes for access to the view.
         queryset (QuerySet): The base queryset for retrieving trips,
-                                annotated with likes and images count, and
                                 ordered by creation date.
         filter_backends (list): List of filter backends used for filtering and
                                     searching the queryset.
         filterset_class (CustomFilter): The filter class for the queryset.
         search_fields (list): List of fields that can be searched.
         ordering_fields (list): List of fields for ordering the queryset.
+        cache_resources (tuple): Resources whose writes invalidate the
+                                 cached anonymous responses.
     Methods:
         perform_create(serializer):
-            Saves the new trip instance with the owner set to the current user.
+            Saves the new trip instance with the owner set to the current user
+            (see DeferredGeocodingMixin).
         get_serializer_context():
             Adds the current user to the serializer context.
     """
 
     serializer_class = TripSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = SelectablePagination
+    cache_resources = ('trips', 'images', 'likes', 'profiles')
 
     def get_queryset(self):
         """
-        Returns a queryset of Trip objects with additional annotations
-        and filters. The queryset is annotated with:
-            - images_count: The count of associated images, distinct by trip.
-            - total_likes_count: The total count of likes for all images
-                associated with the trip.
+        Returns a queryset of Trip objects with filters. The image and
+        like counts are stored on the trips.
         The queryset is ordered by the creation date of the trips
             in descending order.
         If the user is authenticated, the queryset includes trips that are
@@ -322,20 +609,16 @@ class TripListPublic(generics.ListCreateAPIView):
         If the user is not authenticated, the queryset includes only
             shared trips.
         Returns:
-            QuerySet: A queryset of Trip objects with the applied annotations
-                and filters.
+            QuerySet: A queryset of Trip objects with the applied filters.
         """
-        queryset = Trip.objects.annotate(
-            images_count=Count('images', distinct=True),
-            total_likes_count=Count('images__likes', distinct=True)
-        )
+        queryset = Trip.objects.all()
         user = self.request.user
         if user.is_authenticated:
             queryset = queryset.filter(Q(shared=True) | Q(owner=user))
         else:
             queryset = queryset.filter(shared=True)
 
-        return queryset.order_by('-created_at')
+        return self.optimize_trip_queryset(queryset.order_by('-created_at'))
 
     filter_backends = [
         filters.OrderingFilter,
@@ -358,7 +641,8 @@ class TripListPublic(generics.ListCreateAPIView):
         'owner__username',
         'created_at',
         'updated_at',
-        'likes_count',
+        'images_count',
+        'total_likes_count',
     ]
 
     def get_serializer_context(self):
@@ -367,16 +651,172 @@ class TripListPublic(generics.ListCreateAPIView):
         return context
 
 
-class TripDetail(generics.RetrieveUpdateDestroyAPIView):
+class TripClusterList(generics.GenericAPIView):
+    """
+    API view returning map clusters of trips for a zoom level and an
+    optional bounding box (`?zoom=&bbox=south,west,north,east`).
+    Shared trips come from the precomputed TripCluster grid; for
+    authenticated users, their own private trips are merged in, following
+    the visibility rules of TripListPublic.
+    Each cluster has its cell, trip count, centroid and a sample trip id.
+    """
+
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            zoom = int(request.query_params.get('zoom', 0))
+        except ValueError:
+            zoom = -1
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValidationError(
+                {'zoom': [f'Expected an integer from 0 to {MAX_ZOOM}.']}
+            )
+        bbox = request.query_params.get('bbox')
+        bbox = parse_bbox(bbox.split(',')) if bbox else (-90, -180, 90, 180)
+
+        level = TripCluster.level_for_zoom(zoom)
+        cells = Q()
+        for first, last in geohash.cell_ranges(geohash.cover(*bbox), level):
+            cells |= Q(cell__gte=first, cell__lte=last)
+        clusters = {
+            cluster.cell: [
+                cluster.count, cluster.lat_sum, cluster.lon_sum,
+                cluster.sample_trip_id
+            ]
+            for cluster in TripCluster.objects.filter(
+                cells, level=level, count__gt=0
+            )
+        }
+
+        if request.user.is_authenticated:
+            private_trips = Trip.objects.filter(
+                geohash.bbox_q(*bbox), owner=request.user, shared=False
+            ).values_list('pk', 'geohash', 'lat', 'lon')
+            for pk, trip_geohash, lat, lon in private_trips:
+                cluster = clusters.setdefault(
+                    trip_geohash[:level], [0, 0.0, 0.0, pk]
+                )
+                cluster[0] += 1
+                cluster[1] += lat
+                cluster[2] += lon
+
+        return Response({
+            'zoom': zoom,
+            'level': level,
+            'clusters': [
+                {
+                    'cell': cell,
+                    'count': count,
+                    'lat': lat_sum / count,
+                    'lon': lon_sum / count,
+                    'sample_trip_id': sample_trip_id,
+                }
+                for cell, (count, lat_sum, lon_sum, sample_trip_id)
+                in sorted(clusters.items())
+            ],
+        })
+
+
+class TripTrendingList(AnonymousResponseCacheMixin, TripFollowingMapMixin,
+                       TripQuerysetMixin, generics.ListAPIView):
+    """
+    API view listing the trending shared trips, ranked by the decayed
+    likes of their images in the precomputed TrendingTrip table
+    refreshed by the refresh_trending command, best first.
+    Attributes:
+        serializer_class (TripSerializer): Serializer class used for the view.
+        permission_classes (list): Permission classes for access to the view.
+        cache_resources (tuple): Resources whose writes invalidate the
+                                 cached anonymous responses.
+    """
+
+    serializer_class = TripSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    cache_resources = ('trending', 'trips', 'images', 'likes', 'profiles')
+
+    def get_queryset(self):
+        return self.optimize_trip_queryset(
+            Trip.objects.filter(shared=True, trending__isnull=False)
+        ).order_by('-trending__score', '-id')
+
+
+class TripCountryList(AnonymousResponseCacheMixin, generics.GenericAPIView):
+    """
+    API view counting the visible trips per country, most visited first,
+    grouped by ISO country code on the (country_code, shared) index.
+    Accepts the TripFilter parameters, e.g. `?trip_status=Completed`.
+    Trips whose country is unknown to the offline country table are left
+    out.
+    Attributes:
+        cache_resources (tuple): Resources whose writes invalidate the
+                                 cached anonymous responses.
+    """
+
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = TripFilter
+    cache_resources = ('trips',)
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_authenticated:
+            return Trip.objects.filter(Q(shared=True) | Q(owner=user))
+        return Trip.objects.filter(shared=True)
+
+    def get(self, request, *args, **kwargs):
+        rows = self.filter_queryset(self.get_queryset()).filter(
+            country_code__isnull=False
+        ).values('country_code').annotate(
+            trips_count=Count('pk')
+        ).order_by('-trips_count', 'country_code')
+        return Response([
+            {
+                'country_code': row['country_code'],
+                'country': COUNTRY_NAMES.get(row['country_code']),
+                'trips_count': row['trips_count'],
+            }
+            for row in rows
+        ])
+
+
+class PlaceAutocomplete(generics.GenericAPIView):
+    """
+    API view suggesting known destinations for a typed prefix
+    (`?q=&limit=`), matched against the start of the place or the
+    country of shared trips. Suggestions come from the in-memory
+    PlaceIndex, most visited first, with the coordinates of the latest
+    trip, so clients can reuse them instead of geocoding again.
+    """
+
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_limit:
+            raise ValidationError(
+                {'limit': [f'Expected an integer from 1 to {self.max_limit}.']}
+            )
+        query = request.query_params.get('q', '')
+        return Response(
+            places.get_place_index().search(query, limit=limit)
+        )
+
+
+class TripDetail(TripConditionalGetMixin, TripFollowingMapMixin,
+                 generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a Trip instance.
     This view supports the following operations:
     - Retrieve a single Trip instance.
     - Update a Trip instance.
     - Delete a Trip instance.
-    The queryset is annotated with:
-    - likes_count: The count of likes associated with the images of the trip.
-    - images_count: The count of images associated with the trip.
+    The like and image counts are stored on the trip.
     The results are ordered by the creation date in descending order.
     Attributes:
         queryset (QuerySet): The base queryset for retrieving Trip instances.
@@ -384,18 +824,32 @@ class TripDetail(generics.RetrieveUpdateDestroyAPIView):
             validating and deserializing input, and for serializing output.
         permission_classes (list): The list of permission classes that
             determine access control.
+    Methods:
+        perform_update(serializer): Saves the trip, queueing it for
+            geocoding again when the location of a pending trip changed.
     """
     serializer_class = TripSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    queryset = Trip.objects.all()
+
+    def get_queryset(self):
+        return prefetch_trip_relations(Trip.objects.all(), self.request.user)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
 
+    def perform_update(self, serializer):
+        location = serializer.instance.location_key
+        with transaction.atomic():
+            trip = serializer.save()
+            if (trip.geocode_status == Trip.GEOCODE_PENDING
+                    and trip.location_key != location):
+                GeocodeJob.enqueue(trip)
 
-class ImageList(generics.ListCreateAPIView):
+
+class ImageList(ImageConditionalGetMixin, FollowingMapMixin,
+                ImageQuerysetMixin, generics.ListCreateAPIView):
     """
     API view to retrieve a list of images or create a new image.
     Attributes:
@@ -435,18 +889,16 @@ class ImageList(generics.ListCreateAPIView):
         if user.is_authenticated:
             queryset = Image.objects.filter(
                  Q(trip=trip) & (Q(shared=True) | Q(trip__owner=user))
-            ).annotate(
-                likes_count=Count('likes')
             )
         else:
             queryset = Image.objects.filter(
                 trip=trip,
                 shared=True
-            ).annotate(
-                likes_count=Count('likes')
             )
 
-        return queryset.distinct().order_by('-uploaded_at')
+        return self.optimize_image_queryset(
+            queryset
+        ).distinct().order_by('-uploaded_at')
 
     def perform_create(self, serializer):
         trip = get_object_or_404(
@@ -477,7 +929,8 @@ class ImageList(generics.ListCreateAPIView):
         return context
 
 
-class ImageDetail(generics.RetrieveUpdateDestroyAPIView):
+class ImageDetail(ImageConditionalGetMixin, FollowingMapMixin,
+                  generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete an Image instance.
     Allows users to perform the following actions on an Image instance:
@@ -490,13 +943,15 @@ class ImageDetail(generics.RetrieveUpdateDestroyAPIView):
         permission_classes (list): Permission classes for access to the view.
     Methods:
         get_queryset(self):
-            Returns a queryset of Image objects filtered by the trip ID and
-            the owner of the trip.
+            Returns a queryset of Image objects annotated with the like id
+            of the current user.
     """
 
     serializer_class = ImageSerializer
     permission_classes = [IsOwnerOrReadOnly]
-    queryset = Image.objects.all()
+
+    def get_queryset(self):
+        return annotate_like_id(Image.objects.all(), self.request.user)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -504,7 +959,9 @@ class ImageDetail(generics.RetrieveUpdateDestroyAPIView):
         return context
 
 
-class ImageListGallery(generics.ListCreateAPIView):
+class ImageListGallery(AnonymousResponseCacheMixin, ImageConditionalGetMixin,
+                       FollowingMapMixin, ImageQuerysetMixin,
+                       generics.ListCreateAPIView):
     """
     API view to retrieve and create images in the gallery.
     This view supports listing and creating images. It uses the
@@ -517,15 +974,21 @@ class ImageListGallery(generics.ListCreateAPIView):
         filter_backends (list): Filter backends for filtering and ordering.
         filterset_class (ImageFilter): ilter class for filtering the queryset.
         ordering_fields (list): Fields for ordering the results.
+        cache_resources (tuple): Resources whose writes invalidate the
+                                 cached anonymous responses.
         search_fields (list): List of fields that can be searched.
     Methods:
-        get_queryset(): Returns the queryset of shared images, annotated with
-                        the count of likes, and ordered by the upload date in
-                        descending order.
+        get_queryset(): Returns the queryset of shared images, ordered by
+                        the upload date in descending order. Ordering by
+                        the stored `likes_count` uses the (shared,
+                        likes_count) index.
     """
 
     serializer_class = ImageSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = SelectablePagination
+    cache_resources = ('images', 'likes', 'trips')
+    cursor_ordering = ('-uploaded_at', '-id')
     filter_backends = [filters.OrderingFilter]
 
     filterset_class = ImageFilter
@@ -550,17 +1013,75 @@ class ImageListGallery(generics.ListCreateAPIView):
     ]
 
     def get_queryset(self):
-        return Image.objects.filter(shared=True)\
-            .annotate(likes_count=Count('likes'))\
-            .order_by('-uploaded_at')
+        return self.optimize_image_queryset(
+            Image.objects.filter(shared=True)
+        ).order_by('-uploaded_at')
+
+
+class ImageTrendingList(AnonymousResponseCacheMixin, FollowingMapMixin,
+                        ImageQuerysetMixin, generics.ListAPIView):
+    """
+    API view listing the trending shared images, read from the
+    precomputed TrendingImage ranking refreshed by the refresh_trending
+    command, best first.
+    Attributes:
+        serializer_class (ImageSerializer): Serializer class used for the view.
+        permission_classes (list): Permission classes applied to the view.
+        cache_resources (tuple): Resources whose writes invalidate the
+                                 cached anonymous responses.
+    """
+
+    serializer_class = ImageSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    cache_resources = ('trending', 'images', 'likes')
+
+    def get_queryset(self):
+        return self.optimize_image_queryset(
+            Image.objects.filter(shared=True, trending__isnull=False)
+        ).order_by('-trending__score', '-id')
 
 
-class ImageListGalleryDetail(generics.ListCreateAPIView):
+class ImageListGalleryDetail(AnonymousResponseCacheMixin,
+                             ImageConditionalGetMixin, FollowingMapMixin,
+                             generics.ListCreateAPIView):
     serializer_class = ImageSerializer
+    cache_resources = ('images', 'likes')
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['uploaded_at']
 
     def get_queryset(self):
         image_id = self.kwargs['pk']
-        return Image.objects.filter(pk=image_id)
+        return annotate_like_id(
+            Image.objects.filter(pk=image_id), self.request.user
+        )
+
+
+class ImageLikeList(generics.ListAPIView):
+    """
+    API view to list all likes of an image, newest first. Image payloads
+    only embed a preview of the most recent likes.
+    Attributes:
+        serializer_class (LikeSerializer): Serializer class used for the view.
+        permission_classes (list): Permission classes applied to the view.
+        pagination_class (SelectablePagination): Page number or keyset
+                                                 pagination.
+    Methods:
+        get_queryset(): Returns the likes of the image, or raises a 404 when
+                        the image is private and the user does not own its
+                        trip.
+    """
+
+    serializer_class = LikeSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = SelectablePagination
+
+    def get_queryset(self):
+        user = self.request.user
+        visible = Q(shared=True)
+        if user.is_authenticated:
+            visible |= Q(trip__owner=user)
+        image = get_object_or_404(
+            Image.objects.filter(visible), pk=self.kwargs['pk']
+        )
+        return Like.objects.filter(image=image).select_related('owner')